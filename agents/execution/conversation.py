@@ -1,14 +1,16 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Awaitable, Callable, Optional
 from zoneinfo import ZoneInfo
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from agents.parser.conversation import GorkStreamParser
+from database import PgConnection
 from database.models.manager import Interaction
 from database.operations.base import UserRepository
 from database.operations.content import MessageRepository
 from database.operations.manager import AgentRepository, InteractionRepository, ModelConversationRepository
-from external import completions
+from external import completions, stream_completions
 from log import logger
 from utils import INSTANCE_NUMBER
 
@@ -19,7 +21,18 @@ async def conversation_agent(
         last_message_id: int,
         group_id: Optional[int] = None,
         additional_context: str = "",
+        on_action: Optional[Callable[[dict[str, Any]], Awaitable[None]]] = None,
+        stream_parser: Optional[GorkStreamParser] = None,
 ) -> str:
+    """
+    Run the conversation agent and return its raw response.
+
+    When ``on_action`` is given the completion is streamed and the callback
+    receives each valid action, in order, as soon as it is complete in the
+    stream. The interaction is then recorded on its own session, since the
+    caller may still be using ``db`` to dispatch those actions. Pass
+    ``stream_parser`` to read its ``consumed`` count afterwards.
+    """
     agent_repo = AgentRepository(db)
     model_conversation_repo = ModelConversationRepository(db)
     message_repo = MessageRepository(db)
@@ -103,20 +116,34 @@ async def conversation_agent(
         ]
     }
 
-    req = await completions(payload_term_formatter)
-    resp = req["choices"][0]["message"]["content"]
+    if on_action:
+        parser = stream_parser or GorkStreamParser()
+        stream = stream_completions(payload_term_formatter)
+        async for delta in stream:
+            for action in parser.feed(delta):
+                await on_action(action)
+        resp = stream.content
+        usage = stream.usage
+    else:
+        req = await completions(payload_term_formatter)
+        resp = req["choices"][0]["message"]["content"]
+        usage = req["usage"]
 
-    interaction_repo = InteractionRepository(Interaction, db)
-    _ = await interaction_repo.create_interaction(
+    interaction = dict(
         model_id=model.id,
         user_id=user_id,
         group_id=group_id,
         agent_id=agent.id,
         user_prompt=current_message,
         response=resp,
-        input_tokens=req["usage"]["prompt_tokens"],
-        output_tokens=req["usage"]["completion_tokens"],
+        input_tokens=usage.get("prompt_tokens", 0),
+        output_tokens=usage.get("completion_tokens", 0),
         system_behavior=system_prompt
     )
+    if on_action:
+        async with PgConnection() as record_db:
+            _ = await InteractionRepository(Interaction, record_db).create_interaction(**interaction)
+    else:
+        _ = await InteractionRepository(Interaction, db).create_interaction(**interaction)
 
     return resp
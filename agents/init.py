@@ -5,6 +5,7 @@ import yaml
 
 from database import PgConnection
 from database.models.manager import Agent
+from database.operations.cache import clear_caches
 from database.operations.manager import AgentRepository, ModelRepository
 from log import logger
 from utils import project_root
@@ -56,6 +57,8 @@ async def init_agents() -> None:
                 model_id=model_db_id
             )
 
+    # Agents and their resolved models may have changed under cached entries.
+    clear_caches()
     await logger.info("Agents", "Initialization", "Successful")
 
 
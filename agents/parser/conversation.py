@@ -390,3 +390,114 @@ def _validate_action_type(action_type: str, action: Dict, idx: int) -> None:
         # Unknown action type - log warning but don't fail
         # (allows for future extensibility)
         pass
+
+
+class GorkStreamParser:
+    """
+    Incremental parser that extracts complete actions from a streamed
+    Gork response.
+
+    Text is fed chunk by chunk; every call to ``feed`` returns the actions
+    of the top-level ``"actions"`` array that became complete since the
+    previous call, in order. Elements that fail validation are skipped but
+    still counted in ``consumed``, so ``actions[consumed:]`` of the final
+    parse are exactly the actions not yet seen. Anything before the first
+    ``{`` (code fences, stray prose) is ignored. The full response must still
+    go through ``parse_gork_response`` once the stream ends.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_key = None
+        self._after_actions_colon = False
+        self._actions_depth = None
+        self._element_start = -1
+        self._done = False
+        self.consumed = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self._text += chunk
+        completed: List[Dict[str, Any]] = []
+
+        while self._pos < len(self._text) and not self._done:
+            idx = self._pos
+            c = self._text[idx]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_key = self._text[self._string_start + 1:idx]
+                continue
+
+            if not self._stack and c != "{":
+                continue
+
+            if c.isspace():
+                continue
+
+            if self._after_actions_colon:
+                self._after_actions_colon = False
+                if c == "[":
+                    self._stack.append(c)
+                    self._actions_depth = len(self._stack)
+                    continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = idx
+            elif c == ":":
+                if len(self._stack) == 1 and self._last_key == "actions":
+                    self._after_actions_colon = True
+                self._last_key = None
+            elif c in "{[":
+                self._stack.append(c)
+                if (
+                    c == "{"
+                    and self._actions_depth is not None
+                    and len(self._stack) == self._actions_depth + 1
+                ):
+                    self._element_start = idx
+            elif c in "}]":
+                if not self._stack:
+                    self._done = True
+                    break
+                self._stack.pop()
+                depth = len(self._stack)
+
+                if self._actions_depth is not None:
+                    if depth == self._actions_depth and self._element_start >= 0:
+                        action = self._parse_action(self._text[self._element_start:idx + 1])
+                        self._element_start = -1
+                        self.consumed += 1
+                        if action is not None:
+                            completed.append(action)
+                    elif depth < self._actions_depth:
+                        self._actions_depth = None
+
+                if not self._stack:
+                    self._done = True
+            elif len(self._stack) == 1:
+                self._last_key = None
+
+        return completed
+
+    def _parse_action(self, candidate: str) -> Optional[Dict[str, Any]]:
+        try:
+            action = json.loads(candidate)
+            if not isinstance(action, dict) or "action" not in action:
+                return None
+            _validate_action_type(action["action"], action, self.consumed)
+            return action
+        except (json.JSONDecodeError, ValueError):
+            return None
@@ -1,14 +1,116 @@
 import base64
-from io import BytesIO
 from typing import Optional
 
-import soundfile as sf
-
 from database import PgConnection
 from database.models.manager import Agent, Command, Interaction, Model
+from database.operations.content import TranscriptionRepository
 from database.operations.manager import AgentRepository, CommandRepository, InteractionRepository, ModelConversationRepository
 from external import completions
 from external.evolution import download_media, send_message
+from utils import get_env_var, get_file_hash, run_ffmpeg
+
+
+# Interactions reference the audio by hash (see content.transcription)
+# instead of storing it.
+AUDIO_PROMPT_PREFIX = "audio:sha256:"
+
+# Speech models work at 16 kHz mono; sending the voice note compressed at
+# that rate keeps the request a fraction of the size of a full-rate WAV.
+# mp3 and wav are accepted by every OpenRouter audio model, ogg and flac only
+# by some providers.
+TRANSCRIPTION_SAMPLE_RATE = 16000
+DEFAULT_TRANSCRIPTION_FORMAT = "mp3"
+TRANSCRIPTION_ENCODERS = {
+    "mp3": ('-c:a', 'libmp3lame', '-b:a', '32k', '-f', 'mp3'),
+    "ogg": ('-c:a', 'libopus', '-b:a', '24k', '-application', 'voip', '-f', 'ogg'),
+    "flac": ('-c:a', 'flac', '-f', 'flac'),
+    "wav": ('-c:a', 'pcm_s16le', '-f', 'wav'),
+}
+# Trims leading silence, then trailing silence by trimming the reversed audio.
+TRIM_SILENCE_FILTER = (
+    "silenceremove=start_periods=1:start_silence=0.2:start_threshold=-45dB,"
+    "areverse,"
+    "silenceremove=start_periods=1:start_silence=0.2:start_threshold=-45dB,"
+    "areverse"
+)
+
+
+def _file_sha256(audio_message: Optional[dict]) -> Optional[bytes]:
+    """``fileSha256`` of a WhatsApp audio message, as base64 or a serialized Buffer."""
+    file_sha256 = (audio_message or {}).get("fileSha256")
+    try:
+        if isinstance(file_sha256, str):
+            digest = base64.b64decode(file_sha256)
+        elif isinstance(file_sha256, dict):
+            digest = bytes(file_sha256.get("data") or file_sha256.values())
+        else:
+            return None
+    except (ValueError, TypeError):
+        return None
+    return digest if len(digest) == 32 else None
+
+
+async def _prepare_audio(audio_bytes: bytes) -> tuple[bytes, str]:
+    """
+    Re-encode a voice note for the transcription request: mono, 16 kHz,
+    leading and trailing silence trimmed, in ``TRANSCRIPTION_AUDIO_FORMAT``.
+    Returns the audio and its ``input_audio`` format.
+    """
+    audio_format = (get_env_var("TRANSCRIPTION_AUDIO_FORMAT") or DEFAULT_TRANSCRIPTION_FORMAT).lower()
+    if audio_format not in TRANSCRIPTION_ENCODERS:
+        audio_format = DEFAULT_TRANSCRIPTION_FORMAT
+
+    # The trim writes raw PCM: unlike the encoded formats, which always carry
+    # a header, it is empty when the whole note is below the threshold.
+    pcm = await run_ffmpeg(
+        '-i', 'pipe:0',
+        '-ac', '1',
+        '-ar', str(TRANSCRIPTION_SAMPLE_RATE),
+        '-af', TRIM_SILENCE_FILTER,
+        '-f', 's16le',
+        'pipe:1',
+        input_bytes=audio_bytes,
+    )
+    if pcm:
+        source = ('-f', 's16le', '-ac', '1', '-ar', str(TRANSCRIPTION_SAMPLE_RATE), '-i', 'pipe:0')
+    else:
+        # A quiet or silent note trims to nothing; send it untrimmed instead.
+        source = ('-i', 'pipe:0', '-ac', '1', '-ar', str(TRANSCRIPTION_SAMPLE_RATE))
+
+    prepared = await run_ffmpeg(
+        *source,
+        *TRANSCRIPTION_ENCODERS[audio_format],
+        'pipe:1',
+        input_bytes=pcm or audio_bytes,
+    )
+    return prepared, audio_format
+
+
+async def _request_transcription(audio_bytes: bytes, transcriber_agent: Agent, audio_model: Model) -> tuple[str, dict]:
+    prepared_audio, audio_format = await _prepare_audio(audio_bytes)
+    base64_audio = base64.b64encode(prepared_audio).decode("utf-8")
+
+    payload = {
+        "model": audio_model.openrouter_id,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": transcriber_agent.prompt},
+                    {
+                        "type": "input_audio",
+                        "input_audio": {
+                            "data": base64_audio,
+                            "format": audio_format
+                        }
+                    }
+                ]
+            }
+        ]
+    }
+
+    req = await completions(payload)
+    return req["choices"][0]["message"]["content"], req["usage"]
 
 
 async def transcribe_audio(webhook_data:dict, user_id: int, group_id: Optional[int], command: bool = False) -> str:
@@ -36,47 +138,44 @@ async def transcribe_audio(webhook_data:dict, user_id: int, group_id: Optional[i
             message_id = event_data["key"]["id"]
         else:
             message_id = context_info.get("stanzaId")
+            audio_message = (context_info.get("quotedMessage") or {}).get("audioMessage")
             if not message_id:
-                message_id = (
+                ephemeral_context = (
                     event_data.get("message", {})
                     .get("ephemeralMessage", {})
                     .get("message", {})
                     .get("extendedTextMessage", {})
                     .get("contextInfo", {})
-                    .get("stanzaId")
                 )
-        audio_base64, _ = await download_media(message_id)
-        audio_bytes = base64.b64decode(audio_base64)
-        audio_data, sample_rate = sf.read(BytesIO(audio_bytes))
-
-        wav_buffer = BytesIO()
-        sf.write(wav_buffer, audio_data, sample_rate, format='WAV')
-        wav_buffer.seek(0)
-        wav_bytes = wav_buffer.read()
-
-        base64_audio = base64.b64encode(wav_bytes).decode("utf-8")
-
-        payload = {
-            "model": audio_model.openrouter_id,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": transcriber_agent.prompt},
-                        {
-                            "type": "input_audio",
-                            "input_audio": {
-                                "data": base64_audio,
-                                "format": "wav"
-                            }
-                        }
-                    ]
-                }
-            ]
-        }
+                message_id = ephemeral_context.get("stanzaId")
+                audio_message = (ephemeral_context.get("quotedMessage") or {}).get("audioMessage")
+
+        # WhatsApp sends the SHA-256 of the file with the message, so a voice
+        # note transcribed before is answered without downloading it.
+        transcription_repo = TranscriptionRepository(db)
+        file_hash = _file_sha256(audio_message)
+        audio_hash = file_hash
+        transcription = await transcription_repo.find_by_hash(file_hash) if file_hash else None
+
+        if transcription is None:
+            audio_base64, _ = await download_media(message_id)
+            audio_bytes = base64.b64decode(audio_base64)
+            content_hash = get_file_hash(audio_bytes)
+            if content_hash != file_hash:
+                audio_hash = content_hash
+                transcription = await transcription_repo.find_by_hash(audio_hash)
+
+        if transcription is not None:
+            resp, usage, model_id = transcription.text, None, transcription.model_id
+        else:
+            resp, usage = await _request_transcription(audio_bytes, transcriber_agent, audio_model)
+            model_id = audio_model.id
+            await transcription_repo.insert_transcription(audio_hash, resp, model_id)
 
-        req = await completions(payload)
-        resp = req["choices"][0]["message"]["content"]
+        # When WhatsApp's hash differs from the content hash, store the
+        # transcript under it too, so the next request skips the download.
+        if file_hash and file_hash != audio_hash:
+            await transcription_repo.insert_transcription(file_hash, resp, model_id)
 
         if command:
             command_repo = CommandRepository(Command, db)
@@ -87,18 +186,19 @@ async def transcribe_audio(webhook_data:dict, user_id: int, group_id: Optional[i
         else:
             new_command = None
 
-        interaction_repo = InteractionRepository(Interaction, db)
-        _ = await interaction_repo.create_interaction(
-            model_id=audio_model.id,
-            user_id=user_id,
-            agent_id=transcriber_agent.id,
-            command_id=new_command.id if new_command else None,
-            user_prompt=base64_audio,
-            response=resp,
-            group_id=group_id,
-            input_tokens=req["usage"]["prompt_tokens"],
-            output_tokens=req["usage"]["completion_tokens"]
-        )
+        if usage is not None:
+            interaction_repo = InteractionRepository(Interaction, db)
+            _ = await interaction_repo.create_interaction(
+                model_id=audio_model.id,
+                user_id=user_id,
+                agent_id=transcriber_agent.id,
+                command_id=new_command.id if new_command else None,
+                user_prompt=f"{AUDIO_PROMPT_PREFIX}{audio_hash.hex()}",
+                response=resp,
+                group_id=group_id,
+                input_tokens=usage["prompt_tokens"],
+                output_tokens=usage["completion_tokens"]
+            )
 
         return resp
 
@@ -1,11 +1,13 @@
+import asyncio
 import json
-from typing import Any, Optional
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from agents.execution.conversation import conversation_agent
-from agents.parser.conversation import parse_gork_response
+from agents.parser.conversation import GorkStreamParser, parse_gork_response
 from api.routes.webhook.evolution.handles.audio import handle_transcribe_command
 from api.routes.webhook.evolution.handles.image import (
     handle_describe_image_command,
@@ -39,13 +41,127 @@ from llm_access import (
     search_messages,
 )
 from log import logger
-from tts import text_to_speech
+from tts import text_to_speech_notes, TTSQueueFullError
 
 
 MAX_WEB_SEARCH_DEPTH = 2
 MAX_DATABASE_QUERY_ITERATIONS = 10
 DATABASE_QUERY_STOP_ITERATION = 7
 
+
+class _StreamedActionDispatcher:
+    """
+    Dispatches actions in order while the LLM response is still streaming.
+
+    Actions are pushed from the stream as soon as they are complete and run
+    one at a time in a background task, so reading the stream never waits
+    on a slow action (typing delay, media upload...).
+    """
+
+    def __init__(self, dispatch: Callable[..., Awaitable[bool]]):
+        self._dispatch = dispatch
+        self._queue: asyncio.Queue[Optional[dict]] = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="streamed_action_dispatcher")
+        self.messages_sent = 0
+        self.stopped = False
+
+    async def push(self, action: dict) -> None:
+        self._queue.put_nowait(action)
+
+    async def finish(self) -> None:
+        self._queue.put_nowait(None)
+        await self._task
+
+    async def run_action(self, action: dict) -> None:
+        action_type = action.get("action")
+        try:
+            should_continue = await self._dispatch(
+                action_type=action_type,
+                action=action,
+                is_first_message=self.messages_sent == 0,
+            )
+
+            if action_type == "message":
+                self.messages_sent += 1
+
+            if not should_continue:
+                self.stopped = True
+        except Exception as e:
+            await logger.error("ConversationHandle", f"ActionError:{action_type}", str(e))
+
+    async def _run(self) -> None:
+        while True:
+            action = await self._queue.get()
+            if action is None:
+                return
+            if not self.stopped:
+                await self.run_action(action)
+
+
+async def _run_conversation_turn(
+        remote_id: str,
+        user: User,
+        db: AsyncSession,
+        db_message: Message,
+        scheduler: AsyncIOScheduler,
+        context: dict,
+        group_id: Optional[int],
+        additional_context: str = "",
+        web_search_depth: int = 0,
+        database_query_iteration: int = 0,
+        database_context: str = "",
+):
+    dispatcher = _StreamedActionDispatcher(
+        partial(
+            _dispatch_action,
+            remote_id=remote_id,
+            user=user,
+            db=db,
+            db_message=db_message,
+            scheduler=scheduler,
+            context=context,
+            group_id=group_id,
+            web_search_depth=web_search_depth,
+            database_query_iteration=database_query_iteration,
+            database_context=database_context,
+        )
+    )
+    stream_parser = GorkStreamParser()
+
+    try:
+        raw_response = await conversation_agent(
+            db=db,
+            user_id=user.id,
+            last_message_id=db_message.id,
+            group_id=group_id,
+            additional_context=additional_context,
+            on_action=dispatcher.push,
+            stream_parser=stream_parser,
+        )
+    finally:
+        await dispatcher.finish()
+
+    if dispatcher.stopped:
+        return
+
+    await _dispatch_gork_response(
+        raw_response=raw_response,
+        remote_id=remote_id,
+        message_id=db_message.message_id,
+        user=user,
+        db=db,
+        db_message=db_message,
+        scheduler=scheduler,
+        context=context,
+        group_id=group_id,
+        web_search_depth=web_search_depth,
+        database_query_iteration=database_query_iteration,
+        database_context=database_context,
+        dispatcher=dispatcher,
+        streamed=stream_parser.consumed,
+    )
+
+
 async def handle_conversation_agent(
         remote_id: str,
         user: User,
@@ -57,20 +173,13 @@ async def handle_conversation_agent(
     """
     Main handle for the conversation agent (refactored from generic_conversation).
 
-    Calls conversation_agent to get a structured JSON response from the LLM,
-    then dispatches each action to the appropriate existing handle/service.
+    Streams a structured JSON response from conversation_agent and
+    dispatches each action to the appropriate existing handle/service as
+    soon as it is complete, so the first message goes out while the rest of
+    the response is still being generated.
     """
-    raw_response = await conversation_agent(
-        db=db,
-        user_id=user.id,
-        last_message_id=db_message.id,
-        group_id=db_message.group_id,
-    )
-
-    await _dispatch_gork_response(
-        raw_response=raw_response,
+    await _run_conversation_turn(
         remote_id=remote_id,
-        message_id=db_message.message_id,
         user=user,
         db=db,
         db_message=db_message,
@@ -90,6 +199,8 @@ async def _dispatch_gork_response(
         scheduler: AsyncIOScheduler,
         context: dict,
         group_id: Optional[int],
+        dispatcher: _StreamedActionDispatcher,
+        streamed: int,
         web_search_depth: int = 0,
         database_query_iteration: int = 0,
         database_context: str = "",
@@ -98,10 +209,23 @@ async def _dispatch_gork_response(
         parsed = await parse_gork_response(raw_response)
     except ValueError as e:
         await logger.error("ConversationHandle", "ParseError", str(e))
-        await send_message(remote_id, "Desculpa, tive um problema interno. Tenta de novo", message_id)
+        # The user already got the streamed actions; an apology after a real
+        # reply would only confuse them.
+        if not streamed:
+            await send_message(remote_id, "Desculpa, tive um problema interno. Tenta de novo", message_id)
         return
 
     queries = parsed.get("queries", [])
+    if queries and streamed:
+        # Queries must come with no actions. Once some were already sent, a
+        # follow-up turn would answer twice, so the queries are dropped.
+        await logger.error(
+            "ConversationHandle",
+            "SchemaViolation",
+            f"Dropped {len(queries)} database queries after {streamed} streamed actions.",
+        )
+        return
+
     if queries:
         await _continue_with_database_queries(
             parsed=parsed,
@@ -119,34 +243,11 @@ async def _dispatch_gork_response(
         )
         return
 
-    message_type = 0
-    for action in parsed.get("actions", []):
-        action_type = action.get("action")
-
-        try:
-            should_continue = await _dispatch_action(
-                action_type=action_type,
-                action=action,
-                remote_id=remote_id,
-                user=user,
-                db=db,
-                db_message=db_message,
-                scheduler=scheduler,
-                context=context,
-                group_id=group_id,
-                web_search_depth=web_search_depth,
-                database_query_iteration=database_query_iteration,
-                database_context=database_context,
-                is_first_message=message_type == 0
-            )
-
-            if action_type == "message":
-                message_type += 1
-
-            if not should_continue:
-                return
-        except Exception as e:
-            await logger.error("ConversationHandle", f"ActionError:{action_type}", str(e))
+    # Actions the stream parser already consumed are skipped.
+    for action in parsed.get("actions", [])[streamed:]:
+        await dispatcher.run_action(action)
+        if dispatcher.stopped:
+            return
 
 
 async def _continue_with_database_queries(
@@ -205,24 +306,15 @@ async def _continue_with_database_queries(
         part for part in [database_context, context_chunk] if part
     )
 
-    raw_response = await conversation_agent(
-        db=db,
-        user_id=user.id,
-        last_message_id=db_message.id,
-        group_id=group_id,
-        additional_context=additional_context,
-    )
-
-    await _dispatch_gork_response(
-        raw_response=raw_response,
+    await _run_conversation_turn(
         remote_id=remote_id,
-        message_id=message_id,
         user=user,
         db=db,
         db_message=db_message,
         scheduler=scheduler,
         context=context,
         group_id=group_id,
+        additional_context=additional_context,
         web_search_depth=web_search_depth,
         database_query_iteration=next_iteration,
         database_context=additional_context,
@@ -415,8 +507,15 @@ async def _dispatch_action(
     elif action_type == "audio":
         text = params.get("text", "")
         language = params.get("language", "pt")
-        audio_b64 = await text_to_speech(text, language=language)
-        await send_audio(remote_id, audio_b64, db_message.message_id)
+        try:
+            notes = await text_to_speech_notes(text, language=language)
+        except TTSQueueFullError as e:
+            # Too many voice replies pending: answer in text rather than wait.
+            await logger.warn("ConversationHandle", "TTSQueueFull", str(e))
+            await send_message(remote_id, text, db_message.message_id, is_first_message)
+            return True
+        for audio_b64 in notes:
+            await send_audio(remote_id, audio_b64, db_message.message_id, encoding=False)
         return True
 
     elif action_type == "sticker":
@@ -503,23 +602,15 @@ async def _dispatch_action(
         additional_context = "\n\n".join(
             part for part in [database_context, web_search_context] if part
         )
-        raw_response = await conversation_agent(
-            db=db,
-            user_id=user.id,
-            last_message_id=db_message.id,
-            group_id=group_id,
-            additional_context=additional_context,
-        )
-        await _dispatch_gork_response(
-            raw_response=raw_response,
+        await _run_conversation_turn(
             remote_id=remote_id,
-            message_id=db_message.message_id,
             user=user,
             db=db,
             db_message=db_message,
             scheduler=scheduler,
             context=context,
             group_id=group_id,
+            additional_context=additional_context,
             web_search_depth=web_search_depth + 1,
             database_query_iteration=database_query_iteration,
             database_context=database_context,
@@ -53,8 +53,8 @@ async def handle_sticker_command(
         fill = _param_enabled(params.get("fill", "false"))
         caption_text = clean_text(db_message.content).replace(twitter_url, "").strip()
         if result.media_type == "video":
-            sticker_url = await animated_sticker_from_bytes(result.media_bytes, caption_text, effect, fill)
-            await send_animated_sticker(remote_id, sticker_url)
+            sticker = await animated_sticker_from_bytes(result.media_bytes, caption_text, effect, fill)
+            await send_animated_sticker(remote_id, sticker)
         else:
             is_random = _param_enabled(params.get("random", "false"))
             remove_background = _param_enabled(params.get("no-background", "false"))
@@ -77,8 +77,8 @@ async def handle_sticker_command(
         if media.type in ("mp4", "video"):
             effect = params.get("effect")
             fill = _param_enabled(params.get("fill", "false"))
-            gif_url = await animated_sticker(message_to_use, effect, fill)
-            await send_animated_sticker(remote_id, gif_url)
+            sticker = await animated_sticker(message_to_use, effect, fill)
+            await send_animated_sticker(remote_id, sticker)
             return
 
     is_random = _param_enabled(params.get("random", "false"))
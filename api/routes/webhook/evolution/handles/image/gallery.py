@@ -2,34 +2,65 @@ from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from database import PgConnection
 from database.operations.content import MediaRepository
 from database.operations.manager import EmbeddingRepository, ModelRepository
 from external import embeddings
+from log import logger
+from utils import get_env_var, reduce_embedding
 
 
-GALLERY_EMBEDDING_DIMENSION = 2560
-
-def _fit_gallery_embedding(embedding: list[float]) -> list[float]:
-    if len(embedding) == GALLERY_EMBEDDING_DIMENSION:
-        return embedding
-    if len(embedding) > GALLERY_EMBEDDING_DIMENSION:
-        return embedding[:GALLERY_EMBEDDING_DIMENSION]
-    return embedding + [0.0] * (GALLERY_EMBEDDING_DIMENSION - len(embedding))
-
-
-async def _get_gallery_query_embedding(query: str, db: AsyncSession) -> list[float]:
+async def get_gallery_query_embeddings(queries: list[str], db: AsyncSession) -> dict[str, list[float]]:
+    """
+    Embeddings of gallery search terms keyed by normalized term. Known terms
+    come from memory or ``manager.embedding``; the rest are embedded in a
+    single request and stored.
+    """
     embedding_repo = EmbeddingRepository(db)
-    cached_embedding = await embedding_repo.find_by_term(query)
-    if cached_embedding:
-        return list(cached_embedding.embedding)
+    found = await embedding_repo.find_embeddings_by_terms(queries)
+
+    missing = sorted({
+        term for term in map(embedding_repo.normalize_term, queries)
+        if term and term not in found
+    })
+    if not missing:
+        return found
 
     model_repo = ModelRepository(db)
     embedding_model = await model_repo.get_default_embedding_model()
-    embedding_json = await embeddings(query, embedding_model.openrouter_id)
-    query_embedding = _fit_gallery_embedding(embedding_json["data"][0]["embedding"])
+    embedding_json = await embeddings(missing, embedding_model.openrouter_id)
+    data = sorted(embedding_json["data"], key=lambda item: item.get("index", 0))
+
+    created = {
+        term: reduce_embedding(item["embedding"])
+        for term, item in zip(missing, data)
+    }
+    await embedding_repo.insert_terms(created)
+    return {**found, **created}
+
 
-    await embedding_repo.insert_term(query, query_embedding)
-    return query_embedding
+async def _get_gallery_query_embedding(query: str, db: AsyncSession) -> Optional[list[float]]:
+    """Embedding of a gallery search term, or None when nothing is left after normalizing it."""
+    query_embeddings = await get_gallery_query_embeddings([query], db)
+    return query_embeddings.get(EmbeddingRepository.normalize_term(query))
+
+
+async def warm_gallery_embeddings() -> None:
+    """
+    Fill the in-memory term cache on startup: recent terms from the table,
+    plus GALLERY_WARMUP_TERMS (comma separated) embedded in one batch if new.
+    """
+    terms = [term for term in (get_env_var("GALLERY_WARMUP_TERMS") or "").split(",") if term.strip()]
+    try:
+        async with PgConnection() as db:
+            loaded = await EmbeddingRepository(db).warm_term_cache()
+            if terms:
+                await get_gallery_query_embeddings(terms, db)
+    except Exception as error:
+        await logger.error("Gallery", "Warmup", str(error))
+        return
+
+    await logger.info("Gallery", "Warmup", f"Loaded {loaded} term embeddings, {len(terms)} warmup terms.")
 
 
 async def list_images(
@@ -120,6 +151,9 @@ async def search_images(
         db: AsyncSession
 ) -> str:
     query_embedding = await _get_gallery_query_embedding(query, db)
+    if query_embedding is None:
+        return f"*Nenhuma imagem encontrada*\n\nNao encontrei imagens relacionadas a: _{query}_"
+
     media_repo = MediaRepository(db)
 
     if user_id:
@@ -0,0 +1,487 @@
+"""
+Webhook Ingestion Queue
+
+Decouples the Evolution webhook endpoint from message processing. Incoming
+events are enqueued and drained by a fixed pool of workers, so a burst of
+group traffic never spawns more concurrent database sessions than there are
+workers.
+
+Events are dispatched into a keyed executor with one lane per chat id
+(``remoteJid``): messages of a single chat are processed strictly in order,
+while different chats run in parallel up to the worker limit. Idle lanes are
+evicted, so thousands of quiet groups cost nothing between bursts.
+
+Backends:
+- ``memory`` (default): bounded in-process queues, lost on restart. Order
+  only holds inside one process, so this backend refuses to start in a
+  second process on the same host; deployments with several gunicorn
+  workers use ``redis``.
+- ``redis``: events are appended to one of ``WEBHOOK_QUEUE_PARTITIONS``
+  Redis streams, chosen by chat id, and every partition is read by a single
+  process at a time: the one holding its lease. Every process handling
+  webhooks takes an even share of the partitions, so a chat always has one
+  owner even with several gunicorn workers. A process that takes over a
+  partition, after a crash, a restart or a rebalance, first claims the
+  events the previous owner left unacknowledged.
+"""
+import asyncio
+import fcntl
+import json
+import math
+import os
+import socket
+import tempfile
+import time
+import traceback
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from api.routes.webhook.evolution.services import process_webhook
+from log import logger
+from scheduler import scheduler
+from services.redis_client import get_redis_client
+from utils import get_env_var
+from utils.keyed_executor import KeyedExecutor
+
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_SIZE = 1000
+DEFAULT_ENQUEUE_TIMEOUT_SECONDS = 2.0
+DEFAULT_LANE_SIZE = 100
+DEFAULT_LANE_IDLE_SECONDS = 60.0
+DEFAULT_PARTITIONS = 16
+DRAIN_TIMEOUT_SECONDS = 30.0
+LATENCY_SAMPLES = 1000
+
+MEMORY_LOCK_PATH = os.path.join(tempfile.gettempdir(), "gork-webhook-queue.lock")
+
+STREAM_PREFIX = "webhook:evolution:stream"
+STREAM_CONSUMERS_KEY = f"{STREAM_PREFIX}:consumers"
+STREAM_GROUP = "webhook-workers"
+STREAM_BLOCK_MS = 1000
+STREAM_CLAIM_BATCH = 100
+STREAM_LEASE_MS = 15_000
+
+# Leases are only renewed or released by the process holding them.
+RENEW_LEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class WebhookJob:
+    body: dict
+    chat_id: str
+    enqueued_at: float
+    stream_id: Optional[str] = None
+    partition: Optional[int] = None
+
+
+def chat_id_from_body(body: dict) -> str:
+    key = (body.get("data") or {}).get("key") or {}
+    return key.get("remoteJid") or key.get("remoteJidAlt") or ""
+
+
+def _percentile(samples: deque, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def _stream_key(partition: int) -> str:
+    return f"{STREAM_PREFIX}:{partition}"
+
+
+def _lease_key(partition: int) -> str:
+    return f"{STREAM_PREFIX}:{partition}:owner"
+
+
+class WebhookQueue:
+    def __init__(
+            self,
+            workers: int = DEFAULT_WORKERS,
+            max_size: int = DEFAULT_MAX_SIZE,
+            backend: str = "memory",
+            enqueue_timeout: float = DEFAULT_ENQUEUE_TIMEOUT_SECONDS,
+            lane_size: int = DEFAULT_LANE_SIZE,
+            lane_idle_timeout: float = DEFAULT_LANE_IDLE_SECONDS,
+            partitions: int = DEFAULT_PARTITIONS,
+    ):
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.backend = backend
+        self.enqueue_timeout = enqueue_timeout
+        self.lane_size = lane_size
+        self.lane_idle_timeout = lane_idle_timeout
+        self.partitions = max(1, partitions)
+
+        self._executor: KeyedExecutor[WebhookJob] | None = None
+        self._reader: asyncio.Task | None = None
+        self._leaser: asyncio.Task | None = None
+        self._lock_file = None
+        self._consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._accepting = False
+
+        # Partitions whose lease this process holds; of those, the ones still
+        # to be claimed from the previous owner, the ones being read, and the
+        # ones handed back once their dispatched events are done.
+        self._owned: set[int] = set()
+        self._claim_needed: set[int] = set()
+        self._reading: set[int] = set()
+        self._releasing: set[int] = set()
+        # Stream ids are only unique within one partition's stream.
+        self._in_flight: set[tuple[int, str]] = set()
+
+        self._enqueued = 0
+        self._rejected = 0
+        self._processed = 0
+        self._failed = 0
+        self._wait_times: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._durations: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    @property
+    def uses_redis(self) -> bool:
+        return self.backend == "redis"
+
+    async def start(self) -> None:
+        if self._executor:
+            return
+
+        if not self.uses_redis:
+            self._lock_single_process()
+
+        self._executor = KeyedExecutor(
+            handler=self._process,
+            max_concurrency=self.workers,
+            max_pending=self.max_size,
+            lane_size=self.lane_size,
+            idle_timeout=self.lane_idle_timeout,
+            on_error=self._on_error,
+        )
+
+        if self.uses_redis:
+            await self._ensure_stream_groups()
+            self._leaser = asyncio.create_task(self._hold_partitions(), name="webhook_stream_leaser")
+            self._reader = asyncio.create_task(self._read_stream(), name="webhook_stream_reader")
+
+        self._accepting = True
+        await logger.info(
+            "WebhookQueue",
+            "Start",
+            f"Backend: {self.backend} - Workers: {self.workers} - Max size: {self.max_size}",
+        )
+
+    async def stop(self, timeout: float = DRAIN_TIMEOUT_SECONDS) -> None:
+        self._accepting = False
+
+        if self._reader:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+
+        if self._executor:
+            left = self.depth()
+            if not await self._executor.close(timeout=timeout):
+                await logger.warn("WebhookQueue", "DrainTimeout", f"{left} events left in queue.")
+            self._executor = None
+
+        # Leases are renewed until the drain ends, so no other process claims
+        # an event that is still being handled here.
+        if self._leaser:
+            self._leaser.cancel()
+            await asyncio.gather(self._leaser, return_exceptions=True)
+            self._leaser = None
+            await self._release_partitions()
+
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def put(self, body: dict) -> bool:
+        """Enqueue a webhook event. Returns False when the queue is full."""
+        if not self._accepting or not self._executor:
+            return False
+
+        if self.uses_redis:
+            return await self._put_stream(body)
+
+        job = WebhookJob(body=body, chat_id=chat_id_from_body(body), enqueued_at=time.time())
+        if not await self._executor.submit(job.chat_id, job, timeout=self.enqueue_timeout):
+            self._rejected += 1
+            return False
+
+        self._enqueued += 1
+        return True
+
+    def depth(self) -> int:
+        return self._executor.pending if self._executor else 0
+
+    def metrics(self) -> dict:
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "depth": self.depth(),
+            "active_chats": self._executor.lanes if self._executor else 0,
+            "owned_partitions": len(self._owned),
+            "max_size": self.max_size,
+            "enqueued": self._enqueued,
+            "rejected": self._rejected,
+            "processed": self._processed,
+            "failed": self._failed,
+            "wait_p50_ms": _percentile(self._wait_times, 50) * 1000,
+            "wait_p99_ms": _percentile(self._wait_times, 99) * 1000,
+            "process_p50_ms": _percentile(self._durations, 50) * 1000,
+            "process_p99_ms": _percentile(self._durations, 99) * 1000,
+        }
+
+    def partition_of(self, chat_id: str) -> int:
+        return zlib.crc32(chat_id.encode()) % self.partitions
+
+    def _lock_single_process(self) -> None:
+        lock_file = open(MEMORY_LOCK_PATH, "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(
+                "The memory webhook queue keeps chats in order inside one process only; "
+                "run a single worker or set WEBHOOK_QUEUE_BACKEND=redis."
+            )
+        self._lock_file = lock_file
+
+    async def _process(self, job: WebhookJob) -> None:
+        self._wait_times.append(max(0.0, time.time() - job.enqueued_at))
+        started = time.monotonic()
+        try:
+            await process_webhook(job.body, scheduler)
+            self._processed += 1
+        finally:
+            self._durations.append(time.monotonic() - started)
+            if job.stream_id:
+                await self._ack(job.partition, job.stream_id)
+                self._in_flight.discard((job.partition, job.stream_id))
+
+    async def _on_error(self, chat_id: str, job: WebhookJob, exc: Exception) -> None:
+        self._failed += 1
+        tb = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+        await logger.error("WebhookQueue", "ProcessError", f"{chat_id}: {exc}\n{tb}")
+
+    async def _ensure_stream_groups(self) -> None:
+        client = get_redis_client()
+        for partition in range(self.partitions):
+            try:
+                await client.xgroup_create(_stream_key(partition), STREAM_GROUP, id="0", mkstream=True)
+            except Exception as error:
+                if "BUSYGROUP" not in str(error):
+                    raise
+
+    async def _put_stream(self, body: dict) -> bool:
+        chat_id = chat_id_from_body(body)
+        try:
+            client = get_redis_client()
+            async with client.pipeline(transaction=False) as pipe:
+                for partition in range(self.partitions):
+                    pipe.xlen(_stream_key(partition))
+                if sum(await pipe.execute()) >= self.max_size:
+                    self._rejected += 1
+                    return False
+
+            await client.xadd(
+                _stream_key(self.partition_of(chat_id)),
+                {"chat_id": chat_id, "body": json.dumps(body)},
+            )
+        except Exception as error:
+            await logger.error("WebhookQueue", "StreamPutError", str(error))
+            self._rejected += 1
+            return False
+
+        self._enqueued += 1
+        return True
+
+    async def _hold_partitions(self) -> None:
+        client = get_redis_client()
+        while True:
+            try:
+                await self._balance_partitions(client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                await logger.error("WebhookQueue", "StreamLeaseError", str(error))
+            await asyncio.sleep(STREAM_LEASE_MS / 3000)
+
+    async def _balance_partitions(self, client) -> None:
+        """
+        Renew the leases held, then take free partitions up to an even share
+        among the live consumers, or mark the surplus for release.
+        """
+        now = time.time()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zadd(STREAM_CONSUMERS_KEY, {self._consumer: now})
+            pipe.zremrangebyscore(STREAM_CONSUMERS_KEY, "-inf", now - STREAM_LEASE_MS / 1000)
+            pipe.zcard(STREAM_CONSUMERS_KEY)
+            *_, consumers = await pipe.execute()
+        share = math.ceil(self.partitions / max(1, consumers))
+
+        renew = client.register_script(RENEW_LEASE_SCRIPT)
+        for partition in sorted(self._owned):
+            if not await renew(keys=[_lease_key(partition)], args=[self._consumer, STREAM_LEASE_MS]):
+                self._drop_partition(partition)
+                await logger.warn("WebhookQueue", "PartitionLost", f"Partition {partition}")
+
+        for partition in range(self.partitions if self._accepting else 0):
+            if len(self._owned) >= share:
+                break
+            if partition in self._owned:
+                continue
+            if await client.set(_lease_key(partition), self._consumer, nx=True, px=STREAM_LEASE_MS):
+                self._owned.add(partition)
+                self._claim_needed.add(partition)
+
+        surplus = len(self._owned) - len(self._releasing) - share
+        if surplus > 0:
+            for partition in sorted(self._owned - self._releasing, reverse=True)[:surplus]:
+                self._releasing.add(partition)
+                self._reading.discard(partition)
+                self._claim_needed.discard(partition)
+
+    def _drop_partition(self, partition: int) -> None:
+        self._owned.discard(partition)
+        self._claim_needed.discard(partition)
+        self._reading.discard(partition)
+        self._releasing.discard(partition)
+
+    def _partition_busy(self, partition: int) -> bool:
+        return any(owner == partition for owner, _ in self._in_flight)
+
+    async def _release_lease(self, client, partition: int) -> None:
+        release = client.register_script(RELEASE_LEASE_SCRIPT)
+        await release(keys=[_lease_key(partition)], args=[self._consumer])
+        self._drop_partition(partition)
+
+    async def _release_partitions(self) -> None:
+        try:
+            client = get_redis_client()
+            for partition in sorted(self._owned):
+                await self._release_lease(client, partition)
+            await client.zrem(STREAM_CONSUMERS_KEY, self._consumer)
+        except Exception as error:
+            await logger.error("WebhookQueue", "StreamLeaseError", str(error))
+
+    async def _claim_pending(self, client, partition: int) -> None:
+        """
+        Claim every event the previous owners of ``partition`` left
+        unacknowledged, following the cursor until the pending list is
+        exhausted.
+        """
+        cursor = "0-0"
+        while True:
+            cursor, claimed, *_ = await client.xautoclaim(
+                _stream_key(partition),
+                STREAM_GROUP,
+                self._consumer,
+                0,
+                start_id=cursor,
+                count=STREAM_CLAIM_BATCH,
+            )
+            await self._dispatch_stream_entries(partition, claimed)
+            if cursor == "0-0":
+                return
+
+    async def _read_stream(self) -> None:
+        client = get_redis_client()
+        keys = {_stream_key(partition): partition for partition in range(self.partitions)}
+
+        while True:
+            try:
+                # Handed back between reads, once its dispatched events are
+                # done, so the next owner never starts a chat's event while an
+                # earlier one is still running here.
+                for partition in sorted(self._releasing):
+                    if not self._partition_busy(partition):
+                        await self._release_lease(client, partition)
+
+                # A new partition is read only after its pending events are
+                # dispatched, so they run before the newer ones.
+                for partition in sorted(self._claim_needed):
+                    await self._claim_pending(client, partition)
+                    if partition in self._claim_needed:
+                        self._claim_needed.discard(partition)
+                        self._reading.add(partition)
+
+                if not self._reading:
+                    await asyncio.sleep(STREAM_BLOCK_MS / 1000)
+                    continue
+
+                response = await client.xreadgroup(
+                    STREAM_GROUP,
+                    self._consumer,
+                    {_stream_key(partition): ">" for partition in sorted(self._reading)},
+                    count=self.workers,
+                    block=STREAM_BLOCK_MS,
+                )
+                for key, entries in response or []:
+                    await self._dispatch_stream_entries(keys[key], entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                await logger.error("WebhookQueue", "StreamReadError", str(error))
+                await asyncio.sleep(1)
+
+    async def _dispatch_stream_entries(self, partition: int, entries: list) -> None:
+        jobs = []
+        for stream_id, fields in entries:
+            # An event can be claimed back while this process still handles
+            # it, after the partition was lost and taken again.
+            if not fields or (partition, stream_id) in self._in_flight:
+                continue
+
+            # Marked before the first await, so the partition counts as busy
+            # until every event of the batch is done.
+            self._in_flight.add((partition, stream_id))
+            jobs.append(WebhookJob(
+                body=json.loads(fields["body"]),
+                chat_id=fields.get("chat_id", ""),
+                enqueued_at=int(stream_id.split("-")[0]) / 1000,
+                stream_id=stream_id,
+                partition=partition,
+            ))
+
+        for job in jobs:
+            # Waiting for room blocks the reader while the executor is full,
+            # leaving the remaining events buffered in Redis instead of memory.
+            while not await self._executor.submit(job.chat_id, job, timeout=self.enqueue_timeout):
+                await asyncio.sleep(0.1)
+
+    async def _ack(self, partition: int, stream_id: str) -> None:
+        try:
+            client = get_redis_client()
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.xack(_stream_key(partition), STREAM_GROUP, stream_id)
+                pipe.xdel(_stream_key(partition), stream_id)
+                await pipe.execute()
+        except Exception as error:
+            await logger.error("WebhookQueue", "StreamAckError", str(error))
+
+
+webhook_queue = WebhookQueue(
+    workers=int(get_env_var("WEBHOOK_QUEUE_WORKERS") or DEFAULT_WORKERS),
+    max_size=int(get_env_var("WEBHOOK_QUEUE_MAX_SIZE") or DEFAULT_MAX_SIZE),
+    backend=(get_env_var("WEBHOOK_QUEUE_BACKEND") or "memory").lower(),
+    enqueue_timeout=float(get_env_var("WEBHOOK_QUEUE_ENQUEUE_TIMEOUT") or DEFAULT_ENQUEUE_TIMEOUT_SECONDS),
+    lane_size=int(get_env_var("WEBHOOK_QUEUE_LANE_SIZE") or DEFAULT_LANE_SIZE),
+    lane_idle_timeout=float(get_env_var("WEBHOOK_QUEUE_LANE_IDLE_SECONDS") or DEFAULT_LANE_IDLE_SECONDS),
+    partitions=int(get_env_var("WEBHOOK_QUEUE_PARTITIONS") or DEFAULT_PARTITIONS),
+)
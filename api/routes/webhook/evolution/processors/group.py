@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -6,11 +7,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from api.routes.webhook.evolution.handles.audio import transcribe_audio
 from api.routes.webhook.evolution.handles.core import is_message_too_old
 from api.routes.webhook.evolution.processors.common import process_commands
-from database.operations.base import GroupRepository, UserRepository, WhiteListRepository
+from database import PgConnection
+from database.models.base import Group
+from database.operations.base import GroupRepository, UserRepository
 from database.operations.content import MessageRepository
 from external.evolution import get_group_info, send_message
 from log import logger
-from services import save_image_if_new, save_profile_pic, save_video_if_new, verifiy_media
+from services import run_in_background, save_profile_pic, verifiy_media
+from services.media_queue import media_queue
 from services.message_buffer import buffer_group_message, clear_group_message_buffer
 from utils import INSTANCE_NUMBER
 
@@ -33,73 +37,26 @@ async def process_group_message(
         return
 
     user_repo = UserRepository(db)
-    group_repo = GroupRepository(db)
     message_repo = MessageRepository(db)
-    whitelist_repo = WhiteListRepository(db)
     user_gork = await user_repo.find_by_phone(INSTANCE_NUMBER)
 
-    user = await user_repo.find_or_create(name=contact_name, lid=contact_id, phone_number=phone_number)
-    _ = await save_profile_pic(user.id)
-
-    group = await group_repo.find_or_create(group_jid=group_jid)
-
-    if not group.name:
-        gp_infos = get_group_info(remote_id)
-        group = await group_repo.find_or_create(
-            group_jid=group_jid,
-            name=gp_infos["subject"],
-            description=gp_infos.get("desc"),
-        )
-
-    is_whitelisted = await whitelist_repo.is_whitelisted(
-        sender_type="group",
-        sender_id=group.id
-    )
-
     conversation = context_message.get("text_message", "")
-    quoted_message_ext_id = context_message.get("quoted_message")
-    quoted_message = (
-        await message_repo.find_by_message_id(quoted_message_ext_id)
-        if quoted_message_ext_id
-        else None
-    )
-
-    db_message = await message_repo.find_or_create(
+    ingestion = await message_repo.ingest_group_message(
         message_id=message_id,
-        sender_id=user.id,
-        group_id=group.id,
+        lid=contact_id,
+        group_jid=group_jid,
         content=conversation,
         created_at=datetime.fromtimestamp(event_data["messageTimestamp"]),
-        quoted_message_id=quoted_message.id if quoted_message else None
+        phone_number=phone_number,
+        name=contact_name,
+        quoted_message_id=context_message.get("quoted_message"),
     )
+    user = ingestion.user
+    group = ingestion.group
+    db_message = ingestion.message
+    is_whitelisted = ingestion.is_whitelisted
 
-    if context_message.get("image_message"):
-        media_message = await save_image_if_new(
-            db=db,
-            user_id=user.id,
-            message_id=message_id,
-            image_message_id=context_message["image_message"],
-            group_id=group.id,
-        )
-        media_id = media_message.id if media_message else None
-    elif context_message.get("video_message"):
-        video_id = context_message.get("video_message")
-        media_message = await save_video_if_new(
-            db=db,
-            user_id=user.id,
-            message_id=message_id,
-            video_message_id=video_id,
-            group_id=group.id,
-        )
-        media_id = media_message.id if media_message else None
-    else:
-        media_id = None
-
-    if media_id:
-        db_message = await message_repo.update(db_message.id, {"media_id": media_id})
-
-    if not is_whitelisted:
-        return
+    run_in_background(save_profile_pic(user.id), name=f"save_profile_pic:{user.id}")
 
     mentions: list[str] = context_message.get("mentions", [])
 
@@ -115,17 +72,28 @@ async def process_group_message(
                 is_mention = True
 
     is_reply_to_gork = bool(
-        quoted_message
+        ingestion.quoted_message_id
         and user_gork
-        and quoted_message.user_id == user_gork.id
+        and ingestion.quoted_user_id == user_gork.id
     )
 
-    if is_mention or is_reply_to_gork:
-        if group.auto_message:
-            await clear_group_message_buffer(group.id)
+    media_job = await media_queue.enqueue_message_media(
+        db,
+        message_id=db_message.id,
+        user_id=user.id,
+        group_id=group.id,
+        image_message_id=context_message.get("image_message"),
+        video_message_id=context_message.get("video_message"),
+    )
+    refresh_group = _refresh_group_info(remote_id, group_jid) if not group.name else None
+
+    if not is_whitelisted or not (is_mention or is_reply_to_gork):
+        # Nobody is waiting for an answer: media is left to the media queue
+        # workers and the rest runs off this lane.
+        if refresh_group:
+            run_in_background(refresh_group, name=f"refresh_group_info:{group_jid}")
 
-    if not is_mention and not is_reply_to_gork:
-        if group.auto_message:
+        if is_whitelisted and group.auto_message:
             await buffer_group_message(
                 group_id=group.id,
                 message_db_id=db_message.id,
@@ -134,8 +102,26 @@ async def process_group_message(
             )
         return
 
-    if "audio_message" in context_message.keys():
-        conversation = await transcribe_audio(body, user.id, group.id)
+    if group.auto_message:
+        await clear_group_message_buffer(group.id)
+
+    # Independent I/O needed before replying runs concurrently, each branch on
+    # its own session.
+    async with asyncio.TaskGroup() as tg:
+        media_task = tg.create_task(media_queue.run_now(media_job.id)) if media_job else None
+        group_task = tg.create_task(refresh_group) if refresh_group else None
+        audio_task = (
+            tg.create_task(transcribe_audio(body, user.id, group.id))
+            if "audio_message" in context_message.keys()
+            else None
+        )
+
+    if media_task and media_task.result():
+        db_message = await message_repo.set_media(db_message.id, media_task.result())
+    if group_task:
+        group = group_task.result()
+    if audio_task:
+        conversation = audio_task.result()
 
     if "!status" in conversation:
         await send_message(remote_id, "🤖 Robo do mito está pronto", message_id)
@@ -153,3 +139,14 @@ async def process_group_message(
         context_message,
         db_message,
     )
+
+
+async def _refresh_group_info(remote_id: str, group_jid: str) -> Group:
+    gp_infos = await get_group_info(remote_id)
+    async with PgConnection() as db:
+        group_repo = GroupRepository(db)
+        return await group_repo.find_or_create(
+            group_jid=group_jid,
+            name=gp_infos["subject"],
+            description=gp_infos.get("desc"),
+        )
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -9,7 +10,8 @@ from api.routes.webhook.evolution.processors.common import process_commands
 from database.operations.base import UserRepository, WhiteListRepository
 from database.operations.content import MessageRepository
 from external.evolution import send_message
-from services import save_image_if_new, save_profile_pic, save_video_if_new, verifiy_media
+from services import run_in_background, save_profile_pic, verifiy_media
+from services.media_queue import media_queue
 
 
 async def process_private_message(
@@ -32,7 +34,7 @@ async def process_private_message(
     whitelist_repo = WhiteListRepository(db)
 
     user = await user_repo.find_or_create(name=contact_name, lid=remote_id, phone_number=number)
-    _ = await save_profile_pic(user.id)
+    run_in_background(save_profile_pic(user.id), name=f"save_profile_pic:{user.id}")
 
     is_whitelisted = await whitelist_repo.is_whitelisted(
         sender_type="user",
@@ -49,36 +51,30 @@ async def process_private_message(
         created_at=datetime.fromtimestamp(event_data["messageTimestamp"]),
     )
 
-    if context.get("image_message"):
-        media = await save_image_if_new(
-            db=db,
-            user_id=user.id,
-            message_id=message_id,
-            image_message_id=context["image_message"],
-            group_id=None,
-        )
-        media_id = media.id if media else None
-    elif context.get("video_message") or context.get("video_quote"):
-        video_id = context.get("video_message") or context.get("video_quote")
-        media = await save_video_if_new(
-            db=db,
-            user_id=user.id,
-            message_id=message_id,
-            video_message_id=video_id,
-            group_id=None,
-        )
-        media_id = media.id if media else None
-    else:
-        media_id = None
-
-    if media_id:
-        db_message = await message_repo.update(db_message.id, {"media_id": media_id})
+    media_job = await media_queue.enqueue_message_media(
+        db,
+        message_id=db_message.id,
+        user_id=user.id,
+        group_id=None,
+        image_message_id=context.get("image_message"),
+        video_message_id=context.get("video_message") or context.get("video_quote"),
+    )
 
     if not is_whitelisted:
         return
 
-    if "audio_message" in context.keys():
-        conversation = await transcribe_audio(body, user.id, group_id=None)
+    async with asyncio.TaskGroup() as tg:
+        media_task = tg.create_task(media_queue.run_now(media_job.id)) if media_job else None
+        audio_task = (
+            tg.create_task(transcribe_audio(body, user.id, group_id=None))
+            if "audio_message" in context.keys()
+            else None
+        )
+
+    if media_task and media_task.result():
+        db_message = await message_repo.set_media(db_message.id, media_task.result())
+    if audio_task:
+        conversation = audio_task.result()
 
     if "!status" in conversation:
         await send_message(number, "🤖 Robo do mito está pronto", message_id)
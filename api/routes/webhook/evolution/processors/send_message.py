@@ -5,7 +5,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from database.operations.base import GroupRepository, UserRepository
 from database.operations.content import MessageRepository
 from log import logger
-from services import save_image_if_new, save_video_if_new, verifiy_media
+from services import verifiy_media
+from services.media_queue import media_queue
 from utils import INSTANCE_NUMBER
 
 
@@ -51,29 +52,13 @@ async def process_sent_message(
         quoted_message_id=quoted_message.id if quoted_message else None,
     )
 
-    if context_message.get("image_message"):
-        media = await save_image_if_new(
-            db=db,
-            user_id=user_gork.id,
-            message_id=message_id,
-            image_message_id=context_message["image_message"],
-            group_id=group_id,
-        )
-        media_id = media.id
-    elif context_message.get("video_message") or context_message.get("video_quote"):
-        video_id = context_message.get("video_message") or context_message.get("video_quote")
-        media = await save_video_if_new(
-            db=db,
-            user_id=user_gork.id,
-            message_id=message_id,
-            video_message_id=video_id,
-            group_id=group_id,
-        )
-        media_id = media.id if media else None
-    else:
-        media_id = None
-
-    if media_id:
-        await message_repo.update(db_message.id, {"media_id": media_id})
+    _ = await media_queue.enqueue_message_media(
+        db,
+        message_id=db_message.id,
+        user_id=user_gork.id,
+        group_id=group_id,
+        image_message_id=context_message.get("image_message"),
+        video_message_id=context_message.get("video_message") or context_message.get("video_quote"),
+    )
 
     return
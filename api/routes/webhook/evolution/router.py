@@ -1,12 +1,10 @@
-import asyncio
-import traceback
-
 from fastapi import APIRouter, HTTPException, Request
 from starlette import status
 
-from api.routes.webhook.evolution.services import process_webhook
+from api.routes.webhook.evolution.ingestion import webhook_queue
+from embeddings import embedding_batcher
 from log import logger, other_webhooks_logger
-from scheduler import scheduler
+from services.media_queue import media_queue
 from utils import get_env_var
 
 
@@ -18,18 +16,6 @@ router = APIRouter(
 EVOLUTION_INSTANCE_KEY = get_env_var("EVOLUTION_INSTANCE_KEY")
 
 
-def _handle_webhook_task_exception(task: asyncio.Task) -> None:
-    if task.cancelled():
-        return
-
-    exc = task.exception()
-    if exc:
-        tb = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
-        asyncio.create_task(
-            logger.error("Webhook", "TaskError", f"{task.get_name()}: {exc}\n{tb}")
-        )
-
-
 @router.post("")
 async def evolution_webhook(request: Request):
     try:
@@ -48,10 +34,28 @@ async def evolution_webhook(request: Request):
             detail="Invalid API key"
         )
 
-    task = asyncio.create_task(
-        process_webhook(body, scheduler),
-        name=f"process_webhook:{body.get('event')}",
-    )
-    task.add_done_callback(_handle_webhook_task_exception)
+    accepted = await webhook_queue.put(body)
+    if not accepted:
+        await logger.warn("Webhook", "QueueFull", f"Rejected event {body.get('event')}.")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Webhook queue is full",
+            headers={"Retry-After": "1"},
+        )
 
     return {"status": "received"}
+
+
+@router.get("/metrics")
+async def evolution_webhook_metrics(request: Request):
+    if request.headers.get("apikey") != EVOLUTION_INSTANCE_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key"
+        )
+
+    return {
+        **webhook_queue.metrics(),
+        "media": media_queue.metrics(),
+        "embeddings": embedding_batcher.metrics(),
+    }
@@ -0,0 +1,205 @@
+""" Gallery Search Benchmark
+
+Measures latency and recall of the description-embedding search used by
+``!gallery <term>`` (see ``MediaRepository._semantic_search``): an exact
+cosine ranking, the HNSW index on the ``halfvec`` embedding, and the 1-bit
+binary-quantized HNSW index rescored with the ``halfvec`` distance.
+
+Each size fills a TEMP table with normalized random vectors grouped in
+clusters, builds both HNSW indexes of the migrations and queries with
+perturbed copies of stored vectors. Recall is the share of the exact top-k
+that the index returns.
+
+Usage:
+python -m benchmarks.gallery_search
+python -m benchmarks.gallery_search --sizes 10000 100000 --queries 30 --ef-search 40 100 200
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import bindparam, text
+
+from database import dispose_database_engine, PgConnection
+from database.operations.content.media import BINARY_RESCORE_FACTOR, HNSW_EF_SEARCH
+from utils import EMBEDDING_DIMENSION
+
+
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_QUERIES = 30
+DEFAULT_LIMIT = 10
+DEFAULT_CLUSTERS = 200
+LATENCY_BUDGET_MS = 100.0
+
+_CREATE = f"""
+    CREATE TEMP TABLE gallery_bench (
+        id SERIAL PRIMARY KEY,
+        embedding halfvec({EMBEDDING_DIMENSION}) NOT NULL
+    )
+"""
+# Descriptions are not uniformly spread, so rows are noisy copies of a
+# fixed set of centroids rather than pure noise.
+_CENTROIDS = f"""
+    CREATE TEMP TABLE gallery_bench_centroid AS
+    SELECT c AS id, ARRAY(SELECT random() - 0.5 FROM generate_series(1, {EMBEDDING_DIMENSION}) WHERE c > 0) AS v
+    FROM generate_series(1, :clusters) AS c
+"""
+_FILL = f"""
+    INSERT INTO gallery_bench (embedding)
+    SELECT l2_normalize(ARRAY(
+        SELECT centroid.v[i] + (random() - 0.5) * 0.5
+        FROM generate_series(1, {EMBEDDING_DIMENSION}) AS i
+    )::vector)::halfvec({EMBEDDING_DIMENSION})
+    FROM generate_series(1, :size) AS n
+    JOIN gallery_bench_centroid AS centroid ON centroid.id = 1 + n % :clusters
+"""
+_INDEXES = {
+    "hnsw": """
+        CREATE INDEX gallery_bench_hnsw ON gallery_bench
+        USING hnsw (embedding halfvec_cosine_ops)
+        WITH (m = 16, ef_construction = 64)
+    """,
+    "binary": f"""
+        CREATE INDEX gallery_bench_binary ON gallery_bench
+        USING hnsw ((binary_quantize(embedding)::bit({EMBEDDING_DIMENSION})) bit_hamming_ops)
+        WITH (m = 16, ef_construction = 64)
+    """,
+}
+
+_EMBEDDING = bindparam("embedding", type_=HALFVEC(EMBEDDING_DIMENSION))
+# The index is used only when the ORDER BY matches it, so the exact ranking
+# goes through a subquery the planner cannot push the ordering into.
+_EXACT = text(f"""
+    SELECT id FROM (
+        SELECT id, embedding <=> CAST(:embedding AS halfvec({EMBEDDING_DIMENSION})) AS distance
+        FROM gallery_bench
+        OFFSET 0
+    ) AS ranked
+    ORDER BY distance
+    LIMIT :limit
+""").bindparams(_EMBEDDING)
+_QUERIES = {
+    "hnsw": text(f"""
+        SELECT id FROM gallery_bench
+        ORDER BY embedding <=> CAST(:embedding AS halfvec({EMBEDDING_DIMENSION}))
+        LIMIT :limit
+    """).bindparams(_EMBEDDING),
+    "binary": text(f"""
+        SELECT candidate.id
+        FROM (
+            SELECT id, embedding FROM gallery_bench
+            ORDER BY binary_quantize(embedding)::bit({EMBEDDING_DIMENSION})
+                <~> binary_quantize(CAST(:embedding AS halfvec({EMBEDDING_DIMENSION})))
+            LIMIT :candidates
+        ) AS candidate
+        ORDER BY candidate.embedding <=> CAST(:embedding AS halfvec({EMBEDDING_DIMENSION}))
+        LIMIT :limit
+    """).bindparams(_EMBEDDING),
+}
+
+
+async def _timed_ids(db, query, params: dict) -> tuple[float, list[int]]:
+    start = time.perf_counter()
+    ids = (await db.execute(query, params)).scalars().all()
+    return (time.perf_counter() - start) * 1000, ids
+
+
+def _p95(values: list[float]) -> float:
+    return statistics.quantiles(values, n=20)[-1] if len(values) > 1 else values[0]
+
+
+async def bench_size(size: int, queries: int, limit: int, clusters: int, ef_searches: list[int]) -> list[dict]:
+    async with PgConnection() as db:
+        await db.execute(text("DROP TABLE IF EXISTS gallery_bench"))
+        await db.execute(text("DROP TABLE IF EXISTS gallery_bench_centroid"))
+        await db.execute(text(_CREATE))
+        await db.execute(text(_CENTROIDS), {"clusters": clusters})
+        await db.execute(text(_FILL), {"size": size, "clusters": clusters})
+
+        build_s, index_mb = {}, {}
+        for method, statement in _INDEXES.items():
+            start = time.perf_counter()
+            await db.execute(text(statement))
+            build_s[method] = time.perf_counter() - start
+            index_mb[method] = (await db.execute(
+                text("SELECT pg_relation_size(CAST(:index AS regclass)) / 1048576.0"),
+                {"index": f"gallery_bench_{method}"},
+            )).scalar_one()
+        await db.execute(text("ANALYZE gallery_bench"))
+
+        sample = (await db.execute(
+            text("SELECT embedding FROM gallery_bench ORDER BY random() LIMIT :queries")
+            .columns(embedding=HALFVEC(EMBEDDING_DIMENSION)),
+            {"queries": queries},
+        )).scalars().all()
+        targets = [[value + random.uniform(-0.01, 0.01) for value in vector.to_list()] for vector in sample]
+
+        exact_ms, exact_ids = [], []
+        for target in targets:
+            elapsed, ids = await _timed_ids(db, _EXACT, {"embedding": target, "limit": limit})
+            exact_ms.append(elapsed)
+            exact_ids.append(set(ids))
+
+        results = [{
+            "size": size, "method": "exact", "build_s": 0.0, "index_mb": 0.0, "recall": 1.0,
+            "p50_ms": statistics.median(exact_ms), "p95_ms": _p95(exact_ms),
+        }]
+
+        for method, query in _QUERIES.items():
+            for ef_search in ef_searches:
+                candidates = limit * BINARY_RESCORE_FACTOR if method == "binary" else limit
+                await db.execute(
+                    text("SELECT set_config('hnsw.ef_search', :ef, true)"),
+                    {"ef": str(max(ef_search, candidates))},
+                )
+                method_ms, recalls = [], []
+                for target, expected in zip(targets, exact_ids):
+                    elapsed, ids = await _timed_ids(
+                        db, query, {"embedding": target, "limit": limit, "candidates": candidates}
+                    )
+                    method_ms.append(elapsed)
+                    recalls.append(len(expected & set(ids)) / len(expected) if expected else 1.0)
+
+                results.append({
+                    "size": size, "method": f"{method} ef={ef_search}",
+                    "build_s": build_s[method], "index_mb": float(index_mb[method]),
+                    "recall": statistics.mean(recalls),
+                    "p50_ms": statistics.median(method_ms), "p95_ms": _p95(method_ms),
+                })
+
+        await db.rollback()
+
+    return results
+
+
+async def main(sizes: list[int], queries: int, limit: int, clusters: int, ef_searches: list[int]) -> None:
+    print(
+        f"{'rows':>8} | {'method':<15} | {'build (s)':>9} | {'index (MB)':>10} | "
+        f"{'recall@' + str(limit):>9} | {'p50 (ms)':>8} | {'p95 (ms)':>8}"
+    )
+    try:
+        for size in sizes:
+            for row in await bench_size(size, queries, limit, clusters, ef_searches):
+                flag = "" if row["p95_ms"] <= LATENCY_BUDGET_MS else "  > budget"
+                print(
+                    f"{row['size']:>8} | {row['method']:<15} | {row['build_s']:>9.1f} | {row['index_mb']:>10.1f} | "
+                    f"{row['recall']:>9.3f} | "
+                    f"{row['p50_ms']:>8.2f} | {row['p95_ms']:>8.2f}{flag}"
+                )
+    finally:
+        await dispose_database_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark gallery semantic search.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--clusters", type=int, default=DEFAULT_CLUSTERS)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, HNSW_EF_SEARCH, 200])
+    args = parser.parse_args()
+
+    asyncio.run(main(args.sizes, args.queries, args.limit, args.clusters, args.ef_search))
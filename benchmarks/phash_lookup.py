@@ -0,0 +1,141 @@
+""" phash Lookup Benchmark
+
+Compares the near-duplicate image lookup as a full scan over ``phash`` with
+the band-indexed (multi-index hashing) query used by
+``MediaRepository.find_by_similar_phash``.
+
+Each size fills a TEMP table shaped like ``content.media`` (phash plus the
+generated band columns and their indexes) with random hashes, then looks up
+perturbed copies of stored hashes, so every query has a match within
+``max_distance``. Both queries must agree on the distance they return.
+
+Usage:
+python -m benchmarks.phash_lookup
+python -m benchmarks.phash_lookup --sizes 10000 100000 1000000 --queries 50
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+from database import dispose_database_engine, PgConnection
+from utils.hash import phash_band_candidates
+
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_QUERIES = 50
+DEFAULT_MAX_DISTANCE = 8
+
+_CREATE = """
+    CREATE TEMP TABLE phash_bench (
+        id SERIAL PRIMARY KEY,
+        phash BIGINT,
+        phash_b0 INTEGER GENERATED ALWAYS AS (((phash >> 48) & 65535)::integer) STORED,
+        phash_b1 INTEGER GENERATED ALWAYS AS (((phash >> 32) & 65535)::integer) STORED,
+        phash_b2 INTEGER GENERATED ALWAYS AS (((phash >> 16) & 65535)::integer) STORED,
+        phash_b3 INTEGER GENERATED ALWAYS AS ((phash & 65535)::integer) STORED
+    )
+"""
+_FILL = """
+    INSERT INTO phash_bench (phash)
+    SELECT ('x' || substr(md5(random()::text || n::text), 1, 16))::bit(64)::bigint
+    FROM generate_series(1, :size) AS n
+"""
+_INDEXES = [f"CREATE INDEX ON phash_bench (phash_b{band})" for band in range(4)]
+
+_SCAN = """
+    SELECT id, bit_count((phash # CAST(:phash AS bigint))::bit(64)) AS distance
+    FROM phash_bench
+    WHERE phash IS NOT NULL
+      AND bit_count((phash # CAST(:phash AS bigint))::bit(64)) <= :max_distance
+    ORDER BY distance
+    LIMIT 1
+"""
+_BANDED = """
+    SELECT id, bit_count((phash # CAST(:phash AS bigint))::bit(64)) AS distance
+    FROM phash_bench
+    WHERE (phash_b0 = ANY(CAST(:b0 AS integer[]))
+        OR phash_b1 = ANY(CAST(:b1 AS integer[]))
+        OR phash_b2 = ANY(CAST(:b2 AS integer[]))
+        OR phash_b3 = ANY(CAST(:b3 AS integer[])))
+      AND bit_count((phash # CAST(:phash AS bigint))::bit(64)) <= :max_distance
+    ORDER BY distance
+    LIMIT 1
+"""
+
+
+def _perturb(phash: int, bits: int) -> int:
+    unsigned = phash & 0xFFFF_FFFF_FFFF_FFFF
+    for bit in random.sample(range(64), bits):
+        unsigned ^= 1 << bit
+    return unsigned - (1 << 64) if unsigned >= 1 << 63 else unsigned
+
+
+async def _time_query(db, query: str, params: dict) -> tuple[float, int | None]:
+    start = time.perf_counter()
+    row = (await db.execute(text(query), params)).first()
+    return (time.perf_counter() - start) * 1000, row.distance if row else None
+
+
+async def bench_size(size: int, queries: int, max_distance: int) -> dict:
+    async with PgConnection() as db:
+        await db.execute(text("DROP TABLE IF EXISTS phash_bench"))
+        await db.execute(text(_CREATE))
+        await db.execute(text(_FILL), {"size": size})
+        for statement in _INDEXES:
+            await db.execute(text(statement))
+        await db.execute(text("ANALYZE phash_bench"))
+
+        sample = (await db.execute(
+            text("SELECT phash FROM phash_bench ORDER BY random() LIMIT :queries"),
+            {"queries": queries},
+        )).scalars().all()
+
+        scan_ms, banded_ms = [], []
+        for phash in sample:
+            target = _perturb(phash, random.randint(0, max_distance))
+            params = {"phash": target, "max_distance": max_distance}
+            banded_params = {
+                **params,
+                **{f"b{band}": values for band, values in enumerate(phash_band_candidates(target, max_distance))},
+            }
+
+            scan_time, scan_distance = await _time_query(db, _SCAN, params)
+            banded_time, banded_distance = await _time_query(db, _BANDED, banded_params)
+            if scan_distance != banded_distance:
+                raise AssertionError(f"phash {target}: scan found {scan_distance}, banded found {banded_distance}")
+
+            scan_ms.append(scan_time)
+            banded_ms.append(banded_time)
+
+        await db.rollback()
+
+    return {
+        "size": size,
+        "scan_ms": statistics.median(scan_ms),
+        "banded_ms": statistics.median(banded_ms),
+    }
+
+
+async def main(sizes: list[int], queries: int, max_distance: int) -> None:
+    print(f"{'rows':>10} | {'scan (ms)':>10} | {'banded (ms)':>11} | {'speedup':>7}")
+    try:
+        for size in sizes:
+            result = await bench_size(size, queries, max_distance)
+            speedup = result["scan_ms"] / result["banded_ms"] if result["banded_ms"] else float("inf")
+            print(f"{size:>10} | {result['scan_ms']:>10.2f} | {result['banded_ms']:>11.2f} | {speedup:>6.1f}x")
+    finally:
+        await dispose_database_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate phash lookup.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.sizes, args.queries, args.max_distance))
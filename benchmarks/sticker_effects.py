@@ -0,0 +1,164 @@
+""" Sticker Effects Benchmark
+
+Per-frame cost of the animated sticker effects (``utils.media_render``): the
+first frame pays for building the coordinate map, later frames only for the
+NumPy gather. A per-pixel Python reference of each effect (the previous
+implementation) gives the speedup and the number of pixels that differ
+(NumPy and ``math`` trig can round a coordinate differently at a handful of
+pixels).
+
+Usage:
+python -m benchmarks.sticker_effects
+python -m benchmarks.sticker_effects --size 512 --frames 180 --no-reference
+"""
+import argparse
+import math
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from utils import media_render as effects
+
+
+DEFAULT_SIZE = 512
+DEFAULT_FRAMES = 30
+
+
+def _radial_reference(frame: Image.Image, source) -> Image.Image:
+    """Per-pixel loop: ``source(dx, dy, distance)`` returns the new polar coordinates or None."""
+    img_array = np.array(frame)
+    height, width = img_array.shape[:2]
+    center_x, center_y = width // 2, height // 2
+    new_img = np.copy(img_array)
+    for y in range(height):
+        for x in range(width):
+            dx, dy = x - center_x, y - center_y
+            moved = source(dx, dy, math.sqrt(dx ** 2 + dy ** 2))
+            if moved is None:
+                continue
+            new_distance, angle = moved
+            src_x = int(center_x + new_distance * math.cos(angle))
+            src_y = int(center_y + new_distance * math.sin(angle))
+            if 0 <= src_x < width and 0 <= src_y < height:
+                new_img[y, x] = img_array[src_y, src_x]
+    return Image.fromarray(new_img)
+
+
+def _reference(effect: str, frame: Image.Image, intensity: float) -> Image.Image:
+    width, height = frame.size
+    diagonal = math.sqrt((width // 2) ** 2 + (height // 2) ** 2)
+
+    if effect == "wave":
+        img_array = np.array(frame)
+        new_img = np.copy(img_array)
+        for y in range(height):
+            offset = int(intensity * math.sin(y * 0.1))
+            for x in range(width):
+                new_img[y, x] = img_array[y, (x + offset) % width]
+        return Image.fromarray(new_img)
+
+    def bulge(dx, dy, distance):
+        if distance >= diagonal:
+            return None
+        new_distance = distance * (1 + math.pow(1.0 - distance / diagonal, 2) * intensity)
+        return (new_distance, math.atan2(dy, dx)) if new_distance < diagonal else None
+
+    def pinch(dx, dy, distance):
+        if distance >= diagonal:
+            return None
+        factor = math.pow(1.0 - distance / diagonal, 2) * intensity
+        return distance * (1 - factor * 0.5), math.atan2(dy, dx)
+
+    def swirl(dx, dy, distance):
+        if distance >= diagonal:
+            return None
+        rotation = (1.0 - distance / diagonal) * intensity * math.pi * 2
+        return distance, math.atan2(dy, dx) + rotation
+
+    radius = min(width // 2, height // 2)
+
+    def fisheye(dx, dy, distance):
+        if distance >= radius:
+            return None
+        return radius * math.pow(distance / radius, 1 + intensity), math.atan2(dy, dx)
+
+    sources = {"bulge": bulge, "pinch": pinch, "swirl": swirl, "fisheye": fisheye}
+    return _radial_reference(frame, sources[effect])
+
+
+EFFECTS = {
+    "bulge": (effects._apply_bulge_effect, 0.5),
+    "pinch": (effects._apply_pinch_effect, 0.5),
+    "swirl": (effects._apply_swirl_effect, 0.5),
+    "wave": (effects._apply_wave_effect, 10),
+    "fisheye": (effects._apply_fisheye_effect, 0.5),
+    # Intensity follows the frame progress; its first frame is as cold as any.
+    "breathing": (effects._apply_breathing_effect, None),
+}
+
+
+def bench_effect(name: str, size: int, frames: int, reference: bool) -> dict:
+    apply, intensity = EFFECTS[name]
+    rng = np.random.default_rng(0)
+    frame = Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+
+    for cached_map in (effects._bulge_map, effects._pinch_map, effects._swirl_map,
+                       effects._wave_map, effects._fisheye_map):
+        cached_map.cache_clear()
+
+    def argument(index: int) -> float:
+        return intensity if intensity is not None else index / max(frames - 1, 1)
+
+    start = time.perf_counter()
+    output = apply(frame, argument(0))
+    first_ms = (time.perf_counter() - start) * 1000
+
+    warm_ms = []
+    for index in range(1, frames):
+        start = time.perf_counter()
+        apply(frame, argument(index))
+        warm_ms.append((time.perf_counter() - start) * 1000)
+
+    result = {
+        "effect": name,
+        "first_ms": first_ms,
+        "frame_ms": statistics.median(warm_ms) if warm_ms else first_ms,
+        "sticker_ms": first_ms + sum(warm_ms),
+        "reference_ms": None,
+        "differing": None,
+    }
+
+    if reference and intensity is not None:
+        start = time.perf_counter()
+        expected = _reference(name, frame, intensity)
+        result["reference_ms"] = (time.perf_counter() - start) * 1000
+        result["differing"] = int((np.asarray(expected) != np.asarray(output)).any(axis=-1).sum())
+
+    return result
+
+
+def main(size: int, frames: int, reference: bool) -> None:
+    print(f"{size}x{size}, {frames} frames")
+    print(
+        f"{'effect':<9} | {'1st frame (ms)':>14} | {'frame (ms)':>10} | {'sticker (ms)':>12} | "
+        f"{'loop frame (ms)':>15} | differing px"
+    )
+    for name in EFFECTS:
+        row = bench_effect(name, size, frames, reference)
+        reference_ms = f"{row['reference_ms']:>15.0f}" if row["reference_ms"] is not None else f"{'-':>15}"
+        print(
+            f"{row['effect']:<9} | {row['first_ms']:>14.2f} | {row['frame_ms']:>10.2f} | "
+            f"{row['sticker_ms']:>12.1f} | {reference_ms} | {row['differing'] if row['differing'] is not None else '-'}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark animated sticker effects.")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES)
+    parser.add_argument("--no-reference", dest="reference", action="store_false")
+    args = parser.parse_args()
+
+    main(args.size, args.frames, args.reference)
@@ -0,0 +1,4 @@
+-- media job queue
+-- depends: 20251221_03_i2N4b-fix-message-media-fk
+
+DROP TABLE IF EXISTS "content"."media_job";
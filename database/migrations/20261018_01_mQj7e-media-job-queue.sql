@@ -0,0 +1,24 @@
+-- media job queue
+-- depends: 20251221_03_i2N4b-fix-message-media-fk
+
+CREATE TABLE "content"."media_job" (
+    id SERIAL PRIMARY KEY,
+    message_id INTEGER NOT NULL REFERENCES "content"."message"(id),
+    step VARCHAR(20) NOT NULL DEFAULT 'store',       -- 'store' ou 'describe'
+    type VARCHAR(20) NOT NULL,                       -- 'image' ou 'video'
+    source_message_id VARCHAR(255) NOT NULL,         -- id da midia na Evolution
+    user_id INTEGER NOT NULL REFERENCES "base"."user"(id),
+    group_id INTEGER REFERENCES "base"."group"(id),
+    media_id INTEGER REFERENCES "content"."media"(id),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',   -- 'pending', 'running', 'done' ou 'failed'
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    available_at TIMESTAMP NOT NULL DEFAULT now(),
+    inserted_at TIMESTAMP NOT NULL DEFAULT now(),
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    CONSTRAINT media_job_message_step_unique UNIQUE (message_id, step)
+);
+
+CREATE INDEX media_job_claim_idx
+    ON "content"."media_job" (available_at, id)
+    WHERE status IN ('pending', 'running');
@@ -0,0 +1,8 @@
+-- phash bands
+-- depends: 20261018_01_mQj7e-media-job-queue
+
+ALTER TABLE "content"."media"
+    DROP COLUMN phash_b0,
+    DROP COLUMN phash_b1,
+    DROP COLUMN phash_b2,
+    DROP COLUMN phash_b3;
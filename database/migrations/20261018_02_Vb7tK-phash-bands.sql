@@ -0,0 +1,16 @@
+-- phash bands
+-- depends: 20261018_01_mQj7e-media-job-queue
+
+-- Multi-index hashing for near-duplicate lookup: each 16-bit band of the
+-- phash gets its own b-tree, so a Hamming search probes the bands instead of
+-- scanning every row.
+ALTER TABLE "content"."media"
+    ADD COLUMN phash_b0 INTEGER GENERATED ALWAYS AS (((phash >> 48) & 65535)::integer) STORED,
+    ADD COLUMN phash_b1 INTEGER GENERATED ALWAYS AS (((phash >> 32) & 65535)::integer) STORED,
+    ADD COLUMN phash_b2 INTEGER GENERATED ALWAYS AS (((phash >> 16) & 65535)::integer) STORED,
+    ADD COLUMN phash_b3 INTEGER GENERATED ALWAYS AS ((phash & 65535)::integer) STORED;
+
+CREATE INDEX media_phash_b0_idx ON "content"."media" (phash_b0);
+CREATE INDEX media_phash_b1_idx ON "content"."media" (phash_b1);
+CREATE INDEX media_phash_b2_idx ON "content"."media" (phash_b2);
+CREATE INDEX media_phash_b3_idx ON "content"."media" (phash_b3);
@@ -0,0 +1,7 @@
+-- media embedding hnsw
+-- depends: 20261018_02_Vb7tK-phash-bands
+
+DROP INDEX "content"."media_description_embedding_hnsw_idx";
+DROP INDEX "content"."message_media_id_idx";
+DROP INDEX "content"."message_user_media_idx";
+DROP INDEX "content"."message_group_media_idx";
@@ -0,0 +1,24 @@
+-- media embedding hnsw
+-- depends: 20261018_02_Vb7tK-phash-bands
+
+-- vector indexes stop at 2000 dimensions, so the 2560-d description
+-- embedding is indexed as halfvec (up to 4000). Queries must order by the
+-- same expression for the planner to use it.
+CREATE INDEX media_description_embedding_hnsw_idx
+    ON "content"."media"
+    USING hnsw ((description_embedding::halfvec(2560)) halfvec_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- Gallery scopes: media of a user or a group, and the reverse check of
+-- whether a candidate media belongs to the scope.
+CREATE INDEX message_media_id_idx
+    ON "content"."message" (media_id)
+    WHERE media_id IS NOT NULL;
+
+CREATE INDEX message_user_media_idx
+    ON "content"."message" (user_id, media_id)
+    WHERE media_id IS NOT NULL;
+
+CREATE INDEX message_group_media_idx
+    ON "content"."message" (group_id, media_id)
+    WHERE media_id IS NOT NULL;
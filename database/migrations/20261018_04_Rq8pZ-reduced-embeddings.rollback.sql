@@ -0,0 +1,22 @@
+-- reduced embeddings
+-- depends: 20261018_03_Hn4wQ-media-embedding-hnsw
+
+-- Reduced rows cannot be widened back; they are dropped and must be
+-- re-embedded.
+DROP INDEX "content"."media_description_embedding_bit_idx";
+DROP INDEX "content"."media_description_embedding_hnsw_idx";
+
+UPDATE "content"."media" SET description_embedding = NULL
+WHERE vector_dims(description_embedding) <> 2560;
+DELETE FROM "manager"."embedding" WHERE vector_dims(embedding) <> 2560;
+
+ALTER TABLE "content"."media"
+    ALTER COLUMN description_embedding TYPE vector(2560) USING description_embedding::vector(2560);
+
+ALTER TABLE "manager"."embedding"
+    ALTER COLUMN embedding TYPE vector(2560) USING embedding::vector(2560);
+
+CREATE INDEX media_description_embedding_hnsw_idx
+    ON "content"."media"
+    USING hnsw ((description_embedding::halfvec(2560)) halfvec_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,27 @@
+-- reduced embeddings
+-- depends: 20261018_03_Hn4wQ-media-embedding-hnsw
+
+-- Embeddings are stored as halfvec with no fixed dimension: existing 2560-d
+-- rows keep working (at half the size) until ``python -m embeddings.backfill``
+-- reduces them to the configured dimension (utils.embedding.EMBEDDING_DIMENSION).
+-- Only rows already at that dimension are indexed and searched.
+DROP INDEX "content"."media_description_embedding_hnsw_idx";
+
+ALTER TABLE "content"."media"
+    ALTER COLUMN description_embedding TYPE halfvec USING description_embedding::halfvec;
+
+ALTER TABLE "manager"."embedding"
+    ALTER COLUMN embedding TYPE halfvec USING embedding::halfvec;
+
+CREATE INDEX media_description_embedding_hnsw_idx
+    ON "content"."media"
+    USING hnsw ((description_embedding::halfvec(1024)) halfvec_cosine_ops)
+    WITH (m = 16, ef_construction = 64)
+    WHERE vector_dims(description_embedding) = 1024;
+
+-- 1 bit per dimension for candidate generation, rescored with the halfvec.
+CREATE INDEX media_description_embedding_bit_idx
+    ON "content"."media"
+    USING hnsw ((binary_quantize(description_embedding::halfvec(1024))::bit(1024)) bit_hamming_ops)
+    WITH (m = 16, ef_construction = 64)
+    WHERE vector_dims(description_embedding) = 1024;
@@ -0,0 +1,4 @@
+-- embedding term unique
+-- depends: 20261018_04_Rq8pZ-reduced-embeddings
+
+DROP INDEX "manager"."embedding_term_unique";
@@ -0,0 +1,15 @@
+-- embedding term unique
+-- depends: 20261018_04_Rq8pZ-reduced-embeddings
+
+-- Terms are stored normalized (trimmed, lowercased, single spaces) so the
+-- lookup is a plain equality on a unique index.
+UPDATE "manager"."embedding"
+SET term = lower(regexp_replace(btrim(term), '\s+', ' ', 'g'))
+WHERE term <> lower(regexp_replace(btrim(term), '\s+', ' ', 'g'));
+
+DELETE FROM "manager"."embedding" AS older
+USING "manager"."embedding" AS newer
+WHERE older.term = newer.term
+  AND (older.inserted_at, older.id) < (newer.inserted_at, newer.id);
+
+CREATE UNIQUE INDEX embedding_term_unique ON "manager"."embedding" (term);
@@ -0,0 +1,4 @@
+-- transcription cache
+-- depends: 20261018_05_Tz3mE-embedding-term-unique
+
+DROP TABLE IF EXISTS "content"."transcription";
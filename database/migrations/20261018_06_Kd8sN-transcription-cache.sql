@@ -0,0 +1,11 @@
+-- transcription cache
+-- depends: 20261018_05_Tz3mE-embedding-term-unique
+
+CREATE TABLE "content"."transcription" (
+    id SERIAL PRIMARY KEY,
+    hash BYTEA NOT NULL,                             -- sha256 do arquivo de audio
+    text TEXT NOT NULL,
+    model_id INTEGER REFERENCES "manager"."model"(id),
+    inserted_at TIMESTAMP NOT NULL DEFAULT now(),
+    CONSTRAINT transcription_hash_unique UNIQUE (hash)
+);
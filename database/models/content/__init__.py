@@ -1,2 +1,4 @@
 from database.models.content.media import Media
+from database.models.content.media_job import MediaJob
 from database.models.content.message import Message
+from database.models.content.transcription import Transcription
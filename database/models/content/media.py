@@ -1,5 +1,5 @@
-from pgvector.sqlalchemy import Vector
-from sqlalchemy import BigInteger, Column, DECIMAL, func, Integer, LargeBinary, String, text, Text, TIMESTAMP, UUID
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import BigInteger, Column, Computed, DECIMAL, func, Integer, LargeBinary, String, text, Text, TIMESTAMP, UUID
 
 from database.models import Base
 
@@ -18,9 +18,13 @@ class Media(Base):
 
     size = Column(DECIMAL)
     description = Column(Text)
-    description_embedding = Column(Vector(2560))
+    description_embedding = Column(HALFVEC())
     hash = Column(LargeBinary, nullable=False, unique=True)
     phash = Column(BigInteger)
+    phash_b0 = Column(Integer, Computed("((phash >> 48) & 65535)::integer"))
+    phash_b1 = Column(Integer, Computed("((phash >> 32) & 65535)::integer"))
+    phash_b2 = Column(Integer, Computed("((phash >> 16) & 65535)::integer"))
+    phash_b3 = Column(Integer, Computed("(phash & 65535)::integer"))
 
     inserted_at = Column(
         TIMESTAMP(timezone=True),
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, ForeignKey, func, Integer, String, Text, TIMESTAMP, UniqueConstraint
+
+from database.models import Base
+
+
+class MediaJob(Base):
+    __tablename__ = "media_job"
+    __table_args__ = (
+        UniqueConstraint("message_id", "step", name="media_job_message_step_unique"),
+        {"schema": "content"},
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    message_id = Column(Integer, ForeignKey("content.message.id"), nullable=False)
+    step = Column(String(20), nullable=False, default="store")  # 'store' ou 'describe'
+    type = Column(String(20), nullable=False)                   # 'image' ou 'video'
+    source_message_id = Column(String(255), nullable=False)     # id da midia na Evolution
+    user_id = Column(Integer, ForeignKey("base.user.id"), nullable=False)
+    group_id = Column(Integer, ForeignKey("base.group.id"))
+    media_id = Column(Integer, ForeignKey("content.media.id"))
+
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    available_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+
+    inserted_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP, nullable=False, server_default=func.now(), onupdate=func.now())
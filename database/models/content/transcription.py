@@ -0,0 +1,19 @@
+from sqlalchemy import Column, ForeignKey, func, Integer, LargeBinary, Text, TIMESTAMP, UniqueConstraint
+
+from database.models import Base
+
+
+class Transcription(Base):
+    __tablename__ = "transcription"
+    __table_args__ = (
+        UniqueConstraint("hash", name="transcription_hash_unique"),
+        {"schema": "content"},
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    hash = Column(LargeBinary, nullable=False)  # sha256 do arquivo de audio
+    text = Column(Text, nullable=False)
+    model_id = Column(Integer, ForeignKey("manager.model.id"))
+
+    inserted_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
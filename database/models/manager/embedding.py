@@ -1,4 +1,4 @@
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import HALFVEC
 from sqlalchemy import Column, func, Integer, Text, TIMESTAMP
 
 from database.models import Base
@@ -10,6 +10,6 @@ class Embedding(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     term = Column(Text, nullable=False)
-    embedding = Column(Vector(2560), nullable=False)
+    embedding = Column(HALFVEC(), nullable=False)
 
     inserted_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
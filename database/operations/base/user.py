@@ -1,9 +1,19 @@
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from sqlalchemy import or_, select
 
 from database.models.base import User
 from database.operations import BaseRepository
+from database.operations.cache import detached, MISSING, TTLCache
+
+
+# Keyed by (lookup, value). Mostly the gork user and mentioned users.
+_USER_CACHE: TTLCache[tuple[str, str], Optional[User]] = TTLCache("user")
+
+
+def invalidate_user_cache() -> None:
+    """For writes to base.user made outside this repository."""
+    _USER_CACHE.clear()
 
 
 class UserRepository(BaseRepository[User]):
@@ -11,9 +21,18 @@ class UserRepository(BaseRepository[User]):
         super().__init__(User, db)
 
     async def find_by_phone(self, phone_number: str) -> Optional[User]:
-        return await self.find_one_by(phone_number=phone_number)
+        cached = _USER_CACHE.get(("phone", phone_number))
+        if cached is not MISSING:
+            return cached
+
+        user = await self.find_one_by(phone_number=phone_number)
+        return _USER_CACHE.set(("phone", phone_number), detached(user))
 
     async def find_by_phone_or_id(self, _id: str) -> Optional[User]:
+        cached = _USER_CACHE.get(("phone_or_id", _id))
+        if cached is not MISSING:
+            return cached
+
         query = select(self.model).filter(
             or_(
                 self.model.phone_number == _id,
@@ -21,7 +40,7 @@ class UserRepository(BaseRepository[User]):
             )
         )
         result = await self.db.execute(query)
-        return result.scalar_one_or_none()
+        return _USER_CACHE.set(("phone_or_id", _id), detached(result.scalar_one_or_none()))
 
     async def find_by_lid(self, lid: str) -> Optional[User]:
         return await self.find_one_by(src_id=lid)
@@ -53,3 +72,13 @@ class UserRepository(BaseRepository[User]):
             name=name
         )
         return await self.insert(new_user)
+
+    async def insert(self, obj: User) -> User:
+        user = await super().insert(obj)
+        _USER_CACHE.clear()
+        return user
+
+    async def update(self, id: int, data: Dict[str, Any]) -> Optional[User]:
+        user = await super().update(id, data)
+        _USER_CACHE.clear()
+        return user
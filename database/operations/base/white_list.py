@@ -2,6 +2,11 @@ from sqlalchemy import and_, select
 
 from database.models.base import WhiteList
 from database.operations import BaseRepository
+from database.operations.cache import MISSING, TTLCache
+
+
+# Keyed by (lookup, sender type, sender id).
+_WHITELIST: TTLCache[tuple[str, str, int], bool] = TTLCache("whitelist", max_size=4096)
 
 
 class WhiteListRepository(BaseRepository[WhiteList]):
@@ -9,6 +14,11 @@ class WhiteListRepository(BaseRepository[WhiteList]):
         super().__init__(WhiteList, db)
 
     async def is_whitelisted(self, sender_type: str, sender_id: int) -> bool:
+        key = ("is_whitelisted", sender_type, sender_id)
+        cached = _WHITELIST.get(key)
+        if cached is not MISSING:
+            return cached
+
         result = await self.db.execute(
             select(WhiteList).filter(
                 and_(
@@ -18,9 +28,14 @@ class WhiteListRepository(BaseRepository[WhiteList]):
                 )
             )
         )
-        return result.scalar_one_or_none() is not None
+        return _WHITELIST.set(key, result.scalar_one_or_none() is not None)
 
     async def is_admin(self, sender_type: str, sender_id: int) -> bool:
+        key = ("is_admin", sender_type, sender_id)
+        cached = _WHITELIST.get(key)
+        if cached is not MISSING:
+            return cached
+
         result = await self.db.execute(
             select(WhiteList).filter(
                 and_(
@@ -31,7 +46,7 @@ class WhiteListRepository(BaseRepository[WhiteList]):
                 )
             )
         )
-        return result.scalar_one_or_none() is not None
+        return _WHITELIST.set(key, result.scalar_one_or_none() is not None)
 
     async def add_to_whitelist(self, sender_type: str, sender_id: int, is_admin: bool = False) -> WhiteList:
         whitelist_entry = WhiteList(
@@ -39,7 +54,9 @@ class WhiteListRepository(BaseRepository[WhiteList]):
             sender_id=sender_id,
             is_admin=is_admin
         )
-        return await self.insert(whitelist_entry)
+        entry = await self.insert(whitelist_entry)
+        _WHITELIST.invalidate_where(lambda key: key[1:] == (sender_type, sender_id))
+        return entry
 
     async def remove_from_whitelist(self, sender_type: str, sender_id: int) -> bool:
         from datetime import datetime
@@ -58,4 +75,6 @@ class WhiteListRepository(BaseRepository[WhiteList]):
         if not entry:
             return False
 
-        return await self.update(entry.id, {"deleted_at": datetime.now()}) is not None
+        removed = await self.update(entry.id, {"deleted_at": datetime.now()}) is not None
+        _WHITELIST.invalidate_where(lambda key: key[1:] == (sender_type, sender_id))
+        return removed
@@ -0,0 +1,213 @@
+"""
+Reference Data Cache
+
+In-process TTL cache for rows read on every message and changed rarely (the
+gork user, agents, models, model overrides, whitelist entries). Repositories
+own one ``TTLCache`` per lookup and invalidate it from their own write
+methods; the TTL bounds staleness for rows edited straight in the database.
+
+Every worker process holds its own caches, so invalidations are also
+published on a Redis channel. ``start_invalidation_listener`` subscribes to
+it and drops the named cache when another process changes one of its rows.
+
+Cached rows are detached copies, so they outlive the session that loaded them
+and a rollback in that session cannot expire them under other readers.
+"""
+import asyncio
+import os
+import socket
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from log import logger
+from utils import get_env_var
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+DEFAULT_TTL_SECONDS = 300.0
+DEFAULT_MAX_SIZE = 1024
+INVALIDATION_CHANNEL = "reference-cache:invalidate"
+INVALIDATION_RETRY_SECONDS = 5.0
+ALL_CACHES = "*"
+
+MISSING: Any = object()
+
+_CACHES: list["TTLCache"] = []
+_PUBLISHING: set[asyncio.Task] = set()
+_LISTENER: Optional[asyncio.Task] = None
+
+
+def _default_ttl() -> float:
+    return float(get_env_var("REFERENCE_CACHE_TTL") or DEFAULT_TTL_SECONDS)
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Size-bounded LRU mapping whose entries expire ``ttl`` seconds after being
+    set. ``clearable=False`` keeps it out of ``clear_caches``, for entries
+    that no reference row change can make stale.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            ttl: Optional[float] = None,
+            max_size: int = DEFAULT_MAX_SIZE,
+            clearable: bool = True,
+    ):
+        self.name = name
+        self.clearable = clearable
+        self.ttl = _default_ttl() if ttl is None else ttl
+        self.max_size = max(1, max_size)
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        _CACHES.append(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K, default: Any = MISSING) -> V:
+        """Return the cached value or ``default`` (``MISSING``) when absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: K, value: V) -> V:
+        if self.ttl <= 0:
+            return value
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: K) -> None:
+        self._entries.pop(key, None)
+        _broadcast(self.name)
+
+    def invalidate_where(self, predicate: Callable[[K], bool]) -> None:
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+        _broadcast(self.name)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        _broadcast(self.name)
+
+
+def clear_caches() -> None:
+    """Drop every reference cache, e.g. after bulk changes such as ``init_agents``."""
+    _clear_local(ALL_CACHES)
+    _broadcast(ALL_CACHES)
+
+
+def _clear_local(name: str) -> None:
+    for cache in _CACHES:
+        if cache.name == name or (name == ALL_CACHES and cache.clearable):
+            cache._entries.clear()
+
+
+def _origin() -> str:
+    # Resolved per call: workers forked from a preloaded app share the import.
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _broadcast(name: str) -> None:
+    """
+    Tell the other processes to drop cache ``name``. Keys are not sent (the
+    predicates are not serializable), so remote workers clear the whole cache.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    task = loop.create_task(_publish(name), name=f"cache_invalidate:{name}")
+    _PUBLISHING.add(task)
+    task.add_done_callback(_PUBLISHING.discard)
+
+
+async def _publish(name: str) -> None:
+    from services.redis_client import get_redis_client
+
+    try:
+        await get_redis_client().publish(INVALIDATION_CHANNEL, f"{_origin()} {name}")
+    except Exception as error:
+        await logger.error("ReferenceCache", "InvalidationPublish", str(error))
+
+
+async def _listen() -> None:
+    from services.redis_client import get_redis_client
+
+    while True:
+        try:
+            async with get_redis_client().pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Invalidations published while unsubscribed are lost.
+                _clear_local(ALL_CACHES)
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    origin, _, name = message["data"].partition(" ")
+                    if origin != _origin():
+                        _clear_local(name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            await logger.error("ReferenceCache", "InvalidationListener", str(error))
+            await asyncio.sleep(INVALIDATION_RETRY_SECONDS)
+
+
+def start_invalidation_listener() -> None:
+    global _LISTENER
+
+    if _LISTENER is None or _LISTENER.done():
+        _LISTENER = asyncio.create_task(_listen(), name="cache_invalidation_listener")
+
+
+async def stop_invalidation_listener() -> None:
+    global _LISTENER
+
+    if _LISTENER is not None:
+        _LISTENER.cancel()
+        await asyncio.gather(_LISTENER, return_exceptions=True)
+        _LISTENER = None
+    if _PUBLISHING:
+        await asyncio.gather(*_PUBLISHING, return_exceptions=True)
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    return {
+        cache.name: {"size": len(cache), "hits": cache.hits, "misses": cache.misses}
+        for cache in _CACHES
+    }
+
+
+def detached(obj: Optional[V]) -> Optional[V]:
+    """
+    Copy the loaded column values of an ORM row into a new detached instance
+    with the same identity, safe to share across sessions.
+    """
+    if obj is None:
+        return None
+
+    mapper = inspect(obj).mapper
+    copy = mapper.class_(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
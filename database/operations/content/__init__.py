@@ -1,2 +1,4 @@
 from database.operations.content.media import MediaRepository
+from database.operations.content.media_job import MediaJobRepository
 from database.operations.content.message import MessageRepository
+from database.operations.content.transcription import TranscriptionRepository
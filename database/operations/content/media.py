@@ -1,11 +1,25 @@
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from sqlalchemy import and_, desc, select, text
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import and_, bindparam, desc, select, text
 
 from database.models.base import User
 from database.models.content import Media, Message
 from database.operations import BaseRepository
+from utils import EMBEDDING_DIMENSION, get_env_var, reduce_embedding
+from utils.hash import phash_band_candidates
+
+
+# Scopes up to this many media are ranked exactly; larger ones go through HNSW.
+EXACT_SEARCH_MAX_MEDIA = 2000
+HNSW_EF_SEARCH = 100
+# Binary candidates fetched per requested result before halfvec rescoring.
+BINARY_RESCORE_FACTOR = 4
+
+
+def _quantization() -> str:
+    return (get_env_var("GALLERY_SEARCH_QUANTIZATION") or "halfvec").lower()
 
 
 class MediaRepository(BaseRepository[Media]):
@@ -23,20 +37,30 @@ class MediaRepository(BaseRepository[Media]):
             phash: int,
             max_distance: int = 8
     ) -> Optional[Media]:
+        # Any hash within max_distance shares at least one band with the
+        # target up to max_distance // PHASH_BANDS bits, so the band indexes
+        # narrow the candidates before the exact distance check.
+        candidates = phash_band_candidates(phash, max_distance)
         query = text("""
-            SELECT id
+            SELECT *
             FROM content.media
-            WHERE phash IS NOT NULL
+            WHERE (phash_b0 = ANY(CAST(:b0 AS integer[]))
+                OR phash_b1 = ANY(CAST(:b1 AS integer[]))
+                OR phash_b2 = ANY(CAST(:b2 AS integer[]))
+                OR phash_b3 = ANY(CAST(:b3 AS integer[])))
               AND bit_count((phash # CAST(:phash AS bigint))::bit(64)) <= :max_distance
             ORDER BY bit_count((phash # CAST(:phash AS bigint))::bit(64))
             LIMIT 1
         """)
         result = await self.db.execute(
-            query,
-            {"phash": phash, "max_distance": max_distance}
+            select(Media).from_statement(query),
+            {
+                "phash": phash,
+                "max_distance": max_distance,
+                **{f"b{band}": values for band, values in enumerate(candidates)},
+            }
         )
-        media_id = result.scalar_one_or_none()
-        return await self.find_by_id(media_id) if media_id else None
+        return result.scalar_one_or_none()
 
     async def find_by_user(
             self,
@@ -120,44 +144,139 @@ class MediaRepository(BaseRepository[Media]):
             for row in result.all()
         ]
 
-    async def semantic_search_by_user(
+    async def _set_hnsw_search(self, ef_search: int) -> None:
+        await self.db.execute(
+            text("""
+                SELECT set_config('hnsw.ef_search', :ef_search, true),
+                       set_config('hnsw.iterative_scan', 'relaxed_order', true)
+            """),
+            {"ef_search": str(max(HNSW_EF_SEARCH, ef_search))},
+        )
+
+    async def _semantic_search(
             self,
-            user_id: int,
+            scope_column: str,
+            scope_id: int,
             query_embedding: List[float],
-            limit: int = 10,
-            min_similarity: float = 0.5
-    ) -> List[dict]:
-        embedding_str = f"'[{','.join(map(str, query_embedding))}]'"
+            limit: int,
+    ) -> list:
+        """
+        Nearest media by description within a user's or group's messages.
 
-        query = text(f"""
-            SELECT 
-                content.media.id,
-                content.media.ext_id,
-                content.media.name,
-                content.media.description,
-                content.media.size,
-                content.media.inserted_at,
-                content.media.type as media_type,
-                content.media.path,
-                content.media.bucket,
-                base."user".name as user_name,
-                content.media.description_embedding <=> {embedding_str}::vector as distance,
-                1 - (content.media.description_embedding <=> {embedding_str}::vector) as similarity
-            FROM content.media
-            JOIN content.message ON content.message.media_id = content.media.id
-            JOIN base."user" ON content.message.user_id = base."user".id
-            WHERE content.message.user_id = :user_id
-              AND content.media.description_embedding IS NOT NULL
+        Small scopes are ranked exactly. Past EXACT_SEARCH_MAX_MEDIA the HNSW
+        index is used, with iterative scans so the scope filter cannot starve
+        the result; with GALLERY_SEARCH_QUANTIZATION=binary candidates come
+        from the 1-bit index and are rescored with the halfvec distance.
+        Rows not yet reduced to EMBEDDING_DIMENSION are skipped.
+
+        The scope size is counted in the same statement: both plans are
+        unioned behind one-time filters on it, so only one of them runs.
+        """
+        query_embedding = reduce_embedding(query_embedding)
+
+        distance = f"media.description_embedding::halfvec({EMBEDDING_DIMENSION}) <=> CAST(:embedding AS halfvec({EMBEDDING_DIMENSION}))"
+        reduced = f"vector_dims(media.description_embedding) = {EMBEDDING_DIMENSION}"
+        in_scope = (
+            f"EXISTS (SELECT 1 FROM content.message "
+            f"WHERE message.media_id = media.id AND message.{scope_column} = :scope_id)"
+        )
+        is_small = "(SELECT size FROM scope) <= :exact_max"
+
+        exact = f"""
+            SELECT media.id, {distance} AS distance
+            FROM content.media AS media
+            WHERE media.id IN (
+                SELECT media_id FROM content.message
+                WHERE {scope_column} = :scope_id AND media_id IS NOT NULL
+            )
+              AND {reduced}
+              AND {is_small}
             ORDER BY distance
             LIMIT :limit
-        """)
+        """
+        if _quantization() == "binary":
+            await self._set_hnsw_search(limit * BINARY_RESCORE_FACTOR)
+            approximate = f"""
+                SELECT candidate.id, {distance} AS distance
+                FROM (
+                    SELECT media.id
+                    FROM content.media AS media
+                    WHERE {reduced} AND {in_scope} AND NOT {is_small}
+                    ORDER BY binary_quantize(media.description_embedding::halfvec({EMBEDDING_DIMENSION}))::bit({EMBEDDING_DIMENSION})
+                        <~> binary_quantize(CAST(:embedding AS halfvec({EMBEDDING_DIMENSION})))
+                    LIMIT :candidates
+                ) AS candidate
+                JOIN content.media AS media ON media.id = candidate.id
+                ORDER BY distance
+                LIMIT :limit
+            """
+        else:
+            await self._set_hnsw_search(limit)
+            approximate = f"""
+                SELECT media.id, {distance} AS distance
+                FROM content.media AS media
+                WHERE {reduced} AND {in_scope} AND NOT {is_small}
+                ORDER BY distance
+                LIMIT :limit
+            """
+
+        query = text(f"""
+            WITH scope AS MATERIALIZED (
+                SELECT count(DISTINCT media_id) AS size
+                FROM content.message
+                WHERE {scope_column} = :scope_id AND media_id IS NOT NULL
+            ),
+            nearest AS MATERIALIZED (
+                ({exact})
+                UNION ALL
+                ({approximate})
+            )
+            SELECT
+                media.id,
+                media.ext_id,
+                media.name,
+                media.description,
+                media.size,
+                media.inserted_at,
+                media.type AS media_type,
+                media.path,
+                media.bucket,
+                sender.user_name,
+                nearest.distance,
+                1 - nearest.distance AS similarity
+            FROM nearest
+            JOIN content.media AS media ON media.id = nearest.id
+            LEFT JOIN LATERAL (
+                SELECT "user".name AS user_name
+                FROM content.message
+                JOIN base."user" ON base."user".id = message.user_id
+                WHERE message.media_id = media.id AND message.{scope_column} = :scope_id
+                ORDER BY message.created_at
+                LIMIT 1
+            ) AS sender ON true
+            ORDER BY nearest.distance
+        """).bindparams(bindparam("embedding", type_=HALFVEC(EMBEDDING_DIMENSION)))
 
         result = await self.db.execute(
             query,
-            {"user_id": user_id, "limit": limit}
+            {
+                "scope_id": scope_id,
+                "embedding": query_embedding,
+                "limit": limit,
+                "candidates": limit * BINARY_RESCORE_FACTOR,
+                "exact_max": EXACT_SEARCH_MAX_MEDIA,
+            },
         )
+        return result.all()
 
-        rows = result.all()
+    async def semantic_search_by_user(
+            self,
+            user_id: int,
+            query_embedding: List[float],
+            limit: int = 10,
+            min_similarity: float = 0.5
+    ) -> List[dict]:
+        rows = await self._semantic_search("user_id", user_id, query_embedding, limit)
 
         return [
             {
@@ -185,38 +304,22 @@ class MediaRepository(BaseRepository[Media]):
             limit: int = 10,
             min_similarity: float = 0.5
     ) -> List[dict]:
-        result = await self.db.execute(
-            select(
-                Media,
-                User.name.label('user_name'),
-                Media.description_embedding.cosine_distance(query_embedding).label('distance')
-            )
-            .join(Message, Message.media_id == Media.id)
-            .join(User, Message.user_id == User.id)
-            .filter(
-                and_(
-                    Message.group_id == group_id,
-                    Media.description_embedding.is_not(None)
-                )
-            )
-            .order_by('distance')
-            .limit(limit)
-        )
+        rows = await self._semantic_search("group_id", group_id, query_embedding, limit)
 
         return [
             {
-                "id": row.Media.id,
-                "ext_id": row.Media.ext_id,
-                "name": row.Media.name,
-                "size": float(row.Media.size),
-                "inserted_at": row.Media.inserted_at,
-                "type": row.Media.type,
-                "path": row.Media.path,
-                "bucket": row.Media.bucket,
+                "id": row.id,
+                "ext_id": row.ext_id,
+                "name": row.name,
+                "size": float(row.size),
+                "inserted_at": row.inserted_at,
+                "type": row.media_type,
+                "path": row.path,
+                "bucket": row.bucket,
                 "user_name": row.user_name,
-                "similarity": 1 - float(row.distance),
+                "similarity": float(row.similarity),
                 "distance": float(row.distance)
             }
-            for row in result.all()
-            if (1 - float(row.distance)) >= min_similarity
+            for row in rows
+            if float(row.similarity) >= min_similarity
         ]
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from database.models.content import MediaJob
+from database.operations import BaseRepository
+
+
+class MediaJobRepository(BaseRepository[MediaJob]):
+    def __init__(self, db):
+        super().__init__(MediaJob, db)
+
+    async def enqueue(
+            self,
+            message_id: int,
+            media_type: str,
+            source_message_id: str,
+            user_id: int,
+            group_id: Optional[int] = None,
+            step: str = "store",
+            media_id: Optional[int] = None,
+    ) -> MediaJob:
+        """Insert a pending job, or return the existing one for the same message and step."""
+        stmt = (
+            insert(MediaJob)
+            .values(
+                message_id=message_id,
+                step=step,
+                type=media_type,
+                source_message_id=source_message_id,
+                user_id=user_id,
+                group_id=group_id,
+                media_id=media_id,
+            )
+            .on_conflict_do_nothing(constraint="media_job_message_step_unique")
+            .returning(MediaJob)
+        )
+        result = await self.db.execute(stmt)
+        job = result.scalar_one_or_none()
+        await self.db.commit()
+
+        if job is None:
+            job = await self.find_one_by(message_id=message_id, step=step)
+        return job
+
+    async def claim_next(self, stale_after: timedelta) -> Optional[MediaJob]:
+        """
+        Take the oldest due job, skipping rows locked by other workers. Jobs
+        left running longer than ``stale_after`` belonged to a worker that died
+        and are taken again.
+        """
+        candidate = (
+            select(MediaJob.id)
+            .filter(
+                or_(
+                    and_(MediaJob.status == "pending", MediaJob.available_at <= func.now()),
+                    and_(MediaJob.status == "running", MediaJob.updated_at < func.now() - stale_after),
+                )
+            )
+            .order_by(MediaJob.available_at, MediaJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        return await self._mark_running(MediaJob.id == candidate)
+
+    async def claim(self, job_id: int) -> Optional[MediaJob]:
+        """Take a specific job if no worker has taken it yet."""
+        return await self._mark_running(and_(MediaJob.id == job_id, MediaJob.status == "pending"))
+
+    async def _mark_running(self, condition) -> Optional[MediaJob]:
+        result = await self.db.execute(
+            update(MediaJob)
+            .where(condition)
+            .values(status="running", attempts=MediaJob.attempts + 1)
+            .returning(MediaJob)
+        )
+        job = result.scalar_one_or_none()
+        await self.db.commit()
+        return job
+
+    async def complete(self, job_id: int, media_id: Optional[int]) -> None:
+        await self.db.execute(
+            update(MediaJob)
+            .where(MediaJob.id == job_id)
+            .values(status="done", media_id=media_id, last_error=None)
+        )
+        await self.db.commit()
+
+    async def retry(self, job_id: int, error: str, delay: timedelta) -> None:
+        await self.db.execute(
+            update(MediaJob)
+            .where(MediaJob.id == job_id)
+            .values(status="pending", available_at=func.now() + delay, last_error=error)
+        )
+        await self.db.commit()
+
+    async def fail(self, job_id: int, error: str) -> None:
+        await self.db.execute(
+            update(MediaJob)
+            .where(MediaJob.id == job_id)
+            .values(status="failed", last_error=error)
+        )
+        await self.db.commit()
@@ -1,13 +1,141 @@
+import functools
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from sqlalchemy import and_, desc, distinct, func, select
+from sqlalchemy import and_, desc, distinct, func, inspect, select, text, update
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, make_transient_to_detached
 
-from database.models.base import User
+from database.models.base import Group, User
 from database.models.content import Message
 from database.operations import BaseRepository
+from database.operations.base.user import invalidate_user_cache
+
+
+def _select_columns(model, alias: str) -> str:
+    return ", ".join(
+        f'{alias}."{attr.columns[0].name}" AS {alias}__{attr.key}'
+        for attr in inspect(model).mapper.column_attrs
+    )
+
+
+def _from_row(model, row, alias: str):
+    obj = model(**{
+        attr.key: row[f"{alias}__{attr.key}"]
+        for attr in inspect(model).mapper.column_attrs
+    })
+    make_transient_to_detached(obj)
+    return obj
+
+
+# One statement resolving sender, group, quoted message and whitelist and
+# upserting the message. Sender and group are only inserted when missing and
+# the sender only rewritten when its name or phone changed, so the common case
+# writes nothing but the message and burns no sequence values.
+@functools.cache
+def _ingest_group_message_sql() -> str:
+    # Built on first use: listing mapped columns configures every mapper.
+    return f"""
+        WITH incoming AS (
+            SELECT
+                NULLIF(CAST(:name AS varchar), '') AS name,
+                NULLIF(CAST(:phone_number AS varchar), '') AS phone_number
+        ),
+        sender_update AS (
+            UPDATE base."user" u
+            SET name = CASE WHEN u.name IS NOT NULL THEN COALESCE(incoming.name, u.name) ELSE u.name END,
+                phone_number = COALESCE(incoming.phone_number, u.phone_number),
+                updated_at = now()
+            FROM incoming
+            WHERE u.src_id = CAST(:lid AS varchar)
+              AND (
+                  (u.name IS NOT NULL AND incoming.name IS NOT NULL AND u.name IS DISTINCT FROM incoming.name)
+                  OR (incoming.phone_number IS NOT NULL AND u.phone_number IS DISTINCT FROM incoming.phone_number)
+              )
+            RETURNING u.*
+        ),
+        sender_insert AS (
+            INSERT INTO base."user" (src_id, phone_number, name)
+            SELECT CAST(:lid AS varchar), incoming.phone_number, incoming.name FROM incoming
+            WHERE NOT EXISTS (SELECT 1 FROM base."user" WHERE src_id = CAST(:lid AS varchar))
+            ON CONFLICT (src_id) DO NOTHING
+            RETURNING *
+        ),
+        sender AS (
+            SELECT sender_update.*, true AS written FROM sender_update
+            UNION ALL
+            SELECT sender_insert.*, true AS written FROM sender_insert
+            UNION ALL
+            SELECT u.*, false AS written FROM base."user" u
+            WHERE u.src_id = CAST(:lid AS varchar)
+              AND NOT EXISTS (SELECT 1 FROM sender_update)
+              AND NOT EXISTS (SELECT 1 FROM sender_insert)
+        ),
+        chat_group_insert AS (
+            INSERT INTO base."group" (src_id)
+            SELECT CAST(:group_jid AS varchar)
+            WHERE NOT EXISTS (SELECT 1 FROM base."group" WHERE src_id = CAST(:group_jid AS varchar))
+            ON CONFLICT (src_id) DO NOTHING
+            RETURNING *
+        ),
+        chat_group AS (
+            SELECT * FROM chat_group_insert
+            UNION ALL
+            SELECT g.* FROM base."group" g
+            WHERE g.src_id = CAST(:group_jid AS varchar) AND NOT EXISTS (SELECT 1 FROM chat_group_insert)
+        ),
+        quoted AS (
+            SELECT id, user_id FROM content.message
+            WHERE message_id = CAST(:quoted_message_id AS varchar)
+        ),
+        message_upsert AS (
+            INSERT INTO content.message AS existing (message_id, user_id, group_id, content, created_at, quoted_message_id)
+            SELECT
+                CAST(:message_id AS varchar),
+                sender.id,
+                chat_group.id,
+                NULLIF(CAST(:content AS text), ''),
+                CAST(:created_at AS timestamp),
+                (SELECT id FROM quoted)
+            FROM sender, chat_group
+            ON CONFLICT (message_id) DO UPDATE
+            SET user_id = EXCLUDED.user_id,
+                group_id = EXCLUDED.group_id,
+                content = COALESCE(EXCLUDED.content, existing.content),
+                created_at = EXCLUDED.created_at,
+                quoted_message_id = COALESCE(EXCLUDED.quoted_message_id, existing.quoted_message_id),
+                updated_at = now()
+            RETURNING existing.*
+        )
+        SELECT
+            {_select_columns(User, "sender")},
+            sender.written AS sender_written,
+            {_select_columns(Group, "chat_group")},
+            {_select_columns(Message, "message_upsert")},
+            quoted.id AS quoted_id,
+            quoted.user_id AS quoted_user_id,
+            EXISTS (
+                SELECT 1 FROM base.white_list w
+                WHERE w.sender_type = 'group'
+                  AND w.sender_id = chat_group.id
+                  AND w.deleted_at IS NULL
+            ) AS is_whitelisted
+        FROM sender
+        CROSS JOIN chat_group
+        CROSS JOIN message_upsert
+        LEFT JOIN quoted ON true
+    """
+
+
+@dataclass
+class GroupMessageIngestion:
+    user: User
+    group: Group
+    message: Message
+    is_whitelisted: bool
+    quoted_message_id: Optional[int] = None
+    quoted_user_id: Optional[int] = None
 
 
 class MessageRepository(BaseRepository[Message]):
@@ -43,6 +171,70 @@ class MessageRepository(BaseRepository[Message]):
 
         return None
 
+    async def ingest_group_message(
+            self,
+            message_id: str,
+            lid: str,
+            group_jid: str,
+            content: str,
+            created_at: datetime,
+            phone_number: str = None,
+            name: str = None,
+            quoted_message_id: str = None,
+    ) -> GroupMessageIngestion:
+        """
+        Upsert the sender, group and message of an inbound group message and
+        resolve the quoted message and group whitelist in a single statement,
+        committed once.
+        """
+        params = {
+            "lid": lid,
+            "phone_number": phone_number,
+            "name": name,
+            "group_jid": group_jid,
+            "message_id": message_id,
+            "content": content,
+            "created_at": created_at,
+            "quoted_message_id": quoted_message_id,
+        }
+
+        row = None
+        # A sender or group inserted concurrently by another transaction is
+        # invisible to this statement's snapshot; running it again sees it.
+        for _ in range(2):
+            result = await self.db.execute(text(_ingest_group_message_sql()), params)
+            row = result.mappings().one_or_none()
+            if row is not None:
+                break
+        await self.db.commit()
+
+        if row is None:
+            raise RuntimeError(f"Could not ingest group message {message_id}")
+
+        if row["sender_written"]:
+            invalidate_user_cache()
+
+        return GroupMessageIngestion(
+            user=await self.db.merge(_from_row(User, row, "sender"), load=False),
+            group=await self.db.merge(_from_row(Group, row, "chat_group"), load=False),
+            message=await self.db.merge(_from_row(Message, row, "message_upsert"), load=False),
+            is_whitelisted=row["is_whitelisted"],
+            quoted_message_id=row["quoted_id"],
+            quoted_user_id=row["quoted_user_id"],
+        )
+
+    async def set_media(self, id: int, media_id: int) -> Optional[Message]:
+        """Attach a media to a message in one UPDATE ... RETURNING."""
+        result = await self.db.execute(
+            update(Message)
+            .where(Message.id == id)
+            .values(media_id=media_id)
+            .returning(Message)
+        )
+        message = result.scalar_one_or_none()
+        await self.db.commit()
+        return message
+
     async def find_by_message_id(self, message_id: str) -> Optional[Message]:
         return await self.find_one_by(message_id=message_id)
 
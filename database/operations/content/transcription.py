@@ -0,0 +1,27 @@
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from database.models.content import Transcription
+from database.operations import BaseRepository
+
+
+class TranscriptionRepository(BaseRepository[Transcription]):
+    def __init__(self, db):
+        super().__init__(Transcription, db)
+
+    async def find_by_hash(self, audio_hash: bytes) -> Optional[Transcription]:
+        result = await self.db.execute(
+            select(Transcription).filter(Transcription.hash == audio_hash).limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def insert_transcription(self, audio_hash: bytes, text: str, model_id: Optional[int] = None) -> None:
+        """Store the transcript of an audio file; the first one stored for a hash wins."""
+        await self.db.execute(
+            insert(Transcription)
+            .values(hash=audio_hash, text=text, model_id=model_id)
+            .on_conflict_do_nothing(constraint="transcription_hash_unique")
+        )
+        await self.db.commit()
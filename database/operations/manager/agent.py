@@ -1,7 +1,11 @@
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from database.models.manager import Agent
 from database.operations import BaseRepository
+from database.operations.cache import detached, MISSING, TTLCache
+
+
+_AGENT_BY_NAME: TTLCache[str, Optional[Agent]] = TTLCache("agent")
 
 
 class AgentRepository(BaseRepository[Agent]):
@@ -9,13 +13,26 @@ class AgentRepository(BaseRepository[Agent]):
         super().__init__(Agent, db)
 
     async def find_by_name(self, name: str) -> Optional[Agent]:
-        return await self.find_one_by(name=name)
+        cached = _AGENT_BY_NAME.get(name)
+        if cached is not MISSING:
+            return cached
+
+        agent = await self.find_one_by(name=name)
+        return _AGENT_BY_NAME.set(name, detached(agent))
 
     async def upsert_by_name(self, name: str, prompt: str, model_id: int) -> Agent:
-        existing_agent = await self.find_by_name(name)
+        existing_agent = await self.find_one_by(name=name)
 
         if existing_agent:
-            return await self.update(existing_agent.id, {"prompt": prompt, "model_id": model_id})
+            agent = await self.update(existing_agent.id, {"prompt": prompt, "model_id": model_id})
         else:
             new_agent = Agent(name=name, prompt=prompt, model_id=model_id)
-            return await self.insert(new_agent)
+            agent = await self.insert(new_agent)
+
+        _AGENT_BY_NAME.invalidate(name)
+        return agent
+
+    async def update(self, id: int, data: Dict[str, Any]) -> Optional[Agent]:
+        agent = await super().update(id, data)
+        _AGENT_BY_NAME.clear()
+        return agent
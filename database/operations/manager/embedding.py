@@ -1,9 +1,27 @@
-from typing import Optional
+from array import array
+from typing import Iterable, Optional
 
-from sqlalchemy import desc, func, select
+from sqlalchemy import desc, select
+from sqlalchemy.dialects.postgresql import insert
 
 from database.models.manager import Embedding
 from database.operations import BaseRepository
+from database.operations.cache import MISSING, TTLCache
+from utils import get_env_var
+
+
+DEFAULT_TERM_CACHE_SIZE = 2048
+DEFAULT_TERM_CACHE_TTL_SECONDS = 86400.0
+
+# Term embeddings never change once stored, so entries live long, survive
+# clear_caches() and are kept as float32 arrays (4 bytes per dimension
+# instead of a list of floats).
+_TERM_CACHE: TTLCache[str, array] = TTLCache(
+    "embedding_term",
+    ttl=float(get_env_var("QUERY_EMBEDDING_CACHE_TTL") or DEFAULT_TERM_CACHE_TTL_SECONDS),
+    max_size=int(get_env_var("QUERY_EMBEDDING_CACHE_SIZE") or DEFAULT_TERM_CACHE_SIZE),
+    clearable=False,
+)
 
 
 class EmbeddingRepository(BaseRepository[Embedding]):
@@ -14,23 +32,58 @@ class EmbeddingRepository(BaseRepository[Embedding]):
     def normalize_term(term: str) -> str:
         return " ".join(term.strip().lower().split())
 
-    async def find_by_term(self, term: str) -> Optional[Embedding]:
-        normalized_term = self.normalize_term(term)
-        if not normalized_term:
-            return None
+    async def find_embeddings_by_terms(self, terms: Iterable[str]) -> dict[str, list[float]]:
+        """Embeddings of the given terms keyed by normalized term, from memory first, then one query."""
+        found: dict[str, list[float]] = {}
+        missing = []
+        for term in {self.normalize_term(term) for term in terms}:
+            if not term:
+                continue
+            cached = _TERM_CACHE.get(term)
+            if cached is MISSING:
+                missing.append(term)
+            else:
+                found[term] = cached.tolist()
 
-        result = await self.db.execute(
-            select(Embedding)
-            .filter(func.lower(Embedding.term) == normalized_term)
-            .order_by(desc(Embedding.inserted_at), desc(Embedding.id))
-            .limit(1)
+        if missing:
+            result = await self.db.execute(
+                select(Embedding.term, Embedding.embedding).filter(Embedding.term.in_(missing))
+            )
+            for term, embedding in result.all():
+                found[term] = _TERM_CACHE.set(term, array("f", embedding.to_list())).tolist()
+
+        return found
+
+    async def insert_terms(self, embeddings: dict[str, list[float]]) -> None:
+        """Store term embeddings, keeping the existing row when a term is already there."""
+        rows = {
+            self.normalize_term(term): embedding
+            for term, embedding in embeddings.items()
+            if self.normalize_term(term)
+        }
+        if not rows:
+            return
+
+        await self.db.execute(
+            insert(Embedding)
+            .values([{"term": term, "embedding": embedding} for term, embedding in rows.items()])
+            .on_conflict_do_nothing(index_elements=[Embedding.term])
         )
-        return result.scalar_one_or_none()
+        await self.db.commit()
 
-    async def insert_term(self, term: str, embedding: list[float]) -> Embedding:
-        return await self.insert(
-            Embedding(
-                term=self.normalize_term(term),
-                embedding=embedding,
-            )
+        for term, embedding in rows.items():
+            _TERM_CACHE.set(term, array("f", embedding))
+
+    async def warm_term_cache(self, limit: Optional[int] = None) -> int:
+        """Load the most recently stored terms into memory, up to the cache size."""
+        limit = min(limit or _TERM_CACHE.max_size, _TERM_CACHE.max_size)
+        result = await self.db.execute(
+            select(Embedding.term, Embedding.embedding)
+            .order_by(desc(Embedding.inserted_at), desc(Embedding.id))
+            .limit(limit)
         )
+        rows = result.all()
+        # Oldest first, so the most recent terms end up last in the LRU.
+        for term, embedding in reversed(rows):
+            _TERM_CACHE.set(term, array("f", embedding.to_list()))
+        return len(rows)
@@ -164,6 +164,12 @@ class InteractionRepository(BaseRepository[Interaction]):
         )
         return await self.insert(interaction)
 
+    async def insert_interactions(self, interactions: List[Interaction]) -> None:
+        if not interactions:
+            return
+        self.db.add_all(interactions)
+        await self.db.commit()
+
     async def get_total_tokens_by_user(
             self,
             user_id: int,
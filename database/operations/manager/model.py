@@ -1,9 +1,14 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from sqlalchemy import select
 
 from database.models.manager import Model
 from database.operations import BaseRepository
+from database.operations.cache import clear_caches, detached, MISSING, TTLCache
+
+
+# Keyed by the default flag column name.
+_DEFAULT_MODEL: TTLCache[str, Optional[Model]] = TTLCache("default_model")
 
 
 class ModelRepository(BaseRepository[Model]):
@@ -16,29 +21,27 @@ class ModelRepository(BaseRepository[Model]):
     async def find_by_openrouter_id(self, openrouter_id: str) -> Optional[Model]:
         return await self.find_one_by(openrouter_id=openrouter_id)
 
-    async def get_default_model(self) -> Optional[Model]:
+    async def _find_default(self, flag: str) -> Optional[Model]:
+        cached = _DEFAULT_MODEL.get(flag)
+        if cached is not MISSING:
+            return cached
+
         result = await self.db.execute(
-            select(Model).filter(Model.text_default == True)
+            select(Model).filter(getattr(Model, flag) == True)
         )
-        return result.scalar_one_or_none()
+        return _DEFAULT_MODEL.set(flag, detached(result.scalar_one_or_none()))
+
+    async def get_default_model(self) -> Optional[Model]:
+        return await self._find_default("text_default")
 
     async def get_default_audio_model(self) -> Optional[Model]:
-        result = await self.db.execute(
-            select(Model).filter(Model.audio_default == True)
-        )
-        return result.scalar_one_or_none()
+        return await self._find_default("audio_default")
 
     async def get_default_embedding_model(self) -> Optional[Model]:
-        result = await self.db.execute(
-            select(Model).filter(Model.embedding_default == True)
-        )
-        return result.scalar_one_or_none()
+        return await self._find_default("embedding_default")
 
     async def get_default_image_model(self) -> Optional[Model]:
-        result = await self.db.execute(
-            select(Model).filter(Model.image_default == True)
-        )
-        return result.scalar_one_or_none()
+        return await self._find_default("image_default")
 
     async def set_as_default(self, model_id: int) -> Optional[Model]:
         all_models = await self.find_all()
@@ -50,3 +53,10 @@ class ModelRepository(BaseRepository[Model]):
 
     async def get_all_active(self) -> List[Model]:
         return await self.find_all()
+
+    async def update(self, id: int, data: Dict[str, Any]) -> Optional[Model]:
+        model = await super().update(id, data)
+        # Model rows are cached by the default lookups and by the resolved
+        # agent models, so drop everything.
+        clear_caches()
+        return model
@@ -4,6 +4,13 @@ from sqlalchemy import and_, desc, select
 
 from database.models.manager import Agent, Model, ModelConversation
 from database.operations import BaseRepository
+from database.operations.cache import detached, MISSING, TTLCache
+
+
+# Keyed by (agent id, agent default model id, user id, group id).
+_RESOLVED_MODEL: TTLCache[tuple[int, int, Optional[int], Optional[int]], Optional[Model]] = TTLCache(
+    "resolved_agent_model"
+)
 
 
 class ModelConversationRepository(BaseRepository[ModelConversation]):
@@ -67,15 +74,18 @@ class ModelConversationRepository(BaseRepository[ModelConversation]):
     ) -> ModelConversation:
         existing = await self.find_override(agent_id=agent_id, group_id=group_id)
         if existing:
-            return await self.update(existing.id, {"model_id": model_id})
-
-        return await self.insert(
-            ModelConversation(
-                group_id=group_id,
-                agent_id=agent_id,
-                model_id=model_id,
+            override = await self.update(existing.id, {"model_id": model_id})
+        else:
+            override = await self.insert(
+                ModelConversation(
+                    group_id=group_id,
+                    agent_id=agent_id,
+                    model_id=model_id,
+                )
             )
-        )
+
+        _RESOLVED_MODEL.invalidate_where(lambda key: key[0] == agent_id and key[3] == group_id)
+        return override
 
     async def upsert_for_user(
             self,
@@ -85,15 +95,18 @@ class ModelConversationRepository(BaseRepository[ModelConversation]):
     ) -> ModelConversation:
         existing = await self.find_override(agent_id=agent_id, user_id=user_id)
         if existing:
-            return await self.update(existing.id, {"model_id": model_id})
-
-        return await self.insert(
-            ModelConversation(
-                user_id=user_id,
-                agent_id=agent_id,
-                model_id=model_id,
+            override = await self.update(existing.id, {"model_id": model_id})
+        else:
+            override = await self.insert(
+                ModelConversation(
+                    user_id=user_id,
+                    agent_id=agent_id,
+                    model_id=model_id,
+                )
             )
-        )
+
+        _RESOLVED_MODEL.invalidate_where(lambda key: key[0] == agent_id and key[2] == user_id)
+        return override
 
     async def resolve_agent_model(
             self,
@@ -101,15 +114,20 @@ class ModelConversationRepository(BaseRepository[ModelConversation]):
             user_id: Optional[int] = None,
             group_id: Optional[int] = None,
     ) -> Optional[Model]:
+        key = (agent.id, agent.model_id, user_id, group_id)
+        cached = _RESOLVED_MODEL.get(key)
+        if cached is not MISSING:
+            return cached
+
         conversation_model = await self.find_model_for_agent(
             agent_id=agent.id,
             user_id=user_id,
             group_id=group_id,
         )
         if conversation_model:
-            return conversation_model
+            return _RESOLVED_MODEL.set(key, detached(conversation_model))
 
         result = await self.db.execute(
             select(Model).filter(Model.id == agent.model_id)
         )
-        return result.scalar_one_or_none()
+        return _RESOLVED_MODEL.set(key, detached(result.scalar_one_or_none()))
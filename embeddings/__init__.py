@@ -1 +1,2 @@
+from embeddings.batcher import embedding_batcher, EmbeddingItem
 from embeddings.generate_embeddings import generate_text_embeddings
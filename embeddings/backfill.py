@@ -0,0 +1,150 @@
+""" Embedding Backfill
+
+- ``reduce``: shrinks stored description and term embeddings to
+  ``EMBEDDING_DIMENSION`` (Matryoshka truncation + L2 normalization, done in
+  SQL) in small batches, so rows written before the dimension changed become
+  searchable again without rewriting the whole table under one lock. Runs in
+  the background on startup and is cheap when there is nothing to do.
+- ``missing``: embeds media descriptions whose ``description_embedding`` is
+  NULL (failed or older describe jobs, rows shorter than the target
+  dimension), one multi-input request per batch.
+
+Usage:
+python -m embeddings.backfill  # reduce
+python -m embeddings.backfill reduce
+python -m embeddings.backfill missing --batch-size 64
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import text, update
+
+from database import dispose_database_engine, PgConnection
+from database.models.content import Media
+from embeddings.batcher import embedding_batcher, EmbeddingItem
+from log import logger
+from utils import EMBEDDING_DIMENSION, reduce_embedding
+
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_EMBED_BATCH_SIZE = 64
+
+_TARGETS = [
+    ("content.media", "description_embedding"),
+    ("manager.embedding", "embedding"),
+]
+
+
+async def _reduce_batch(table: str, column: str, batch_size: int) -> int:
+    async with PgConnection() as db:
+        result = await db.execute(
+            text(f"""
+                UPDATE {table}
+                SET {column} = l2_normalize(subvector({column}, 1, :dimension))
+                WHERE id IN (
+                    SELECT id FROM {table}
+                    WHERE vector_dims({column}) > :dimension
+                    LIMIT :batch_size
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id
+            """),
+            {"dimension": EMBEDDING_DIMENSION, "batch_size": batch_size},
+        )
+        reduced = len(result.all())
+        await db.commit()
+    return reduced
+
+
+async def backfill_reduced_embeddings(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    total = 0
+    try:
+        for table, column in _TARGETS:
+            while reduced := await _reduce_batch(table, column, batch_size):
+                total += reduced
+    except Exception as error:
+        await logger.error("Embeddings", "Backfill", str(error))
+        return total
+
+    if total:
+        await logger.info("Embeddings", "Backfill", f"Reduced {total} embeddings to {EMBEDDING_DIMENSION} dimensions.")
+    return total
+
+
+async def _embed_missing_batch(batch_size: int, after_id: int) -> tuple[int, int]:
+    """Embed the next batch of described media without an embedding. Returns (count, last id)."""
+    async with PgConnection() as db:
+        result = await db.execute(
+            text("""
+                SELECT media.id, media.description, sender.user_id, sender.group_id
+                FROM content.media AS media
+                JOIN LATERAL (
+                    SELECT message.user_id, message.group_id
+                    FROM content.message
+                    WHERE message.media_id = media.id
+                    ORDER BY message.created_at
+                    LIMIT 1
+                ) AS sender ON true
+                WHERE media.id > :after_id
+                  AND media.description IS NOT NULL
+                  AND (media.description_embedding IS NULL
+                       OR vector_dims(media.description_embedding) < :dimension)
+                ORDER BY media.id
+                LIMIT :batch_size
+            """),
+            {"after_id": after_id, "dimension": EMBEDDING_DIMENSION, "batch_size": batch_size},
+        )
+        rows = result.all()
+        if not rows:
+            return 0, after_id
+
+        vectors = await embedding_batcher.embed_many([
+            EmbeddingItem(row.description, row.user_id, row.group_id) for row in rows
+        ])
+        await db.execute(
+            update(Media),
+            [
+                {"id": row.id, "description_embedding": reduce_embedding(vector)}
+                for row, vector in zip(rows, vectors)
+            ],
+        )
+        await db.commit()
+    return len(rows), rows[-1].id
+
+
+async def backfill_missing_embeddings(batch_size: int = DEFAULT_EMBED_BATCH_SIZE) -> int:
+    total = 0
+    after_id = 0
+    try:
+        while True:
+            embedded, after_id = await _embed_missing_batch(batch_size, after_id)
+            if not embedded:
+                break
+            total += embedded
+    except Exception as error:
+        await logger.error("Embeddings", "Backfill", str(error))
+        return total
+
+    if total:
+        await logger.info("Embeddings", "Backfill", f"Embedded {total} media descriptions.")
+    return total
+
+
+async def _main(command: str, batch_size: int) -> None:
+    try:
+        if command == "reduce":
+            print(await backfill_reduced_embeddings(batch_size))
+        else:
+            print(await backfill_missing_embeddings(batch_size))
+    finally:
+        await dispose_database_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill stored embeddings.")
+    parser.add_argument("command", nargs="?", choices=["reduce", "missing"], default="reduce")
+    parser.add_argument("--batch-size", type=int)
+    args = parser.parse_args()
+
+    default_batch_size = DEFAULT_BATCH_SIZE if args.command == "reduce" else DEFAULT_EMBED_BATCH_SIZE
+    asyncio.run(_main(args.command, args.batch_size or default_batch_size))
@@ -0,0 +1,147 @@
+"""
+Embedding Batcher
+
+Coalesces embedding requests made within a short window (e.g. the
+descriptions of an album being processed by several media workers) into a
+single multi-input ``/embeddings`` call. Each batch records its usage in one
+bulk insert: one ``Interaction`` per user and group in the batch, with the
+prompt tokens split across items by text length.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Optional
+
+from database import PgConnection
+from database.models.manager import Interaction
+from database.operations.manager import InteractionRepository, ModelRepository
+from external import embeddings
+from utils import get_env_var
+
+
+DEFAULT_WINDOW_SECONDS = 0.1
+DEFAULT_MAX_BATCH_SIZE = 64
+
+
+@dataclass
+class EmbeddingItem:
+    text: str
+    user_id: int
+    group_id: Optional[int] = None
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+
+def _split_tokens(total: int, items: list[EmbeddingItem]) -> list[int]:
+    """Attribute ``total`` tokens to items proportionally to their length."""
+    lengths = [max(1, len(item.text)) for item in items]
+    shares = [total * length // sum(lengths) for length in lengths]
+    shares[-1] += total - sum(shares)
+    return shares
+
+
+class EmbeddingBatcher:
+    def __init__(
+            self,
+            window: float = DEFAULT_WINDOW_SECONDS,
+            max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ):
+        self.window = window
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._pending: list[EmbeddingItem] = []
+        self._flush_task: asyncio.Task | None = None
+
+        self._batches = 0
+        self._items = 0
+
+    def metrics(self) -> dict:
+        return {"batches": self._batches, "items": self._items}
+
+    async def embed(self, text: str, user_id: int, group_id: Optional[int] = None) -> list[float]:
+        """Queue a text for the next batch and wait for its embedding."""
+        item = EmbeddingItem(text, user_id, group_id, asyncio.get_running_loop().create_future())
+        self._pending.append(item)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush_now()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later(), name="embedding_batcher_flush")
+
+        return await item.future
+
+    async def embed_many(self, items: list[EmbeddingItem]) -> list[list[float]]:
+        """Embed a known list right away, in chunks of ``max_batch_size``."""
+        results = []
+        for start in range(0, len(items), self.max_batch_size):
+            results.extend(await self._embed_batch(items[start:start + self.max_batch_size]))
+        return results
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        self._flush_task = None
+        self._flush_now()
+
+    def _flush_now(self) -> None:
+        # Imported here: the services package imports embeddings on load.
+        from services.background import run_in_background
+
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            run_in_background(self._resolve(batch), name="embedding_batcher_batch")
+
+    async def _resolve(self, batch: list[EmbeddingItem]) -> None:
+        try:
+            vectors = await self._embed_batch(batch)
+        except Exception as error:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(error)
+            return
+
+        for item, vector in zip(batch, vectors):
+            if not item.future.done():
+                item.future.set_result(vector)
+
+    async def _embed_batch(self, batch: list[EmbeddingItem]) -> list[list[float]]:
+        async with PgConnection() as db:
+            embedding_model = await ModelRepository(db).get_default_embedding_model()
+            embedding_json = await embeddings([item.text for item in batch], embedding_model.openrouter_id)
+
+            data = sorted(embedding_json["data"], key=lambda entry: entry.get("index", 0))
+            if len(data) != len(batch):
+                raise ValueError(f"Expected {len(batch)} embeddings, got {len(data)}")
+
+            usage = embedding_json.get("usage") or {}
+            input_tokens = usage.get("prompt_tokens", 0)
+            output_tokens = usage.get("total_tokens", input_tokens) - input_tokens
+
+            per_owner: dict[tuple[int, Optional[int]], list[tuple[EmbeddingItem, int, int]]] = {}
+            for item, item_input, item_output in zip(
+                    batch, _split_tokens(input_tokens, batch), _split_tokens(output_tokens, batch)
+            ):
+                per_owner.setdefault((item.user_id, item.group_id), []).append((item, item_input, item_output))
+
+            await InteractionRepository(Interaction, db).insert_interactions([
+                Interaction(
+                    model_id=embedding_model.id,
+                    user_id=user_id,
+                    group_id=group_id,
+                    user_prompt="\n\n".join(item.text for item, _, _ in owned),
+                    input_tokens=sum(item_input for _, item_input, _ in owned),
+                    output_tokens=sum(item_output for _, _, item_output in owned),
+                )
+                for (user_id, group_id), owned in per_owner.items()
+            ])
+
+        self._batches += 1
+        self._items += len(batch)
+        return [entry["embedding"] for entry in data]
+
+
+embedding_batcher = EmbeddingBatcher(
+    window=float(get_env_var("EMBEDDING_BATCH_WINDOW_MS") or DEFAULT_WINDOW_SECONDS * 1000) / 1000,
+    max_batch_size=int(get_env_var("EMBEDDING_BATCH_MAX_SIZE") or DEFAULT_MAX_BATCH_SIZE),
+)
@@ -1,3 +1,3 @@
 from external.evolution import evolution_instance_key, get_group_info
 from external.firecrawl import get_url_content
-from external.openrouter import completions, embeddings
+from external.openrouter import close_openrouter_client, completions, embeddings, stream_completions
@@ -1,5 +1,5 @@
 from external.evolution.audio import send_audio
-from external.evolution.base import evolution_instance_key
+from external.evolution.base import close_evolution_client, evolution_instance_key, open_evolution_client
 from external.evolution.group import get_group_info
 from external.evolution.image import (
     extract_quoted_image_bytes,
@@ -1,3 +1,7 @@
+from importlib.util import find_spec
+
+import httpx
+
 from utils import get_env_var
 
 
@@ -5,3 +9,57 @@ evolution_api = get_env_var("EVOLUTION_API")
 evolution_api_key = get_env_var("EVOLUTION_API_KEY")
 evolution_instance_name = get_env_var("EVOLUTION_INSTANCE_NAME")
 evolution_instance_key = get_env_var("EVOLUTION_INSTANCE_KEY")
+
+# Per-endpoint timeouts (seconds). Connect stays short everywhere so a dead
+# Evolution instance fails fast instead of piling up waiting requests.
+CONNECT_TIMEOUT = 5.0
+# Evolution holds the presence request for the typing delay (up to 12s).
+PRESENCE_TIMEOUT = httpx.Timeout(30.0, connect=CONNECT_TIMEOUT)
+MESSAGE_TIMEOUT = httpx.Timeout(30.0, connect=CONNECT_TIMEOUT)
+PROFILE_TIMEOUT = httpx.Timeout(15.0, connect=CONNECT_TIMEOUT)
+GROUP_TIMEOUT = httpx.Timeout(15.0, connect=CONNECT_TIMEOUT)
+MEDIA_TIMEOUT = httpx.Timeout(60.0, connect=CONNECT_TIMEOUT)
+
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+
+_CLIENT: httpx.AsyncClient | None = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=evolution_api or "",
+        headers={
+            "Content-Type": "application/json",
+            "apikey": evolution_api_key or "",
+        },
+        timeout=MESSAGE_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        # HTTP/2 is negotiated over TLS only and needs the optional h2 package.
+        http2=find_spec("h2") is not None,
+    )
+
+
+def get_evolution_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for every Evolution API call."""
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        _CLIENT = _build_client()
+    return _CLIENT
+
+
+async def open_evolution_client() -> None:
+    get_evolution_client()
+
+
+async def close_evolution_client() -> None:
+    global _CLIENT
+
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
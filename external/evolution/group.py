@@ -1,13 +1,10 @@
-import httpx
+from external.evolution.base import evolution_instance_name, get_evolution_client, GROUP_TIMEOUT
 
-from external.evolution.base import evolution_api, evolution_api_key, evolution_instance_name
 
-
-def get_group_info(group_id: str) -> dict:
-    headers = {
-        "Content-Type": "application/json",
-        "apikey": evolution_api_key,
-    }
-
-    req = httpx.get(f"{evolution_api}/group/findGroupInfos/{evolution_instance_name}?groupJid={group_id}", headers=headers)
-    return req.json()
+async def get_group_info(group_id: str) -> dict:
+    response = await get_evolution_client().get(
+        f"/group/findGroupInfos/{evolution_instance_name}",
+        params={"groupJid": group_id},
+        timeout=GROUP_TIMEOUT,
+    )
+    return response.json()
@@ -4,11 +4,15 @@ from typing import Optional
 
 import httpx
 
-from external.evolution.base import evolution_api, evolution_api_key, evolution_instance_name
+from external.evolution.base import (
+    evolution_instance_name,
+    get_evolution_client,
+    MEDIA_TIMEOUT,
+    PROFILE_TIMEOUT,
+)
 from log import logger
 
 
-DEFAULT_TIMEOUT = 60.0
 DEFAULT_FILENAME_IMAGE = "gork.jpeg"
 DEFAULT_FILENAME_VIDEO = "gork.mp4"
 MIMETYPE_JPEG = "image/jpeg"
@@ -37,21 +41,15 @@ async def extract_quoted_image_bytes(webhook_data: dict) -> Optional[bytes]:
 
 
 async def _send_media_request(
-    url: str, payload: dict, timeout: float = DEFAULT_TIMEOUT
+    url: str, payload: dict, timeout: httpx.Timeout = MEDIA_TIMEOUT
 ) -> dict:
-    headers = {
-        "Content-Type": "application/json",
-        "apikey": evolution_api_key,
-    }
-
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    response = await get_evolution_client().post(url, json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
 
 
 async def send_sticker(contact_id: str, image_base64: str) -> dict:
-    url = f"{evolution_api}/message/sendSticker/{evolution_instance_name}"
+    url = f"/message/sendSticker/{evolution_instance_name}"
 
     payload = {"number": contact_id, "sticker": image_base64}
 
@@ -62,10 +60,10 @@ async def send_sticker(contact_id: str, image_base64: str) -> dict:
         raise
 
 
-async def send_animated_sticker(contact_id: str, sticker_url: str) -> dict:
-    url = f"{evolution_api}/message/sendSticker/{evolution_instance_name}"
+async def send_animated_sticker(contact_id: str, sticker: str) -> dict:
+    url = f"/message/sendSticker/{evolution_instance_name}"
 
-    payload = {"number": contact_id, "sticker": sticker_url}
+    payload = {"number": contact_id, "sticker": sticker}
 
     try:
         return await _send_media_request(url, payload)
@@ -82,7 +80,7 @@ async def send_image(
     filename: str = DEFAULT_FILENAME_IMAGE,
     caption: str = "",
 ) -> dict:
-    url = f"{evolution_api}/message/sendMedia/{evolution_instance_name}"
+    url = f"/message/sendMedia/{evolution_instance_name}"
 
     payload = {
         "number": contact_id,
@@ -106,7 +104,7 @@ async def send_video(
     quoted_message_id: Optional[str] = None,
     caption: str = "",
 ) -> dict:
-    url = f"{evolution_api}/message/sendMedia/{evolution_instance_name}"
+    url = f"/message/sendMedia/{evolution_instance_name}"
 
     payload = {
         "number": contact_id,
@@ -127,20 +125,12 @@ async def send_video(
 
 
 async def get_profile_info(number: str) -> dict:
-    url = f"{evolution_api}/chat/fetchProfile/{evolution_instance_name}"
+    url = f"/chat/fetchProfile/{evolution_instance_name}"
 
     payload = {"number": number}
 
-    headers = {
-        "Content-Type": "application/json",
-        "apikey": evolution_api_key,
-    }
-
     try:
-        async with httpx.AsyncClient(timeout=DEFAULT_TIMEOUT) as client:
-            response = await client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        return await _send_media_request(url, payload, timeout=PROFILE_TIMEOUT)
     except Exception as e:
         await logger.error("EvolutionProfile", "Erro ao obter perfil", str(e))
         raise
@@ -1,6 +1,9 @@
-import httpx
-
-from external.evolution.base import evolution_api, evolution_api_key, evolution_instance_name
+from external.evolution.base import (
+    evolution_instance_name,
+    get_evolution_client,
+    MESSAGE_TIMEOUT,
+    PRESENCE_TIMEOUT,
+)
 
 
 MIN_TYPING_DELAY_MS = 800
@@ -26,13 +29,9 @@ def calculate_typing_delay_ms(message: str) -> int:
 
 
 async def send_message(contact_id: str, message: str, message_id: str = None, is_first: bool = True):
-    headers = {
-        "Content-Type": "application/json",
-        "apikey": evolution_api_key
-    }
-
-    url_message = f"{evolution_api}/message/sendText/{evolution_instance_name}"
-    url_send_presence = f"{evolution_api}/message/sendPresence/{evolution_instance_name}"
+    client = get_evolution_client()
+    url_message = f"/message/sendText/{evolution_instance_name}"
+    url_send_presence = f"/message/sendPresence/{evolution_instance_name}"
 
     delay = calculate_typing_delay_ms(message)
 
@@ -42,8 +41,7 @@ async def send_message(contact_id: str, message: str, message_id: str = None, is
         "presence": "composing"
     }
 
-    async with httpx.AsyncClient() as client:
-        _ = await client.post(url_send_presence, json=payload_send_presence, headers=headers, timeout=60)
+    _ = await client.post(url_send_presence, json=payload_send_presence, timeout=PRESENCE_TIMEOUT)
 
     payload = {
         "number": contact_id,
@@ -53,6 +51,5 @@ async def send_message(contact_id: str, message: str, message_id: str = None, is
     if message_id and is_first:
         payload.update({"quoted": {"key": {"id": message_id}}})
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url_message, json=payload, headers=headers, timeout=60)
-        return response.json()
+    response = await client.post(url_message, json=payload, timeout=MESSAGE_TIMEOUT)
+    return response.json()
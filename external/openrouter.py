@@ -1,4 +1,6 @@
-from datetime import datetime
+import asyncio
+import json
+import time
 
 import httpx
 
@@ -8,61 +10,177 @@ from utils import get_env_var
 
 OPENROUTER_ENDPOINT = "https://openrouter.ai/api/v1"
 
-async def completions(payload: dict, is_online: bool = False) -> dict:
-    start = datetime.now()
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {get_env_var('OPENROUTER_KEY')}",
-    }
+REQUEST_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 60.0
+DEFAULT_MAX_CONCURRENCY_PER_MODEL = 8
+
+_CLIENT: httpx.AsyncClient | None = None
+_MODEL_SEMAPHORES: dict[str, asyncio.Semaphore] = {}
+
+
+def _max_concurrency_per_model() -> int:
+    return int(get_env_var("OPENROUTER_MAX_CONCURRENCY_PER_MODEL") or DEFAULT_MAX_CONCURRENCY_PER_MODEL)
+
+
+def get_openrouter_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for every OpenRouter call."""
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        _CLIENT = httpx.AsyncClient(
+            base_url=OPENROUTER_ENDPOINT,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {get_env_var('OPENROUTER_KEY')}",
+            },
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _CLIENT
+
+
+async def close_openrouter_client() -> None:
+    global _CLIENT
+
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
 
-    if is_online and payload.get("model") and not payload["model"].endswith(":online"):
-        payload = {**payload, "model": f"{payload['model']}:online"}
 
-    with httpx.Client(timeout=120) as client:
-        duration = datetime.now() - start
+def _model_semaphore(model: str | None) -> asyncio.Semaphore:
+    key = (model or "").removesuffix(":online")
+    semaphore = _MODEL_SEMAPHORES.get(key)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_max_concurrency_per_model())
+        _MODEL_SEMAPHORES[key] = semaphore
+    return semaphore
+
+
+async def _post(path: str, payload: dict, operation: str, log_payload: bool = True) -> dict:
+    model = payload.get("model")
+    async with _model_semaphore(model):
+        # Timed inside the semaphore so the log reflects the request itself,
+        # not the wait for a free slot.
+        start = time.perf_counter()
         try:
-            response = client.post(f"{OPENROUTER_ENDPOINT}/chat/completions", json=payload, headers=headers)
+            response = await get_openrouter_client().post(path, json=payload)
             response.raise_for_status()
-            minutes = duration.total_seconds() / 60
-            await openrouter_logger.info("OpenRouter", "Conversation", f"Model: {payload.get('model')} - Time took: {minutes:.2f}. Payload: {payload}")
-            return response.json()
+            result = response.json()
         except Exception as error:
-            minutes = duration.total_seconds() / 60
+            duration = time.perf_counter() - start
             await openrouter_logger.info(
                 "OpenRouter",
-                "Conversation",
-                f"Model: {payload.get('model')} - Time took: {minutes:.2f}. Payload: {payload}. Error: {error}"
+                operation,
+                f"Model: {model} - Time took: {duration:.2f}s. Payload: {payload}. Error: {error}"
             )
             raise error
 
+    duration = time.perf_counter() - start
+    details = f"Model: {model} - Time took: {duration:.2f}s"
+    if log_payload:
+        details = f"{details}. Payload: {payload}"
+    await openrouter_logger.info("OpenRouter", operation, details)
+    return result
+
+
+async def completions(payload: dict, is_online: bool = False) -> dict:
+    if is_online and payload.get("model") and not payload["model"].endswith(":online"):
+        payload = {**payload, "model": f"{payload['model']}:online"}
+
+    return await _post("/chat/completions", payload, "Conversation")
 
-async def embeddings(text: str, model: str) -> dict:
-    start = datetime.now()
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {get_env_var('OPENROUTER_KEY')}",
-    }
 
+async def embeddings(text: str | list[str], model: str) -> dict:
+    """Embed one text or a batch; with a list, ``data[i]`` holds the embedding of ``text[i]``."""
     payload = {
       "model": model,
       "input": text,
       "encodingFormat": "float"
     }
 
-    with httpx.Client(timeout=120) as client:
-        try:
-            response = client.post(f"{OPENROUTER_ENDPOINT}/embeddings", json=payload, headers=headers)
-            response.raise_for_status()
-            duration = datetime.now() - start
-            minutes = duration.total_seconds() / 60
-            await openrouter_logger.info("OpenRouter", "Embedding", f"Model: {payload.get('model')} - Time took: {minutes:.2f}")
-            return response.json()
-        except Exception as error:
-            duration = datetime.now() - start
-            minutes = duration.total_seconds() / 60
-            await openrouter_logger.info(
-                "OpenRouter",
-                "Conversation",
-                f"Model: {payload.get('model')} - Time took: {minutes:.2f}. Payload: {payload}. Error: {error}"
-            )
-            raise error
+    return await _post("/embeddings", payload, "Embedding", log_payload=False)
+
+
+def _parse_sse_line(line: str) -> dict | None:
+    line = line.strip()
+    if not line.startswith("data:"):
+        # Blank separators and ": OPENROUTER PROCESSING" keep-alive comments.
+        return None
+
+    data = line[len("data:"):].strip()
+    if not data or data == "[DONE]":
+        return None
+    return json.loads(data)
+
+
+class CompletionStream:
+    """
+    Server-sent events stream of a chat completion.
+
+    Iterating yields content deltas as they arrive; once exhausted,
+    ``content`` holds the full text and ``usage`` the token counts.
+    """
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+        self.content = ""
+        self.usage: dict = {}
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        model = self.payload.get("model")
+        payload = {**self.payload, "stream": True, "usage": {"include": True}}
+        parts: list[str] = []
+
+        async with _model_semaphore(model):
+            start = time.perf_counter()
+            try:
+                async with get_openrouter_client().stream("POST", "/chat/completions", json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        chunk = _parse_sse_line(line)
+                        if chunk is None:
+                            continue
+
+                        if chunk.get("error"):
+                            raise RuntimeError(f"OpenRouter stream error: {chunk['error']}")
+
+                        if chunk.get("usage"):
+                            self.usage = chunk["usage"]
+
+                        for choice in chunk.get("choices", []):
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                parts.append(delta)
+                                yield delta
+            except Exception as error:
+                duration = time.perf_counter() - start
+                await openrouter_logger.info(
+                    "OpenRouter",
+                    "ConversationStream",
+                    f"Model: {model} - Time took: {duration:.2f}s. Payload: {self.payload}. Error: {error}"
+                )
+                raise error
+            finally:
+                self.content = "".join(parts)
+
+        duration = time.perf_counter() - start
+        await openrouter_logger.info(
+            "OpenRouter",
+            "ConversationStream",
+            f"Model: {model} - Time took: {duration:.2f}s. Payload: {self.payload}"
+        )
+
+
+def stream_completions(payload: dict, is_online: bool = False) -> CompletionStream:
+    if is_online and payload.get("model") and not payload["model"].endswith(":online"):
+        payload = {**payload, "model": f"{payload['model']}:online"}
+
+    return CompletionStream(payload)
@@ -1 +1 @@
-from log.config import logger, openrouter_logger, other_webhooks_logger
+from log.config import close_log_writer, logger, openrouter_logger, other_webhooks_logger
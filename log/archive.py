@@ -0,0 +1,278 @@
+""" Log Archive Module
+
+Compacts closed daily log partitions (``*.log`` files from previous days)
+into zstd-compressed Parquet files under ``<log dir>/archive`` and provides a
+small helper to query archived and current logs by date range.
+
+Usage:
+from log.archive import query_logs, schedule_log_compaction
+
+schedule_log_compaction(scheduler)
+rows = query_logs(date(2026, 1, 1), log="openrouter", contains="Time took")
+
+# Or from the command line
+python -m log.archive compact
+python -m log.archive query 2026-01-01 2026-01-31 --log openrouter --contains gpt
+"""
+import argparse
+import asyncio
+import fcntl
+import os
+import re
+import tempfile
+from datetime import date, datetime
+from typing import Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from log.config import logger, PARTITION_FORMAT
+
+
+ARCHIVE_DIR_NAME = "archive"
+ARCHIVE_COMPRESSION = "zstd"
+COMPACTION_LOCK_NAME = ".compaction.lock"
+COLUMNS = ["mode", "created_at", "module", "message", "detail"]
+MODES = ("INFO", "WARN", "ERROR")
+CREATED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_FILE_NAME = re.compile(
+    r"^(?:(?P<log>.+)-)?(?P<partition>\d{4}_\d{2}_\d{2})(?P<ext>(?:\.[A-Za-z0-9]+)?)\.(?P<kind>log|parquet)$"
+)
+_ROW_START = re.compile(rf"^(?:{'|'.join(MODES)}) \| ")
+
+
+def _log_dir() -> str:
+    return logger._log_file_dir_
+
+
+def _archive_dir() -> str:
+    return os.path.join(_log_dir(), ARCHIVE_DIR_NAME)
+
+
+def _partition_date(partition: str) -> date:
+    return datetime.strptime(partition, PARTITION_FORMAT).date()
+
+
+def _list_files(directory: str, kind: str) -> list[tuple[str, str, date]]:
+    """Return (path, log name, partition date) for every partitioned file of ``kind``."""
+    if not os.path.isdir(directory):
+        return []
+
+    files = []
+    for file_name in sorted(os.listdir(directory)):
+        match = _FILE_NAME.match(file_name)
+        if not match or match.group("kind") != kind:
+            continue
+        files.append((
+            os.path.join(directory, file_name),
+            match.group("log") or "",
+            _partition_date(match.group("partition")),
+        ))
+    return files
+
+
+def _parse_created_at(value: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value, CREATED_AT_FORMAT)
+    except ValueError:
+        return None
+
+
+def parse_log_file(path: str) -> dict[str, list]:
+    """
+    Read a pipe-delimited log file into columns.
+
+    Lines that do not start with a log mode are continuations of a multi-line
+    detail and are appended to the previous row.
+    """
+    columns: dict[str, list] = {column: [] for column in COLUMNS}
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for raw_line in f:
+            line = raw_line.rstrip("\n")
+            if not _ROW_START.match(line):
+                if columns["detail"] and not line.startswith("MODE |"):
+                    columns["detail"][-1] = f"{columns['detail'][-1]}\n{line.rstrip()}"
+                continue
+
+            parts = line.rstrip().split(" | ", 4)
+            parts += [""] * (len(COLUMNS) - len(parts))
+            mode, created_at, module, message, detail = parts
+
+            columns["mode"].append(mode)
+            columns["created_at"].append(_parse_created_at(created_at))
+            columns["module"].append(module)
+            columns["message"].append(message)
+            columns["detail"].append(detail)
+
+    return columns
+
+
+def _to_table(columns: dict[str, list], log: str):
+    size = len(columns["mode"])
+    return pa.table({
+        "log": pa.array([log] * size, pa.string()),
+        "mode": pa.array(columns["mode"], pa.string()),
+        "created_at": pa.array(columns["created_at"], pa.timestamp("ms")),
+        "module": pa.array(columns["module"], pa.string()),
+        "message": pa.array(columns["message"], pa.string()),
+        "detail": pa.array(columns["detail"], pa.string()),
+    })
+
+
+def compact_closed_logs(today: Optional[date] = None) -> list[str]:
+    """
+    Convert every ``.log`` partition older than ``today`` into Parquet and
+    delete the source file. Returns the archive paths written.
+
+    Every worker process schedules this job, so the run holds an exclusive
+    lock on the archive directory; a process that finds it taken returns
+    without doing anything.
+    """
+    today = today or datetime.now().date()
+    archive_dir = _archive_dir()
+    os.makedirs(archive_dir, exist_ok=True)
+
+    with open(os.path.join(archive_dir, COMPACTION_LOCK_NAME), "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return []
+        return _compact(today, archive_dir)
+
+
+def _compact(today: date, archive_dir: str) -> list[str]:
+    written = []
+
+    for path, log, partition in _list_files(_log_dir(), "log"):
+        if partition >= today:
+            continue
+
+        target = os.path.join(archive_dir, os.path.basename(path)[:-len(".log")] + ".parquet")
+        if os.path.exists(target):
+            # Archived by an earlier run that stopped before removing the source.
+            _remove(path)
+            continue
+
+        try:
+            table = _to_table(parse_log_file(path), log)
+        except FileNotFoundError:
+            continue
+
+        fd, temp_target = tempfile.mkstemp(dir=archive_dir, prefix=f".{os.path.basename(target)}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            pq.write_table(table, temp_target, compression=ARCHIVE_COMPRESSION)
+            os.replace(temp_target, target)
+        except BaseException:
+            _remove(temp_target)
+            raise
+        _remove(path)
+        written.append(target)
+
+    return written
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def compact_logs() -> None:
+    try:
+        written = await asyncio.to_thread(compact_closed_logs)
+    except Exception as error:
+        await logger.error("LogArchive", "Compaction", str(error))
+        return
+
+    if written:
+        await logger.info("LogArchive", "Compaction", f"Archived {len(written)} log files.")
+
+
+def schedule_log_compaction(scheduler: AsyncIOScheduler) -> None:
+    scheduler.add_job(
+        compact_logs,
+        "cron",
+        hour=0,
+        minute=15,
+        id="log-compaction",
+        replace_existing=True,
+    )
+
+
+def query_logs(
+        start: date,
+        end: Optional[date] = None,
+        log: Optional[str] = None,
+        mode: Optional[str] = None,
+        module: Optional[str] = None,
+        contains: Optional[str] = None,
+        limit: Optional[int] = 1000,
+) -> list[dict]:
+    """
+    Query archived and not yet compacted logs between ``start`` and ``end``
+    (inclusive). ``log`` selects the log file name (``""`` for the main log,
+    ``"openrouter"``, ...); ``contains`` is a substring matched against the
+    detail column.
+    """
+    end = end or start
+
+    sources = [(path, name, partition, "parquet") for path, name, partition in _list_files(_archive_dir(), "parquet")]
+    sources += [(path, name, partition, "log") for path, name, partition in _list_files(_log_dir(), "log")]
+
+    tables = []
+    for path, name, partition, kind in sorted(sources, key=lambda source: source[2]):
+        if not start <= partition <= end:
+            continue
+        if log is not None and name != log:
+            continue
+
+        table = pq.read_table(path) if kind == "parquet" else _to_table(parse_log_file(path), name)
+
+        mask = None
+        for column, value in (("mode", mode), ("module", module)):
+            if value is not None:
+                condition = pc.equal(table[column], value)
+                mask = condition if mask is None else pc.and_(mask, condition)
+        if contains is not None:
+            condition = pc.match_substring(table["detail"], contains)
+            mask = condition if mask is None else pc.and_(mask, condition)
+
+        if mask is not None:
+            table = table.filter(mask)
+        tables.append(table)
+
+    if not tables:
+        return []
+
+    rows = pa.concat_tables(tables).to_pylist()
+    return rows[:limit] if limit else rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact and query structured logs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("compact", help="Archive closed log partitions as Parquet.")
+
+    query_parser = commands.add_parser("query", help="Print log rows in a date range.")
+    query_parser.add_argument("start", type=date.fromisoformat)
+    query_parser.add_argument("end", type=date.fromisoformat, nargs="?")
+    query_parser.add_argument("--log")
+    query_parser.add_argument("--mode")
+    query_parser.add_argument("--module")
+    query_parser.add_argument("--contains")
+    query_parser.add_argument("--limit", type=int, default=100)
+
+    args = parser.parse_args()
+    if args.command == "compact":
+        for archive in compact_closed_logs():
+            print(archive)
+    else:
+        for row in query_logs(args.start, args.end, args.log, args.mode, args.module, args.contains, args.limit):
+            print(" | ".join(str(row[column]) for column in ["log", *COLUMNS]))
@@ -5,8 +5,12 @@ similar to database records with consistent delimiters.
 The logs are stored in files organized by date, making them easy to parse and analyze.
 
 Features:
-- Asynchronous file operations using aiofiles
-- Date-based log file partitioning
+- Lines are buffered in memory and written in batches by a single background
+  task holding the files open, so logging never waits on disk I/O
+- Each batch is one unbuffered O_APPEND write of whole lines, so several
+  worker processes can share a daily file without interleaving rows
+- Date-based log file partitioning, resolved at write time
+- Closed partitions compacted into Parquet archives (see log.archive)
 - Configurable log formats and separators
 - Environment-aware logging
 - Support for different log levels (INFO, ERROR)
@@ -19,21 +23,194 @@ await logger.info("ModuleName", "OperationType", "Detailed message")
 
 # Log errors
 await logger.error("ModuleName", "ErrorType", "Exception details")
+
+# Flush pending lines on shutdown
+await close_log_writer()
 """
+import asyncio
 import functools
 import os
 import re
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from functools import reduce
 from string import Template
 from typing import Optional
 
-import aiofiles
-
 from utils.env_var import get_env_var
 from utils.path_config import project_root
 
 
+DEFAULT_BUFFER_SIZE = 50_000
+DEFAULT_FLUSH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL_SECONDS = 1.0
+IDLE_FILE_SECONDS = 300.0
+PARTITION_FORMAT = "%Y_%m_%d"
+
+
+class LogWriter:
+    """
+    Background sink shared by every StructuredLogger.
+
+    ``write`` only appends to a bounded ring buffer (the oldest lines are
+    dropped if the writer falls behind). A single task flushes the buffer
+    whenever it reaches ``flush_size`` lines or every ``flush_interval``
+    seconds, writing each batch in a worker thread through file descriptors that
+    stay open between batches. A batch goes out as a single ``os.write`` on an
+    ``O_APPEND`` descriptor ending on a line boundary, so lines written by
+    other processes to the same file land between batches, never inside one.
+    """
+
+    def __init__(
+            self,
+            buffer_size: int = DEFAULT_BUFFER_SIZE,
+            flush_size: int = DEFAULT_FLUSH_SIZE,
+            flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+
+        self._buffer: deque[tuple[str, str, str]] = deque(maxlen=buffer_size)
+        self._files: dict[str, int] = {}
+        self._last_write: dict[str, float] = {}
+        self._io_lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._closing = False
+
+    def write(self, path: str, header: str, line: str) -> None:
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append((path, header, line))
+
+        if not self._ensure_task():
+            # No running event loop (e.g. at import time): write through.
+            self._write_batch(self._take())
+            return
+
+        if len(self._buffer) >= self.flush_size:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        batch = self._take()
+        if batch:
+            # Shielded: cancelling a queued to_thread job would drop the batch.
+            await asyncio.shield(asyncio.to_thread(self._write_batch, batch))
+
+    async def close(self) -> None:
+        if self._task and not self._task.done():
+            self._closing = True
+            self._wakeup.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._closing = False
+        self._task = None
+        await self.flush()
+        self._close_files()
+
+    def _ensure_task(self) -> bool:
+        if self._task is not None and not self._task.done():
+            return True
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run(), name="log_writer")
+        return True
+
+    def _take(self) -> list[tuple[str, str, str]]:
+        batch = list(self._buffer)
+        self._buffer.clear()
+        return batch
+
+    async def _run(self) -> None:
+        try:
+            while not self._closing:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except TimeoutError:
+                    pass
+                self._wakeup.clear()
+                await self.flush()
+        except asyncio.CancelledError:
+            # Loop shutting down: persist whatever is still buffered.
+            self._write_batch(self._take())
+            raise
+
+    def _write_batch(self, batch: list[tuple[str, str, str]]) -> None:
+        if not batch:
+            return
+
+        grouped: dict[str, list[str]] = {}
+        headers: dict[str, str] = {}
+        for path, header, line in batch:
+            grouped.setdefault(path, []).append(line)
+            headers[path] = header
+
+        with self._io_lock:
+            if self.dropped:
+                print(f"[LOGGER]: {self.dropped} log lines dropped, writer could not keep up.")
+                self.dropped = 0
+
+            now = time.monotonic()
+            for path, lines in grouped.items():
+                fd = self._open(path, headers[path])
+                self._append(fd, "".join(lines))
+                self._last_write[path] = now
+
+            # Release handles of files nobody writes to anymore, e.g. the
+            # previous day's partition after rotation.
+            for path, last_write in list(self._last_write.items()):
+                if now - last_write > IDLE_FILE_SECONDS:
+                    os.close(self._files.pop(path))
+                    del self._last_write[path]
+
+    def _open(self, path: str, header: str) -> int:
+        fd = self._files.get(path)
+        if fd is not None:
+            return fd
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        flags = os.O_WRONLY | os.O_APPEND
+        try:
+            # O_EXCL picks exactly one process to write the header.
+            fd = os.open(path, flags | os.O_CREAT | os.O_EXCL, 0o644)
+            self._append(fd, header)
+        except FileExistsError:
+            fd = os.open(path, flags)
+        self._files[path] = fd
+        return fd
+
+    @staticmethod
+    def _append(fd: int, text: str) -> None:
+        data = memoryview(text.encode("utf-8"))
+        while data:
+            data = data[os.write(fd, data):]
+
+    def _close_files(self) -> None:
+        with self._io_lock:
+            for fd in self._files.values():
+                os.close(fd)
+            self._files.clear()
+            self._last_write.clear()
+
+
+log_writer = LogWriter(
+    buffer_size=int(get_env_var("LOG_BUFFER_SIZE") or DEFAULT_BUFFER_SIZE),
+    flush_size=int(get_env_var("LOG_FLUSH_SIZE") or DEFAULT_FLUSH_SIZE),
+    flush_interval=float(get_env_var("LOG_FLUSH_INTERVAL") or DEFAULT_FLUSH_INTERVAL_SECONDS),
+)
+
+
+async def close_log_writer() -> None:
+    await log_writer.close()
+
+
 class StructuredLogger:
     def __init__(self, log_format: Optional[str] = None, file_name: Optional[str] = None):
         log_append_path = get_env_var("LOG_APPEND_PATH")
@@ -48,9 +225,7 @@ class StructuredLogger:
             self._log_file_dir_ = log_path if log_path else default_log_dir
 
         self._log_file_format_ = f".{re.sub(r'[^a-zA-Z0-9]', '', log_format)}.log" if log_format else ".log"
-        self.partition_by = datetime.now().strftime("%Y_%m_%d")
-        self._file_name_ = f"{file_name}-{self.partition_by}" if file_name else self.partition_by
-        self._log_path_ = f"{self._log_file_dir_}/{self._file_name_}{self._log_file_format_}"
+        self._base_file_name_ = file_name
         self._env_ = get_env_var("ENV") if get_env_var("ENV") is not None else "dev"
 
         self.sep = "|"
@@ -59,13 +234,27 @@ class StructuredLogger:
         self.time_format = "%Y-%m-%d %H:%M:%S"
         self.format = Template(self.sep.join(f" ${h.lower()} " for h in self.headers).strip())
 
-    # TODO: Implement convertion to .parquet
+    @property
+    def partition_by(self) -> str:
+        # Resolved on every write so a long-running process rolls over to a
+        # new file at midnight. Closed files are archived by log.archive.
+        return datetime.now().strftime(PARTITION_FORMAT)
+
+    @property
+    def _file_name_(self) -> str:
+        partition = self.partition_by
+        return f"{self._base_file_name_}-{partition}" if self._base_file_name_ else partition
+
+    @property
+    def _log_path_(self) -> str:
+        return f"{self._log_file_dir_}/{self._file_name_}{self._log_file_format_}"
+
+    @property
+    def _header_(self) -> str:
+        return f" {self.sep} ".join(self.headers + [self.row_sep])
 
     async def init(self):
         os.makedirs(self._log_file_dir_, exist_ok=True)
-        if not os.path.exists(self._log_path_):
-            async with aiofiles.open(self._log_path_, "w") as f:
-                await f.write(f" {self.sep} ".join(self.headers + [self.row_sep]))
         return self
 
     @staticmethod
@@ -85,9 +274,7 @@ class StructuredLogger:
         return wrapper
 
     async def _write_log_(self, log_message: str):
-        await self.init()
-        async with aiofiles.open(self._log_path_, "a", encoding="utf-8") as f:
-            await f.write(f"{log_message} {self.row_sep}")
+        log_writer.write(self._log_path_, self._header_, f"{log_message} {self.row_sep}")
 
     @debug
     async def error(self, module:str, error_type:str, exception: str | None = None):
@@ -1,10 +1,22 @@
 from fastapi import FastAPI
 
 from api import webhook_evolution_router
+from api.routes.webhook.evolution.handles.image.gallery import warm_gallery_embeddings
+from api.routes.webhook.evolution.ingestion import webhook_queue
 from agents.init import init_agents
 from database import dispose_database_engine
+from database.operations.cache import start_invalidation_listener, stop_invalidation_listener
+from embeddings.backfill import backfill_reduced_embeddings
+from external import close_openrouter_client
+from external.evolution import close_evolution_client, open_evolution_client
 from scheduler import scheduler
-from services import set_remembers
+from services import drain_background_tasks, run_in_background, set_remembers
+from services.media_queue import media_queue
+from log import close_log_writer
+from log.archive import schedule_log_compaction
+from services.redis_client import close_redis_client
+from tts import shutdown_tts_executor, warm_voices
+from utils import shutdown_media_executor
 
 
 app = FastAPI()
@@ -12,12 +24,30 @@ app.include_router(webhook_evolution_router)
 
 @app.on_event("startup")
 async def startup_event():
+    await open_evolution_client()
+    start_invalidation_listener()
     await init_agents()
     await set_remembers(scheduler)
+    schedule_log_compaction(scheduler)
     scheduler.start()
+    await webhook_queue.start()
+    await media_queue.start()
+    run_in_background(backfill_reduced_embeddings(), "embedding_backfill")
+    run_in_background(warm_gallery_embeddings(), "gallery_warmup")
+    run_in_background(warm_voices(), "tts_warmup")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await webhook_queue.stop()
+    await drain_background_tasks()
+    await media_queue.stop()
     scheduler.shutdown(wait=False)
+    shutdown_media_executor()
+    shutdown_tts_executor()
+    await stop_invalidation_listener()
+    await close_redis_client()
+    await close_evolution_client()
+    await close_openrouter_client()
     await dispose_database_engine()
+    await close_log_writer()
@@ -7,9 +7,9 @@ from typing import List, Optional
 
 from minio import Minio
 from minio.error import S3Error
-from PIL import Image
 
-from utils import get_env_var
+from utils import get_env_var, run_in_process
+from utils.media_render import encode_image
 
 
 class S3Client:
@@ -134,26 +134,10 @@ class S3Client:
         loop = asyncio.get_event_loop()
         bucket_name = "whatsapp"
 
-        image_source = BytesIO(image_source)
-        image_source.seek(0)
-
-        img = Image.open(image_source)
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-        if convert_to_webp:
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
-            format_type = 'WEBP'
-            extension = 'webp'
-            content_type = 'image/webp'
-        else:
-            format_type = img.format or 'PNG'
-            extension = format_type.lower()
-            content_type = f'image/{extension}'
-
-        buffer = BytesIO()
-        img.save(buffer, format=format_type, quality=95)
-        buffer.seek(0)
+        image_bytes, extension, content_type = await run_in_process(
+            encode_image, image_source, convert_to_webp, max_size
+        )
+        buffer = BytesIO(image_bytes)
 
         if object_name is None:
             object_name = f"{uuid.uuid4()}.{extension}"
@@ -213,6 +197,42 @@ class S3Client:
 
         return object_name
 
+    async def upload_bytes(
+            self,
+            data: bytes,
+            object_name: str,
+            content_type: str,
+            bucket_name: str = "whatsapp",
+    ) -> str:
+        """
+        Upload raw bytes to MinIO as-is
+
+        Args:
+            data: Object content
+            object_name: S3 object name
+            content_type: MIME type of the object
+            bucket_name: Bucket name
+
+        Returns:
+            S3 object name
+        """
+        if not self.client:
+            raise RuntimeError("MinIO client not initialized")
+
+        loop = asyncio.get_event_loop()
+
+        await loop.run_in_executor(
+            None,
+            self.client.put_object,
+            bucket_name,
+            object_name,
+            BytesIO(data),
+            len(data),
+            content_type
+        )
+
+        return object_name
+
     async def get_presigned_url(
             self,
             sub_path: str,
@@ -1,3 +1,4 @@
+from services.background import drain_background_tasks, run_in_background
 from services.manage_interaction import manage_interaction
 from services.message_context import verifiy_media, get_mentions_from_content
 from services.params import parse_params
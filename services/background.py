@@ -0,0 +1,43 @@
+import asyncio
+import traceback
+from typing import Coroutine
+
+from log import logger
+
+
+_TASKS: set[asyncio.Task] = set()
+
+
+def _on_task_done(task: asyncio.Task) -> None:
+    _TASKS.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc:
+        tb = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+        asyncio.create_task(
+            logger.error("Background", "TaskError", f"{task.get_name()}: {exc}\n{tb}")
+        )
+
+
+def run_in_background(coro: Coroutine, name: str) -> asyncio.Task:
+    """
+    Fire-and-forget work kept off the reply path. A reference is held until
+    the task finishes and failures are logged instead of being lost.
+    """
+    task = asyncio.create_task(coro, name=name)
+    _TASKS.add(task)
+    task.add_done_callback(_on_task_done)
+    return task
+
+
+async def drain_background_tasks(timeout: float = 30.0) -> None:
+    """Wait for pending background work on shutdown, cancelling what is left."""
+    tasks = list(_TASKS)
+    if not tasks:
+        return
+
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
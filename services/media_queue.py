@@ -0,0 +1,244 @@
+"""
+Media Job Queue
+
+Persists message media outside the webhook path. Processors record a pending
+``content.media_job`` row per image or video message and return; a fixed pool
+of workers claims due jobs (``FOR UPDATE SKIP LOCKED``, so several processes
+can share the table) and runs them with retries and exponential backoff.
+
+Jobs go through two steps:
+- ``store``: download, dedupe by hash and phash, upload to MinIO, insert the
+  ``Media`` row and link it to the message.
+- ``describe``: vision description and its embedding, queued by ``store``
+  for new images only. It reads the image back from MinIO, so the media is
+  downloaded from Evolution once.
+
+A processor that needs the media to answer (e.g. ``!sticker`` on an image)
+calls ``run_now``, which runs the ``store`` step inline unless a worker got
+to it first, and leaves the description to the pool.
+"""
+import asyncio
+import traceback
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import PgConnection
+from database.models.content import MediaJob
+from database.operations.content import MediaJobRepository, MessageRepository
+from log import logger
+from services.save_image import describe_media, save_image_if_new
+from services.save_video import save_video_if_new
+from utils import get_env_var
+
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_POLL_SECONDS = 5.0
+DEFAULT_RETRY_DELAY_SECONDS = 30.0
+STALE_AFTER = timedelta(minutes=10)
+RUN_NOW_TIMEOUT_SECONDS = 120.0
+RUN_NOW_POLL_SECONDS = 0.5
+
+
+class MediaQueue:
+    def __init__(
+            self,
+            workers: int = DEFAULT_WORKERS,
+            max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+            poll_interval: float = DEFAULT_POLL_SECONDS,
+            retry_delay: float = DEFAULT_RETRY_DELAY_SECONDS,
+    ):
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+
+        self._processed = 0
+        self._retried = 0
+        self._failed = 0
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"media_queue_worker:{n}")
+            for n in range(self.workers)
+        ]
+        await logger.info("MediaQueue", "Start", f"Workers: {self.workers}")
+
+    async def stop(self) -> None:
+        # Jobs interrupted here stay 'running' and are picked up again once
+        # they are older than STALE_AFTER.
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        if self._wakeup:
+            self._wakeup.set()
+
+    def metrics(self) -> dict:
+        return {
+            "workers": self.workers,
+            "processed": self._processed,
+            "retried": self._retried,
+            "failed": self._failed,
+        }
+
+    async def enqueue_message_media(
+            self,
+            db: AsyncSession,
+            message_id: int,
+            user_id: int,
+            group_id: Optional[int] = None,
+            image_message_id: Optional[str] = None,
+            video_message_id: Optional[str] = None,
+    ) -> Optional[MediaJob]:
+        """Record a pending ``store`` job for the image or video of a message."""
+        if not image_message_id and not video_message_id:
+            return None
+
+        job = await MediaJobRepository(db).enqueue(
+            message_id=message_id,
+            media_type="image" if image_message_id else "video",
+            source_message_id=image_message_id or video_message_id,
+            user_id=user_id,
+            group_id=group_id,
+        )
+        self.notify()
+        return job
+
+    async def run_now(self, job_id: int, timeout: float = RUN_NOW_TIMEOUT_SECONDS) -> Optional[int]:
+        """
+        Run a job inline and return its media id. When a worker already
+        claimed it, wait for that worker instead. Returns None on failure or
+        timeout.
+        """
+        async with PgConnection() as db:
+            job = await MediaJobRepository(db).claim(job_id)
+        if job:
+            return await self._process(job)
+
+        deadline = asyncio.get_running_loop().time() + timeout
+        while asyncio.get_running_loop().time() < deadline:
+            async with PgConnection() as db:
+                job = await MediaJobRepository(db).find_by_id(job_id)
+            if not job or job.status == "failed":
+                return None
+            if job.status == "done":
+                return job.media_id
+            await asyncio.sleep(RUN_NOW_POLL_SECONDS)
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                async with PgConnection() as db:
+                    job = await MediaJobRepository(db).claim_next(STALE_AFTER)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                await logger.error("MediaQueue", "ClaimError", str(error))
+                job = None
+
+            if job:
+                await self._process(job)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except TimeoutError:
+                pass
+
+    async def _process(self, job: MediaJob) -> Optional[int]:
+        try:
+            media_id = await self._store(job) if job.step == "store" else await self._describe(job)
+        except Exception as error:
+            await self._on_error(job, error)
+            return None
+
+        async with PgConnection() as db:
+            await MediaJobRepository(db).complete(job.id, media_id)
+        self._processed += 1
+        return media_id
+
+    async def _store(self, job: MediaJob) -> Optional[int]:
+        async with PgConnection() as db:
+            message_id = await _message_ext_id(db, job.message_id)
+            if job.type == "image":
+                media = await save_image_if_new(
+                    db=db,
+                    user_id=job.user_id,
+                    message_id=message_id,
+                    image_message_id=job.source_message_id,
+                    group_id=job.group_id,
+                )
+            else:
+                media = await save_video_if_new(
+                    db=db,
+                    user_id=job.user_id,
+                    message_id=message_id,
+                    video_message_id=job.source_message_id,
+                    group_id=job.group_id,
+                )
+
+            if media and media.type == "image" and not media.description:
+                await MediaJobRepository(db).enqueue(
+                    message_id=job.message_id,
+                    media_type=job.type,
+                    source_message_id=job.source_message_id,
+                    user_id=job.user_id,
+                    group_id=job.group_id,
+                    step="describe",
+                    media_id=media.id,
+                )
+                self.notify()
+
+        return media.id if media else None
+
+    async def _describe(self, job: MediaJob) -> Optional[int]:
+        async with PgConnection() as db:
+            message_id = await _message_ext_id(db, job.message_id)
+        await describe_media(job.media_id, job.user_id, message_id)
+        return job.media_id
+
+    async def _on_error(self, job: MediaJob, error: Exception) -> None:
+        tb = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        async with PgConnection() as db:
+            repo = MediaJobRepository(db)
+            if job.attempts >= self.max_attempts:
+                self._failed += 1
+                await repo.fail(job.id, str(error))
+                await logger.error("MediaQueue", "JobFailed", f"{job.step} job {job.id}: {error}\n{tb}")
+                return
+
+            self._retried += 1
+            delay = timedelta(seconds=self.retry_delay * 2 ** (job.attempts - 1))
+            await repo.retry(job.id, str(error), delay)
+            await logger.warn(
+                "MediaQueue",
+                "JobRetry",
+                f"{job.step} job {job.id} attempt {job.attempts} failed, retrying in {delay}: {error}",
+            )
+
+
+async def _message_ext_id(db: AsyncSession, message_id: int) -> str:
+    message = await MessageRepository(db).find_by_id(message_id)
+    return message.message_id
+
+
+media_queue = MediaQueue(
+    workers=int(get_env_var("MEDIA_QUEUE_WORKERS") or DEFAULT_WORKERS),
+    max_attempts=int(get_env_var("MEDIA_QUEUE_MAX_ATTEMPTS") or DEFAULT_MAX_ATTEMPTS),
+    poll_interval=float(get_env_var("MEDIA_QUEUE_POLL_SECONDS") or DEFAULT_POLL_SECONDS),
+    retry_delay=float(get_env_var("MEDIA_QUEUE_RETRY_DELAY_SECONDS") or DEFAULT_RETRY_DELAY_SECONDS),
+)
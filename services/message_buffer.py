@@ -2,7 +2,6 @@ import asyncio
 import time
 import traceback
 
-import redis.asyncio as redis
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from agents.execution.filter import filter_agent
@@ -10,23 +9,11 @@ from api.routes.webhook.evolution.handles.chat import handle_conversation_agent
 from database import PgConnection
 from database.operations.content import MessageRepository
 from log import logger
-from utils import get_env_var
+from services.redis_client import get_redis_client
 
 
 BUFFER_LIMIT = 20
 BUFFER_GAP_SECONDS = 20
-_REDIS_CLIENT: redis.Redis | None = None
-
-
-def _redis_url() -> str:
-    return get_env_var("REDIS_URL") or "redis://localhost:6379/0"
-
-
-def _client() -> redis.Redis:
-    global _REDIS_CLIENT
-    if _REDIS_CLIENT is None:
-        _REDIS_CLIENT = redis.from_url(_redis_url(), decode_responses=True)
-    return _REDIS_CLIENT
 
 
 def _messages_key(group_id: int) -> str:
@@ -55,7 +42,7 @@ def _handle_task_exception(task: asyncio.Task) -> None:
 
 async def clear_group_message_buffer(group_id: int) -> None:
     try:
-        client = _client()
+        client = get_redis_client()
         await client.delete(_messages_key(group_id), _deadline_key(group_id))
     except Exception as error:
         await logger.error("GroupMessageBuffer", "ClearError", str(error))
@@ -68,7 +55,7 @@ async def buffer_group_message(
         scheduler: AsyncIOScheduler,
 ) -> None:
     try:
-        client = _client()
+        client = get_redis_client()
         messages_key = _messages_key(group_id)
         stored_deadline = await client.get(_deadline_key(group_id))
         if stored_deadline and time.time() >= float(stored_deadline):
@@ -105,7 +92,7 @@ async def _flush_after_gap(
 ) -> None:
     try:
         await asyncio.sleep(BUFFER_GAP_SECONDS)
-        client = _client()
+        client = get_redis_client()
         stored_deadline = await client.get(_deadline_key(group_id))
         if not stored_deadline:
             return
@@ -130,7 +117,7 @@ async def flush_group_message_buffer(
     lock_key = _lock_key(group_id)
 
     try:
-        client = _client()
+        client = get_redis_client()
         lock_acquired = await client.set(lock_key, "1", nx=True, ex=30)
         if not lock_acquired:
             return
@@ -0,0 +1,25 @@
+import redis.asyncio as redis
+
+from utils import get_env_var
+
+
+_REDIS_CLIENT: redis.Redis | None = None
+
+
+def _redis_url() -> str:
+    return get_env_var("REDIS_URL") or "redis://localhost:6379/0"
+
+
+def get_redis_client() -> redis.Redis:
+    global _REDIS_CLIENT
+    if _REDIS_CLIENT is None:
+        _REDIS_CLIENT = redis.from_url(_redis_url(), decode_responses=True)
+    return _REDIS_CLIENT
+
+
+async def close_redis_client() -> None:
+    global _REDIS_CLIENT
+
+    if _REDIS_CLIENT is not None:
+        await _REDIS_CLIENT.aclose()
+        _REDIS_CLIENT = None
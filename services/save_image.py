@@ -14,18 +14,10 @@ from embeddings import generate_text_embeddings
 from external.evolution import download_media
 from s3 import S3Client
 from services.message_context import verifiy_media
-from utils import get_image_hash, get_phash
+from utils import get_image_hash, get_phash, reduce_embedding, run_in_process
 
 
 PHASH_MAX_DISTANCE = 8
-MEDIA_EMBEDDING_DIMENSION = 2560
-
-def _fit_media_embedding(embedding: list[float]) -> list[float]:
-    if len(embedding) == MEDIA_EMBEDDING_DIMENSION:
-        return embedding
-    if len(embedding) > MEDIA_EMBEDDING_DIMENSION:
-        return embedding[:MEDIA_EMBEDDING_DIMENSION]
-    return embedding + [0.0] * (MEDIA_EMBEDDING_DIMENSION - len(embedding))
 
 
 async def save_image_if_new(
@@ -51,7 +43,7 @@ async def save_image_if_new(
             await message_repo.update(message.id, {"media_id": existing_media.id})
         return existing_media
 
-    phash = get_phash(image_base64)
+    phash = await run_in_process(get_phash, image_base64)
     similar_media = await media_repo.find_by_similar_phash(phash, PHASH_MAX_DISTANCE)
     if similar_media:
         if message and message.media_id != similar_media.id:
@@ -67,17 +59,12 @@ async def save_image_if_new(
         user = await user_repo.find_by_id(user_id)
         ext_id = user.ext_id
 
-    description = await describe_image_agent(db, user_id, message, image_base64)
-
-    text_emb = _fit_media_embedding(
-        await generate_text_embeddings(description, message_id, db)
-    )
-
     s3_conn = S3Client()
     _ = await s3_conn.connect()
     image_id = uuid4()
     path = f"{ext_id}/{datetime.now().strftime('%Y-%m-%d')}/{image_id}.png"
-    _ = await s3_conn.upload_image(
+    # upload_image appends the real extension when the image is not a PNG.
+    path = await s3_conn.upload_image(
         decoded,
         object_name=path
     )
@@ -89,8 +76,8 @@ async def save_image_if_new(
             bucket="whatsapp",
             path=path,
             type=media_type,
-            description_embedding=text_emb,
-            description=description,
+            description_embedding=None,
+            description=None,
             hash=image_hash,
             phash=phash,
             size=len(decoded) / (1024 * 1024),
@@ -101,3 +88,39 @@ async def save_image_if_new(
         await message_repo.update(message.id, {"media_id": new_media.id})
 
     return new_media
+
+
+async def describe_media(
+        media_id: int,
+        user_id: int,
+        message_id: str,
+) -> None:
+    """
+    Fill the description and its embedding of a stored image. Runs apart from
+    save_image_if_new: the vision call is the slowest part of saving an image
+    and nothing on the reply path reads it. The image is read back from
+    MinIO instead of being downloaded from Evolution again.
+    """
+    async with PgConnection() as db:
+        message_repo = MessageRepository(db)
+        media_repo = MediaRepository(db)
+
+        media = await media_repo.find_by_id(media_id)
+        if not media or media.description:
+            return
+
+        message = await message_repo.find_by_message_id(message_id)
+
+        s3_conn = S3Client()
+        _ = await s3_conn.connect()
+        image_base64 = await s3_conn.get_image_base64(media.bucket, media.path)
+
+        description = await describe_image_agent(db, user_id, message, image_base64)
+        text_emb = reduce_embedding(
+            await generate_text_embeddings(description, user_id, message.group_id if message else None)
+        )
+
+        await media_repo.update(
+            media_id,
+            {"description": description, "description_embedding": text_emb},
+        )
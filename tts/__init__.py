@@ -1 +1 @@
-from tts.piper_ import text_to_speech
+from tts.piper_ import shutdown_tts_executor, text_to_speech, text_to_speech_notes, TTSQueueFullError, warm_voices
@@ -1,55 +1,332 @@
+"""
+Piper Text to Speech
+
+Each language model is loaded once per process, lazily or on startup for
+``TTS_PRELOAD_LANGUAGES``, and shared by a small thread pool: ONNX Runtime
+releases the GIL while it runs, so threads synthesize in parallel with one
+copy of each model and the event loop keeps serving other chats. Only the
+ONNX part is parallel: phonemization goes through espeak-ng, whose selected
+voice is process-global, so it runs under a module lock.
+
+Replies are OGG/Opus voice notes, the native WhatsApp format, about a tenth
+of the equivalent WAV. Text is split into sentences that are synthesized
+concurrently across the pool; their PCM is piped into one ffmpeg encoder in
+order as it completes. A request keeps at most ``TTS_WORKERS`` sentences in
+the pool at a time, so one long reply cannot queue ahead of every other
+chat. A note holds at most ``TTS_MAX_NOTE_CHARS`` characters; longer
+replies are split into several notes, or cut at that length when
+``TTS_SPLIT_NOTES`` is off.
+
+At most ``TTS_MAX_PENDING`` requests are running or waiting for a worker;
+beyond that ``TTSQueueFullError`` is raised instead of queueing without
+bound. Synthesized audio is kept in a small in-memory LRU keyed by (text,
+language, config), so repeated replies skip synthesis.
+"""
+import asyncio
 import base64
-import io
-import os
+import contextlib
 import re
-import wave
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+from piper import AudioChunk, PiperVoice, SynthesisConfig
+
+from log import logger
+from utils import get_env_var, project_root, run_ffmpeg
+
+
+VOICE_MODELS = {
+    "pt": f"{project_root}/tts/models/pt_BR-faber-medium.onnx",
+    "en": f"{project_root}/tts/models/en_US-ryan-high.onnx",
+    "es": f"{project_root}/tts/models/es_ES-davefx-medium.onnx",
+}
+DEFAULT_LANGUAGE = "pt"
+SYNTHESIS_CONFIG = {
+    "volume": 1.0,
+    "length_scale": 1.0,
+    "noise_scale": 0.667,
+    "normalize_audio": True,
+}
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 16
+DEFAULT_PRELOAD_LANGUAGES = DEFAULT_LANGUAGE
+DEFAULT_OPUS_BITRATE = "32k"
+DEFAULT_MAX_NOTE_CHARS = 1000
+DEFAULT_MAX_SENTENCE_CHARS = 250
+DEFAULT_AUDIO_CACHE_SIZE = 256
+
+EMOJI_PATTERN = re.compile(
+    "["
+    u"\U0001F600-\U0001F64F"
+    u"\U0001F300-\U0001F5FF"
+    u"\U0001F680-\U0001F6FF"
+    u"\U0001F1E0-\U0001F1FF"
+    u"\U0001F900-\U0001F9FF"
+    u"\U0001FA70-\U0001FAFF"
+    u"\U00002700-\U000027BF"
+    u"\U0000FE00-\U0000FE0F"
+    u"\U0001F018-\U0001F270"
+    u"\U0001F600-\U0001F636"
+    "]+"
+)
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+class TTSQueueFullError(Exception):
+    pass
+
+
+_VOICES: dict[str, PiperVoice] = {}
+_VOICES_LOCK = threading.Lock()
+_PHONEMIZE_LOCK = threading.Lock()
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_PENDING = 0
+
+# The same text, voice and config always synthesize the same audio, so
+# entries never go stale and are only evicted by size.
+_AUDIO_CACHE: OrderedDict[tuple, bytes] = OrderedDict()
+_AUDIO_CACHE_SIZE = int(get_env_var("TTS_AUDIO_CACHE_SIZE") or DEFAULT_AUDIO_CACHE_SIZE)
+_OPUS_BITRATE = get_env_var("TTS_OPUS_BITRATE") or DEFAULT_OPUS_BITRATE
+_CONFIG_KEY = (*sorted(SYNTHESIS_CONFIG.items()), ("opus_bitrate", _OPUS_BITRATE))
+
+
+def _resolve_language(language: Optional[str]) -> str:
+    return language if language in VOICE_MODELS else DEFAULT_LANGUAGE
+
+
+def get_voice(language: str) -> PiperVoice:
+    """Return the voice of ``language``, loading its model on first use."""
+    language = _resolve_language(language)
+    voice = _VOICES.get(language)
+    if voice is None:
+        with _VOICES_LOCK:
+            voice = _VOICES.get(language)
+            if voice is None:
+                voice = PiperVoice.load(VOICE_MODELS[language])
+                _VOICES[language] = voice
+    return voice
+
+
+def _tts_workers() -> int:
+    return max(1, int(get_env_var("TTS_WORKERS") or DEFAULT_WORKERS))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            max_workers=_tts_workers(),
+            thread_name_prefix="tts",
+        )
+    return _EXECUTOR
+
+
+def shutdown_tts_executor() -> None:
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _EXECUTOR = None
+
+
+def _clean_text(text: str) -> str:
+    text = EMOJI_PATTERN.sub("", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _max_sentence_chars() -> int:
+    return int(get_env_var("TTS_MAX_SENTENCE_CHARS") or DEFAULT_MAX_SENTENCE_CHARS)
+
 
-from piper import PiperVoice, SynthesisConfig
+def _split_long(text: str, max_chars: int) -> list[str]:
+    """Split ``text`` at clause ends, then at spaces, into parts of at most ``max_chars``."""
+    if len(text) <= max_chars:
+        return [text]
 
-from utils import project_root
+    parts: list[str] = []
+    for clause in CLAUSE_END.split(text):
+        words = clause.split(" ") if len(clause) > max_chars else [clause]
+        for word in words:
+            if parts and len(parts[-1]) + 1 + len(word) <= max_chars:
+                parts[-1] = f"{parts[-1]} {word}"
+            else:
+                parts.append(word)
+    return parts
+
+
+def split_sentences(text: str) -> list[str]:
+    max_chars = _max_sentence_chars()
+    return [
+        part
+        for sentence in SENTENCE_END.split(text) if sentence
+        for part in _split_long(sentence, max_chars)
+    ]
+
+
+def split_notes(sentences: list[str], max_chars: int) -> list[list[str]]:
+    """Group consecutive sentences into notes of at most ``max_chars`` characters."""
+    notes: list[list[str]] = []
+    size = 0
+    for sentence in sentences:
+        if notes and size + 1 + len(sentence) <= max_chars:
+            notes[-1].append(sentence)
+            size += 1 + len(sentence)
+        else:
+            notes.append([sentence])
+            size = len(sentence)
+    return notes
+
+
+def _synthesize_pcm(text: str, language: str) -> bytes:
+    """
+    ``PiperVoice.synthesize`` split in two: espeak-ng's ``set_voice`` and
+    ``get_phonemes`` are separate calls on shared state, so a thread of
+    another language must not switch the voice between them. Piper 1.4.1
+    happens to lock this internally; ``_PHONEMIZE_LOCK`` does not rely on it.
+    """
+    voice = get_voice(language)
+    syn_config = SynthesisConfig(**SYNTHESIS_CONFIG)
+    with _PHONEMIZE_LOCK:
+        sentence_phonemes = voice.phonemize(text)
+
+    pcm = []
+    for phonemes in sentence_phonemes:
+        if not phonemes:
+            continue
+        phoneme_ids = voice.phonemes_to_ids(phonemes)
+        audio = voice.phoneme_ids_to_audio(phoneme_ids, syn_config)
+        pcm.append(AudioChunk(
+            sample_rate=voice.config.sample_rate,
+            sample_width=2,
+            sample_channels=1,
+            audio_float_array=_finish_audio(audio, syn_config),
+            phonemes=phonemes,
+            phoneme_ids=phoneme_ids,
+        ).audio_int16_bytes)
+    return b"".join(pcm)
+
+
+def _finish_audio(audio: np.ndarray, syn_config: SynthesisConfig) -> np.ndarray:
+    # Same post-processing as PiperVoice.synthesize.
+    if syn_config.normalize_audio:
+        max_val = np.max(np.abs(audio))
+        audio = np.zeros_like(audio) if max_val < 1e-8 else audio / max_val
+    if syn_config.volume != 1.0:
+        audio = audio * syn_config.volume
+    return np.clip(audio, -1.0, 1.0).astype(np.float32)
+
+
+async def _synthesize_sentence(sentence: str, language: str, slots: asyncio.Semaphore) -> bytes:
+    async with slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), _synthesize_pcm, sentence, language)
+
+
+async def _synthesize_note(sentences: list[str], language: str, slots: asyncio.Semaphore) -> bytes:
+    """
+    Synthesize sentences concurrently, at most one per ``slots`` permit, and
+    encode their PCM, in order, as OGG/Opus.
+    """
+    loop = asyncio.get_running_loop()
+    voice = await loop.run_in_executor(_get_executor(), get_voice, language)
+    jobs = [asyncio.ensure_future(_synthesize_sentence(sentence, language, slots)) for sentence in sentences]
+
+    async def pcm_in_order():
+        for job in jobs:
+            yield await job
+
+    try:
+        return await run_ffmpeg(
+            '-f', 's16le',
+            '-ar', str(voice.config.sample_rate),
+            '-ac', '1',
+            '-i', 'pipe:0',
+            '-c:a', 'libopus',
+            '-b:a', _OPUS_BITRATE,
+            '-application', 'voip',
+            '-f', 'ogg',
+            'pipe:1',
+            input_chunks=pcm_in_order(),
+        )
+    except BaseException:
+        for job in jobs:
+            job.cancel()
+        # Retrieve every outcome so failed jobs do not log unretrieved exceptions.
+        await asyncio.gather(*jobs, return_exceptions=True)
+        raise
+
+
+def _cache_audio(key: tuple, audio_bytes: bytes) -> None:
+    _AUDIO_CACHE[key] = audio_bytes
+    _AUDIO_CACHE.move_to_end(key)
+    while len(_AUDIO_CACHE) > _AUDIO_CACHE_SIZE:
+        _AUDIO_CACHE.popitem(last=False)
+
+
+async def _note_to_speech(sentences: list[str], language: str, slots: asyncio.Semaphore) -> str:
+    key = (" ".join(sentences), language, _CONFIG_KEY)
+    audio_bytes = _AUDIO_CACHE.get(key)
+    if audio_bytes is None:
+        audio_bytes = await _synthesize_note(sentences, language, slots)
+        _cache_audio(key, audio_bytes)
+    else:
+        _AUDIO_CACHE.move_to_end(key)
+
+    return base64.b64encode(audio_bytes).decode('utf-8')
+
+
+@contextlib.contextmanager
+def _pending_request():
+    global _PENDING
+    if _PENDING >= int(get_env_var("TTS_MAX_PENDING") or DEFAULT_MAX_PENDING):
+        raise TTSQueueFullError(f"{_PENDING} text to speech requests already pending")
+
+    _PENDING += 1
+    try:
+        yield
+    finally:
+        _PENDING -= 1
 
 
 async def text_to_speech(text: str, language: str) -> str:
-    syn_config = SynthesisConfig(
-        volume=1.0,
-        length_scale=1.0,
-        noise_scale=0.667,
-        normalize_audio=True,
-    )
-
-    languages = {
-        "pt": f"{project_root}/tts/models/pt_BR-faber-medium.onnx",
-        "en": f"{project_root}/tts/models/en_US-ryan-high.onnx",
-        "es": f"{project_root}/tts/models/es_ES-davefx-medium.onnx"
-    }
-
-    voice = PiperVoice.load(languages.get(language if language in languages else "pt"))
-
-    wav_buffer = io.BytesIO()
-
-    emoji_pattern = re.compile(
-        "["
-        u"\U0001F600-\U0001F64F"
-        u"\U0001F300-\U0001F5FF"
-        u"\U0001F680-\U0001F6FF"
-        u"\U0001F1E0-\U0001F1FF"
-        u"\U0001F900-\U0001F9FF"
-        u"\U0001FA70-\U0001FAFF"
-        u"\U00002700-\U000027BF"
-        u"\U0000FE00-\U0000FE0F"
-        u"\U0001F018-\U0001F270"
-        u"\U0001F600-\U0001F636"
-        "]+"
-    )
-
-    tt_message = emoji_pattern.sub("", text)
-    tt_message = re.sub(r"\s+", " ", tt_message).strip()
-
-    with wave.open(wav_buffer, "wb") as wav_file:
-        voice.synthesize_wav(tt_message, wav_file, syn_config=syn_config)
-
-    audio_bytes = wav_buffer.getvalue()
-    audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-
-    return audio_base64
+    """Base64 OGG/Opus voice note of the whole ``text``."""
+    language = _resolve_language(language)
+    with _pending_request():
+        slots = asyncio.Semaphore(_tts_workers())
+        return await _note_to_speech(split_sentences(_clean_text(text)) or [""], language, slots)
+
+
+async def text_to_speech_notes(text: str, language: str) -> list[str]:
+    """
+    Base64 OGG/Opus voice notes of ``text`` in order, each of at most
+    ``TTS_MAX_NOTE_CHARS``. The notes share ``TTS_WORKERS`` sentence slots,
+    so the request never has more sentences than that in the pool.
+    """
+    language = _resolve_language(language)
+    sentences = split_sentences(_clean_text(text)) or [""]
+    notes = split_notes(sentences, int(get_env_var("TTS_MAX_NOTE_CHARS") or DEFAULT_MAX_NOTE_CHARS))
+    if (get_env_var("TTS_SPLIT_NOTES") or "true").lower() != "true":
+        notes = notes[:1]
+
+    with _pending_request():
+        slots = asyncio.Semaphore(_tts_workers())
+        return list(await asyncio.gather(*(_note_to_speech(note, language, slots) for note in notes)))
+
+
+async def warm_voices() -> None:
+    """Load the models of ``TTS_PRELOAD_LANGUAGES`` (comma separated) in the pool."""
+    preload = get_env_var("TTS_PRELOAD_LANGUAGES")
+    preload = DEFAULT_PRELOAD_LANGUAGES if preload is None else preload
+    languages = [language.strip() for language in preload.split(",") if language.strip() in VOICE_MODELS]
+    if not languages:
+        return
+
+    loop = asyncio.get_running_loop()
+    for language in languages:
+        await loop.run_in_executor(_get_executor(), get_voice, language)
+    await logger.info("TTS", "Warmup", f"Loaded voices: {', '.join(languages)}")
@@ -1,5 +1,12 @@
 from utils.env_var import get_env_var
-from utils.hash import get_image_hash, get_phash
+from utils.embedding import EMBEDDING_DIMENSION, reduce_embedding
+from utils.hash import get_file_hash, get_image_hash, get_phash
 from utils.instance import INSTANCE_NUMBER
+from utils.media_compute import (
+    run_ffmpeg,
+    run_ffmpeg_sync,
+    run_in_process,
+    shutdown_media_executor,
+)
 from utils.path_config import project_root
 from utils.random import generate_random_name
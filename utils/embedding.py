@@ -0,0 +1,20 @@
+import math
+
+
+# Stored dimension of description and term embeddings. The embedding model
+# (Qwen3 Embedding) is Matryoshka-trained, so a prefix of its output is
+# itself a usable embedding once re-normalized. Changing this needs a
+# migration for the partial HNSW indexes on content.media and a run of
+# ``python -m embeddings.backfill reduce``.
+EMBEDDING_DIMENSION = 1024
+
+
+def reduce_embedding(embedding: list[float], dimension: int = EMBEDDING_DIMENSION) -> list[float]:
+    """Truncate to ``dimension`` (zero-padding shorter inputs) and L2-normalize."""
+    reduced = [float(value) for value in embedding[:dimension]]
+    reduced += [0.0] * (dimension - len(reduced))
+
+    norm = math.sqrt(sum(value * value for value in reduced))
+    if not norm:
+        return reduced
+    return [value / norm for value in reduced]
@@ -6,9 +6,12 @@ import imagehash
 from PIL import Image
 
 
+def get_file_hash(file_bytes: bytes) -> bytes:
+    return hashlib.sha256(file_bytes).digest()
+
+
 def get_image_hash(base64_str: str) -> bytes:
-    image_bytes = base64.b64decode(base64_str)
-    return hashlib.sha256(image_bytes).digest()
+    return get_file_hash(base64.b64decode(base64_str))
 
 
 def get_phash(base64_str: str) -> int:
@@ -18,3 +21,41 @@ def get_phash(base64_str: str) -> int:
     if phash >= 2 ** 63:
         phash -= 2 ** 64
     return phash
+
+
+# Multi-index hashing: the 64-bit phash is split into PHASH_BANDS bands, each
+# indexed on its own. If two hashes are within distance d, by pigeonhole at
+# least one band differs by at most d // PHASH_BANDS bits, so probing every
+# band with its neighbours in that radius finds every match.
+PHASH_BANDS = 4
+PHASH_BAND_BITS = 64 // PHASH_BANDS
+_PHASH_BAND_MASK = (1 << PHASH_BAND_BITS) - 1
+
+
+def phash_bands(phash: int) -> list[int]:
+    """Bands of a signed 64-bit phash, most significant first."""
+    unsigned = phash & 0xFFFF_FFFF_FFFF_FFFF
+    return [
+        (unsigned >> (PHASH_BAND_BITS * (PHASH_BANDS - 1 - band))) & _PHASH_BAND_MASK
+        for band in range(PHASH_BANDS)
+    ]
+
+
+def _hamming_ball(value: int, radius: int) -> list[int]:
+    values = [value]
+    frontier = [(value, -1)]
+    for _ in range(radius):
+        next_frontier = []
+        for current, last_bit in frontier:
+            for bit in range(last_bit + 1, PHASH_BAND_BITS):
+                flipped = current ^ (1 << bit)
+                values.append(flipped)
+                next_frontier.append((flipped, bit))
+        frontier = next_frontier
+    return values
+
+
+def phash_band_candidates(phash: int, max_distance: int) -> list[list[int]]:
+    """Per band, every band value a hash within ``max_distance`` may have in at least one band."""
+    radius = max_distance // PHASH_BANDS
+    return [_hamming_ball(band, radius) for band in phash_bands(phash)]
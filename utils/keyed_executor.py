@@ -0,0 +1,137 @@
+"""
+Keyed Sequential Executor
+
+Runs items through an async handler with one lane per key: items sharing a
+key are handled strictly in submission order, while different keys run in
+parallel up to a global concurrency limit. Lanes are created on demand and
+evicted after staying idle, so memory stays bounded by the number of active
+keys rather than every key ever seen.
+"""
+import asyncio
+import traceback
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+Handler = Callable[[T], Awaitable[None]]
+ErrorHandler = Callable[[str, T, Exception], Awaitable[None]]
+
+
+class _Lane(Generic[T]):
+    def __init__(self, max_size: int):
+        self.queue: asyncio.Queue[T] = asyncio.Queue(maxsize=max_size)
+        self.task: Optional[asyncio.Task] = None
+
+
+class KeyedExecutor(Generic[T]):
+    def __init__(
+            self,
+            handler: Handler,
+            max_concurrency: int,
+            max_pending: int,
+            lane_size: int = 100,
+            idle_timeout: float = 60.0,
+            on_error: Optional[ErrorHandler] = None,
+    ):
+        self.handler = handler
+        self.max_pending = max(1, max_pending)
+        self.lane_size = max(1, lane_size)
+        self.idle_timeout = idle_timeout
+        self.on_error = on_error
+
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._lanes: dict[str, _Lane[T]] = {}
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def lanes(self) -> int:
+        return len(self._lanes)
+
+    async def submit(self, key: str, item: T, timeout: Optional[float] = None) -> bool:
+        """
+        Queue an item on the lane for ``key``.
+
+        Waits up to ``timeout`` seconds for room in the lane (``None`` waits
+        indefinitely) and returns False if the executor is closed, the global
+        pending limit is reached or the lane stayed full.
+        """
+        if self._closed or self._pending >= self.max_pending:
+            return False
+
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = _Lane(self.lane_size)
+            lane.task = asyncio.create_task(self._run_lane(key, lane), name=f"keyed_lane:{key}")
+            self._lanes[key] = lane
+
+        self._pending += 1
+        self._idle.clear()
+        try:
+            await asyncio.wait_for(lane.queue.put(item), timeout=timeout)
+        except TimeoutError:
+            self._done()
+            return False
+
+        return True
+
+    async def join(self) -> None:
+        """Wait until every submitted item has been handled."""
+        await self._idle.wait()
+
+    async def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stop accepting items, drain what is queued and cancel the lanes.
+
+        Returns False when the drain did not finish within ``timeout``.
+        """
+        self._closed = True
+        drained = True
+        try:
+            await asyncio.wait_for(self.join(), timeout=timeout)
+        except TimeoutError:
+            drained = False
+
+        tasks = [lane.task for lane in self._lanes.values() if lane.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._lanes.clear()
+        return drained
+
+    def _done(self) -> None:
+        self._pending -= 1
+        if self._pending <= 0:
+            self._pending = 0
+            self._idle.set()
+
+    async def _run_lane(self, key: str, lane: _Lane[T]) -> None:
+        while True:
+            try:
+                item = await asyncio.wait_for(lane.queue.get(), timeout=self.idle_timeout)
+            except TimeoutError:
+                # No await between the empty check and the removal, so no
+                # submit can slip an item into a lane that is going away.
+                if lane.queue.empty() and self._lanes.get(key) is lane:
+                    del self._lanes[key]
+                    return
+                continue
+
+            try:
+                async with self._semaphore:
+                    await self.handler(item)
+            except Exception as exc:
+                if self.on_error:
+                    await self.on_error(key, item, exc)
+                else:
+                    traceback.print_exception(exc)
+            finally:
+                lane.queue.task_done()
+                self._done()
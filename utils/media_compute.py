@@ -0,0 +1,165 @@
+"""
+Media Compute Executor
+
+CPU-bound image and video work (Pillow resizing and encoding, sticker
+effects, background removal) runs in a dedicated process pool so one sticker
+does not stall the event loop serving every other chat. ffmpeg runs as an
+asyncio subprocess, with at most as many encodes in flight as pool workers;
+code already running in a pool worker calls ``run_ffmpeg_sync`` instead.
+
+Functions sent to the pool must be importable module-level functions with
+picklable arguments; workers are started with ``spawn`` so they never
+inherit the event loop, sockets or locks of the server process.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterable, Callable, Optional, TypeVar
+
+from utils.env_var import get_env_var
+
+
+T = TypeVar("T")
+
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+_EXECUTOR: Optional[ProcessPoolExecutor] = None
+_FFMPEG_SLOTS: Optional[asyncio.Semaphore] = None
+
+
+def media_compute_workers() -> int:
+    return max(1, int(get_env_var("MEDIA_COMPUTE_WORKERS") or DEFAULT_WORKERS))
+
+
+def get_media_executor() -> ProcessPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ProcessPoolExecutor(
+            max_workers=media_compute_workers(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _EXECUTOR
+
+
+def shutdown_media_executor() -> None:
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _EXECUTOR = None
+
+
+async def run_in_process(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run ``fn(*args, **kwargs)`` in the media process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_media_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def _ffmpeg_slots() -> asyncio.Semaphore:
+    global _FFMPEG_SLOTS
+    if _FFMPEG_SLOTS is None:
+        _FFMPEG_SLOTS = asyncio.Semaphore(media_compute_workers())
+    return _FFMPEG_SLOTS
+
+
+def _ffmpeg_command(args: tuple[str, ...]) -> list[str]:
+    return ["ffmpeg", "-hide_banner", "-loglevel", "error", *args]
+
+
+async def _feed_ffmpeg(stdin: asyncio.StreamWriter, input_chunks: AsyncIterable[bytes]) -> None:
+    try:
+        async for chunk in input_chunks:
+            stdin.write(chunk)
+            await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # ffmpeg exited early; its exit status and stderr report why.
+        pass
+    finally:
+        stdin.close()
+
+
+async def run_ffmpeg(
+        *args: str,
+        input_bytes: Optional[bytes] = None,
+        input_chunks: Optional[AsyncIterable[bytes]] = None,
+) -> bytes:
+    """
+    Run ``ffmpeg *args`` without blocking the loop and return its stdout.
+    Input is either ``input_bytes`` or ``input_chunks``, an async iterable
+    written to stdin as it is produced. Raises
+    ``subprocess.CalledProcessError`` (with stderr) on a non-zero exit.
+    """
+    command = _ffmpeg_command(args)
+    has_input = input_bytes is not None or input_chunks is not None
+    async with _ffmpeg_slots():
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE if has_input else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            if input_chunks is None:
+                stdout, stderr = await process.communicate(input_bytes)
+            else:
+                _, stdout, stderr = await asyncio.gather(
+                    _feed_ffmpeg(process.stdin, input_chunks),
+                    process.stdout.read(),
+                    process.stderr.read(),
+                )
+                await process.wait()
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+    return stdout
+
+
+def _write_input(stdin, input_bytes) -> None:
+    try:
+        stdin.write(input_bytes)
+    except BrokenPipeError:
+        # ffmpeg exited early; its exit status and stderr report why.
+        pass
+    finally:
+        stdin.close()
+
+
+def run_ffmpeg_sync(*args: str, input_bytes: Optional[bytes] = None) -> bytearray:
+    """
+    Blocking ``run_ffmpeg`` for functions running inside the process pool.
+    stdout is read into a single ``bytearray`` instead of being joined from
+    chunks, so a large decode is held once and can be edited in place.
+    """
+    command = _ffmpeg_command(args)
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if input_bytes is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+        )
+        writer = None
+        if input_bytes is not None:
+            writer = threading.Thread(target=_write_input, args=(process.stdin, input_bytes))
+            writer.start()
+
+        output = bytearray()
+        while chunk := process.stdout.read(1 << 20):
+            output += chunk
+        process.stdout.close()
+        if writer is not None:
+            writer.join()
+
+        if process.wait() != 0:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(process.returncode, command, output, stderr.read())
+    return output
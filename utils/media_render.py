@@ -0,0 +1,504 @@
+"""
+Media Render
+
+CPU-bound rendering sent to the media process pool (``utils.media_compute``):
+image re-encoding for uploads, static stickers and animated stickers.
+
+Spawned pool workers import this module to unpickle the functions they run,
+so it stays a leaf: PIL, NumPy, the caption renderer and ffmpeg, never the
+application modules that call it. rembg is imported on the first background
+removal.
+"""
+import base64
+import functools
+import math
+import os
+import tempfile
+from io import BytesIO
+from urllib.request import urlopen
+
+import numpy as np
+from PIL import Image
+
+from utils.media_compute import run_ffmpeg_sync
+from utils.sticker_caption import add_caption_to_image
+
+
+def encode_image(
+        image_bytes: bytes,
+        convert_to_webp: bool,
+        max_size: tuple[float, float],
+) -> tuple[bytes, str, str]:
+    """Thumbnail and re-encode an image for upload; returns (bytes, extension, content type)."""
+    img = Image.open(BytesIO(image_bytes))
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+    if convert_to_webp:
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        format_type = 'WEBP'
+        extension = 'webp'
+        content_type = 'image/webp'
+    else:
+        format_type = img.format or 'PNG'
+        extension = format_type.lower()
+        content_type = f'image/{extension}'
+
+    buffer = BytesIO()
+    img.save(buffer, format=format_type, quality=95)
+    return buffer.getvalue(), extension, content_type
+
+
+def _resize_contain_transparent(img: Image.Image, size: tuple) -> Image.Image:
+    target_w, target_h = size
+
+    img.thumbnail((target_w, target_h), Image.Resampling.LANCZOS)
+
+    canvas = Image.new('RGBA', (target_w, target_h), (0, 0, 0, 0))
+
+    offset_x = (target_w - img.width) // 2
+    offset_y = (target_h - img.height) // 2
+    canvas.paste(img, (offset_x, offset_y), mask=img.split()[3])
+
+    return canvas
+
+
+def _resize_cover(img: Image.Image, size: tuple) -> Image.Image:
+    target_w, target_h = size
+    scale = max(target_w / img.width, target_h / img.height)
+    resized_w = round(img.width * scale)
+    resized_h = round(img.height * scale)
+
+    resized = img.resize((resized_w, resized_h), Image.Resampling.LANCZOS)
+    left = (resized_w - target_w) // 2
+    top = (resized_h - target_h) // 2
+
+    return resized.crop((left, top, left + target_w, top + target_h))
+
+
+@functools.cache
+def _rembg_session():
+    # rembg loads onnxruntime and its model on import; only workers that
+    # remove a background pay for it.
+    from rembg import new_session
+
+    return new_session("u2net_human_seg")
+
+
+def _remove_background(image_bytes: bytes) -> bytes:
+    from rembg import remove
+
+    return remove(image_bytes, session=_rembg_session())
+
+
+def render_static_sticker(
+        image_bytes: bytes,
+        remove_background: bool,
+        fill: bool,
+        caption_text: str | None,
+) -> str:
+    """Build the 512x512 WebP sticker as base64."""
+    img = Image.open(BytesIO(image_bytes))
+
+    if remove_background:
+        img_bytes = BytesIO()
+        img.save(img_bytes, format='PNG')
+        img_bytes.seek(0)
+        output = _remove_background(img_bytes.read())
+        img = Image.open(BytesIO(output))
+
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+
+    if fill:
+        img = _resize_cover(img, (512, 512))
+    else:
+        img = _resize_contain_transparent(img, (512, 512))
+
+    if caption_text:
+        img = add_caption_to_image(img, caption_text)
+
+    buffer = BytesIO()
+    img.save(buffer, format='WEBP', quality=95)
+    buffer.seek(0)
+    webp_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    return webp_base64
+
+
+def _square_video_filter(size: int, fill: bool) -> str:
+    if fill:
+        return (
+            f"scale={size}:{size}:force_original_aspect_ratio=increase:flags=lanczos,"
+            f"crop={size}:{size}"
+        )
+
+    return (
+        f"scale={size}:{size}:force_original_aspect_ratio=decrease:flags=lanczos,"
+        f"pad={size}:{size}:(ow-iw)/2:(oh-ih)/2:color=white@0"
+    )
+
+
+# Effects are pure coordinate remaps: every output pixel reads one input
+# pixel, given as a flat index (src_y * width + src_x). The maps only depend
+# on the frame size and intensity, so they are computed once with NumPy and
+# reused for every frame (and every sticker of the same size).
+EFFECT_MAP_CACHE_SIZE = 64
+# Breathing changes intensity every frame; rounding it bounds the number of
+# distinct maps per sticker (about 60) without a visible difference.
+BREATHING_INTENSITY_DECIMALS = 2
+
+
+@functools.lru_cache(maxsize=8)
+def _polar_grid(width: int, height: int) -> tuple[np.ndarray, ...]:
+    center_x, center_y = width // 2, height // 2
+    y, x = np.mgrid[0:height, 0:width]
+    dx = (x - center_x).astype(np.float64)
+    dy = (y - center_y).astype(np.float64)
+    angle = np.arctan2(dy, dx)
+    grid = (x, y, np.sqrt(dx ** 2 + dy ** 2), angle, np.cos(angle), np.sin(angle))
+    for array in grid:
+        array.flags.writeable = False
+    return grid
+
+
+def _polar_map(
+        width: int,
+        height: int,
+        new_distance: np.ndarray,
+        mask: np.ndarray,
+        angle: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Source index of pixels in ``mask`` moved to (new_distance, angle), with
+    the pixel's own angle by default; identity elsewhere.
+    """
+    x, y, _, _, cos_angle, sin_angle = _polar_grid(width, height)
+    center_x, center_y = width // 2, height // 2
+    if angle is not None:
+        cos_angle, sin_angle = np.cos(angle), np.sin(angle)
+
+    # astype truncates toward zero, like int() on the scalar floats.
+    src_x = (center_x + new_distance * cos_angle).astype(np.intp)
+    src_y = (center_y + new_distance * sin_angle).astype(np.intp)
+    mask = mask & (src_x >= 0) & (src_x < width) & (src_y >= 0) & (src_y < height)
+
+    src_y = np.where(mask, src_y, y)
+    src_x = np.where(mask, src_x, x)
+    return _flat_index(src_y, src_x, width)
+
+
+def _flat_index(src_y: np.ndarray, src_x: np.ndarray, width: int) -> np.ndarray:
+    index = (src_y * width + src_x).ravel().astype(np.int32)
+    index.flags.writeable = False
+    return index
+
+
+@functools.lru_cache(maxsize=EFFECT_MAP_CACHE_SIZE)
+def _bulge_map(width: int, height: int, intensity: float) -> np.ndarray:
+    _, _, distance, _, _, _ = _polar_grid(width, height)
+    max_radius = math.sqrt((width // 2) ** 2 + (height // 2) ** 2)
+    factor = (1.0 - distance / max_radius) ** 2 * intensity
+    new_distance = distance * (1 + factor)
+    return _polar_map(width, height, new_distance, (distance < max_radius) & (new_distance < max_radius))
+
+
+@functools.lru_cache(maxsize=EFFECT_MAP_CACHE_SIZE)
+def _pinch_map(width: int, height: int, intensity: float) -> np.ndarray:
+    _, _, distance, _, _, _ = _polar_grid(width, height)
+    max_radius = math.sqrt((width // 2) ** 2 + (height // 2) ** 2)
+    factor = (1.0 - distance / max_radius) ** 2 * intensity
+    new_distance = distance * (1 - factor * 0.5)
+    return _polar_map(width, height, new_distance, distance < max_radius)
+
+
+@functools.lru_cache(maxsize=EFFECT_MAP_CACHE_SIZE)
+def _swirl_map(width: int, height: int, intensity: float) -> np.ndarray:
+    _, _, distance, angle, _, _ = _polar_grid(width, height)
+    max_radius = math.sqrt((width // 2) ** 2 + (height // 2) ** 2)
+    rotation = (1.0 - distance / max_radius) * intensity * math.pi * 2
+    return _polar_map(width, height, distance, distance < max_radius, angle + rotation)
+
+
+@functools.lru_cache(maxsize=EFFECT_MAP_CACHE_SIZE)
+def _wave_map(width: int, height: int, intensity: float) -> np.ndarray:
+    x, y, _, _, _, _ = _polar_grid(width, height)
+    offset = (intensity * np.sin(np.arange(height) * 0.1)).astype(np.intp)
+    return _flat_index(y, (x + offset[:, None]) % width, width)
+
+
+@functools.lru_cache(maxsize=EFFECT_MAP_CACHE_SIZE)
+def _fisheye_map(width: int, height: int, intensity: float) -> np.ndarray:
+    _, _, distance, _, _, _ = _polar_grid(width, height)
+    max_radius = min(width // 2, height // 2)
+    new_distance = max_radius * (distance / max(max_radius, 1)) ** (1 + intensity)
+    return _polar_map(width, height, new_distance, distance < max_radius)
+
+
+def _remap(frame: Image.Image, effect_map) -> Image.Image:
+    img_array = np.asarray(frame)
+    height, width = img_array.shape[:2]
+    pixels = img_array.reshape(height * width, -1)
+    # np.take on the flattened pixels is several times faster than
+    # img_array[src_y, src_x] with two index arrays.
+    remapped = np.take(pixels, effect_map(width, height), axis=0)
+    return Image.fromarray(remapped.reshape(img_array.shape))
+
+
+def _apply_bulge_effect(frame: Image.Image, intensity: float = 0.5) -> Image.Image:
+    return _remap(frame, lambda width, height: _bulge_map(width, height, intensity))
+
+
+def _apply_pinch_effect(frame: Image.Image, intensity: float = 0.5) -> Image.Image:
+    return _remap(frame, lambda width, height: _pinch_map(width, height, intensity))
+
+
+def _apply_swirl_effect(frame: Image.Image, intensity: float = 0.5) -> Image.Image:
+    return _remap(frame, lambda width, height: _swirl_map(width, height, intensity))
+
+
+def _apply_wave_effect(frame: Image.Image, intensity: float = 10) -> Image.Image:
+    return _remap(frame, lambda width, height: _wave_map(width, height, intensity))
+
+
+def _apply_fisheye_effect(frame: Image.Image, intensity: float = 0.5) -> Image.Image:
+    return _remap(frame, lambda width, height: _fisheye_map(width, height, intensity))
+
+
+def _apply_breathing_effect(frame: Image.Image, progress: float) -> Image.Image:
+    intensity = round(math.sin(progress * math.pi * 2) * 0.3, BREATHING_INTENSITY_DECIMALS)
+    if intensity > 0:
+        return _apply_bulge_effect(frame, intensity)
+    else:
+        return _apply_pinch_effect(frame, abs(intensity))
+
+
+def _apply_rotation_effect(frame: Image.Image, progress: float) -> Image.Image:
+    angle = progress * 360
+    return frame.rotate(-angle, resample=Image.BICUBIC, expand=False, fillcolor=(0, 0, 0, 0))
+
+
+def _apply_explosion_effect(frame: Image.Image, progress: float, explosion_frames: list = None,
+                           explosion_index: int = 0) -> Image.Image:
+    if progress >= 0.8 and explosion_frames and isinstance(explosion_frames, list) and len(explosion_frames) > 0:
+        return explosion_frames[min(explosion_index, len(explosion_frames) - 1)]
+    return frame
+
+
+def _overlay_layer(frames: np.ndarray, layer: Image.Image) -> None:
+    """Alpha-composite one RGBA layer over every frame, in place."""
+    layer_array = np.asarray(layer.convert('RGBA'))
+    layer_alpha = layer_array[..., 3].ravel()
+
+    # Most caption pixels (glyphs and outline) are opaque and simply replace
+    # the frame; copying them as one uint32 per pixel, frame by frame, is
+    # several times faster than a 2-D fancy assignment.
+    opaque = np.flatnonzero(layer_alpha == 255)
+    opaque_values = layer_array.view(np.uint32).ravel()[opaque]
+    for frame in frames.view(np.uint32).reshape(frames.shape[0], -1):
+        frame[opaque] = opaque_values
+
+    # Only the anti-aliased edges are blended.
+    index = np.flatnonzero((layer_alpha > 0) & (layer_alpha < 255))
+    if not index.size:
+        return
+
+    pixels = frames.reshape(frames.shape[0], -1, 4)
+    overlay = layer_array.reshape(-1, 4)[index].astype(np.float32) / 255
+    region = pixels[:, index].astype(np.float32) / 255
+
+    overlay_alpha = overlay[:, 3:]
+    region_alpha = region[..., 3:] * (1 - overlay_alpha)
+    alpha = overlay_alpha + region_alpha
+    rgb = (overlay[:, :3] * overlay_alpha + region[..., :3] * region_alpha) / alpha
+
+    blended = np.concatenate([rgb, alpha], axis=-1)
+    pixels[:, index] = np.rint(blended * 255).astype(np.uint8)
+
+
+def _load_explosion_frames(width: int, height: int) -> list[Image.Image]:
+    explosion_frames = []
+    try:
+        explosion_url = "https://media.giphy.com/media/HhTXt43pk1I1W/giphy.gif"
+        with urlopen(explosion_url, timeout=5) as response:
+            explosion_gif = Image.open(BytesIO(response.read()))
+        try:
+            while len(explosion_frames) < 30:
+                explosion_gif.seek(len(explosion_frames))
+                exp_frame = explosion_gif.convert('RGBA')
+                explosion_frames.append(exp_frame.resize((width, height), Image.LANCZOS))
+        except EOFError:
+            pass
+    except Exception:
+        pass
+    return explosion_frames
+
+
+def _apply_effect(
+        frame: Image.Image,
+        effect: str,
+        progress: float,
+        explosion_frames: list,
+        explosion_index: int,
+) -> Image.Image:
+    if effect == "bulge":
+        return _apply_bulge_effect(frame, 0.5)
+    if effect == "pinch":
+        return _apply_pinch_effect(frame, 0.5)
+    if effect == "swirl":
+        return _apply_swirl_effect(frame, 0.5)
+    if effect == "wave":
+        return _apply_wave_effect(frame, 10)
+    if effect == "fisheye":
+        return _apply_fisheye_effect(frame, 0.5)
+    if effect == "explosion":
+        return _apply_explosion_effect(frame, progress, explosion_frames, explosion_index)
+    if effect == "breathing":
+        return _apply_breathing_effect(frame, progress)
+    if effect == "rotation":
+        return _apply_rotation_effect(frame, progress)
+    return frame
+
+
+def _render_frames(frames: np.ndarray, caption_text: str = None, effect: str = None) -> np.ndarray:
+    """
+    Draw the caption and effect on (frames, height, width, 4) RGBA frames, in place.
+    The caption is rendered once as a transparent layer and composited over
+    every frame; effects then distort frame and caption together.
+    """
+    count, height, width, _ = frames.shape
+    if caption_text:
+        layer = add_caption_to_image(Image.new('RGBA', (width, height), (0, 0, 0, 0)), caption_text)
+        _overlay_layer(frames, layer)
+
+    if effect:
+        explosion_frames = _load_explosion_frames(width, height) if effect == "explosion" else []
+        explosion_index = 0
+        for index in range(count):
+            progress = index / max(count - 1, 1)
+            frame = _apply_effect(Image.fromarray(frames[index]), effect, progress, explosion_frames, explosion_index)
+            frames[index] = np.asarray(frame.convert('RGBA'))
+            if effect == "explosion" and progress >= 0.7 and explosion_frames:
+                explosion_index += 1
+
+    return frames
+
+
+# Encodes from best to smallest. The first is always tried; the second encode
+# is the best one predicted to fit, from the size of the first.
+STICKER_ENCODES = [
+    {"scale": 512, "fps": 30, "quality": 85},
+    {"scale": 512, "fps": 24, "quality": 75},
+    {"scale": 512, "fps": 20, "quality": 65},
+    {"scale": 512, "fps": 15, "quality": 55},
+    {"scale": 384, "fps": 15, "quality": 60},
+    {"scale": 256, "fps": 15, "quality": 60},
+]
+# Approximate libwebp output size per quality, relative to quality 85.
+QUALITY_SIZE_RATIO = {85: 1.0, 75: 0.7, 65: 0.55, 60: 0.5, 55: 0.45}
+# The predicted encode aims well below the limit, so the estimate error
+# rarely forces a third encode.
+SIZE_TARGET_RATIO = 0.75
+STICKER_SIZE = 512
+STICKER_FPS = 30
+STICKER_MAX_SECONDS = 6
+STICKER_MAX_BYTES = 490_000
+
+
+def _predicted_size(measured_size: int, measured: dict, cfg: dict) -> float:
+    # Size scales with the number of frames and pixels, and with quality.
+    return (
+        measured_size
+        * cfg["fps"] / measured["fps"]
+        * (cfg["scale"] / measured["scale"]) ** 2
+        * QUALITY_SIZE_RATIO[cfg["quality"]] / QUALITY_SIZE_RATIO[measured["quality"]]
+    )
+
+
+def _encode_webp(frames: bytearray, cfg: dict, output_path: str) -> int:
+    video_filter = f'fps={cfg["fps"]}'
+    if cfg["scale"] != STICKER_SIZE:
+        video_filter += f',scale={cfg["scale"]}:{cfg["scale"]}:flags=lanczos'
+
+    # The webp muxer patches the RIFF header on close, so it writes a file
+    # rather than a pipe.
+    run_ffmpeg_sync(
+        '-f', 'rawvideo',
+        '-pix_fmt', 'rgba',
+        '-s', f'{STICKER_SIZE}x{STICKER_SIZE}',
+        '-framerate', str(STICKER_FPS),
+        '-i', 'pipe:0',
+        '-vf', video_filter,
+        '-vcodec', 'libwebp',
+        '-lossless', '0',
+        '-compression_level', '6',
+        '-quality', str(cfg["quality"]),
+        '-loop', '0',
+        '-preset', 'picture',
+        '-an',
+        '-f', 'webp',
+        output_path, '-y',
+        input_bytes=frames,
+    )
+    return os.path.getsize(output_path)
+
+
+def _encode_sticker(frames: bytearray, max_bytes: int = STICKER_MAX_BYTES) -> bytes:
+    """
+    Encode RGBA frames as an animated WebP under ``max_bytes``: once at the
+    best settings and, when too large, once more at the best settings
+    predicted to fit with a 25% margin. A third, smallest encode only runs
+    if even that estimate misses.
+    """
+    output_path = tempfile.mktemp(suffix='.webp')
+    try:
+        first = STICKER_ENCODES[0]
+        size = _encode_webp(frames, first, output_path)
+        if size > max_bytes:
+            target = max_bytes * SIZE_TARGET_RATIO
+            cfg = next(
+                (cfg for cfg in STICKER_ENCODES[1:] if _predicted_size(size, first, cfg) <= target),
+                STICKER_ENCODES[-1],
+            )
+            size = _encode_webp(frames, cfg, output_path)
+            if size > max_bytes and cfg is not STICKER_ENCODES[-1]:
+                _encode_webp(frames, STICKER_ENCODES[-1], output_path)
+
+        with open(output_path, 'rb') as f:
+            return f.read()
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+
+def render_animated_sticker(
+        media_path: str,
+        caption_text: str = None,
+        effect: str = None,
+        fill: bool = False,
+) -> bytes:
+    """
+    Build the animated WebP sticker. The source is decoded once into raw RGBA frames piped from ffmpeg, edited in
+    place and piped back to the encoder.
+    """
+    frames = run_ffmpeg_sync(
+        '-i', media_path,
+        '-vf', f'fps={STICKER_FPS},{_square_video_filter(STICKER_SIZE, fill)}',
+        '-t', str(STICKER_MAX_SECONDS),
+        '-f', 'rawvideo',
+        '-pix_fmt', 'rgba',
+        'pipe:1',
+    )
+    frame_bytes = STICKER_SIZE * STICKER_SIZE * 4
+    if len(frames) < frame_bytes:
+        raise ValueError("No frames decoded for the animated sticker")
+
+    # The decoded bytearray is the only copy of the frames: captions and
+    # effects write into it through a NumPy view and it goes to the encoder
+    # as is.
+    del frames[len(frames) // frame_bytes * frame_bytes:]
+    if caption_text or effect:
+        view = np.frombuffer(frames, dtype=np.uint8).reshape(-1, STICKER_SIZE, STICKER_SIZE, 4)
+        _render_frames(view, caption_text, effect)
+        del view
+
+    return _encode_sticker(frames)
@@ -8,7 +8,7 @@ from urllib.request import urlopen
 
 from PIL import Image, ImageDraw, ImageFont
 
-from utils import project_root
+from utils.path_config import project_root
 
 
 TEXT_FONT_PATH = f"{project_root}/utils/fonts/arial-bold.ttf"